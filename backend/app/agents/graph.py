@@ -1,43 +1,83 @@
 from langgraph.graph import StateGraph, END
 from app.state import AgentState
-from app.agents.nodes import supervisor_node, planner_node, coder_node, executor_node, summarizer_node, debugger_node
-
-# Define the graph
-workflow = StateGraph(AgentState)
-
-# Add nodes
-workflow.add_node("summarizer", summarizer_node)
-workflow.add_node("planner", planner_node)
-workflow.add_node("coder", coder_node)
-workflow.add_node("executor", executor_node)
-workflow.add_node("debugger", debugger_node)
+from app.core.config import settings
+from app.metrics import instrument_node
+from app.agents.nodes import asummarizer_node, aindex_node, aplanner_node, acoder_node, avalidator_node, aexecutor_node, adebugger_node, afused_node
 
 # Conditional edge function
 def should_continue(state: AgentState):
     """Return the next node based on execution status."""
     error = state.get('error')
     retry_count = state.get('retry_count', 0)
-    
+
+    # Fused plan+code failed: fall back to the two-stage planner/coder path
+    if error and state.get('fused'):
+        return "planner"
     if error and retry_count < 3:
         return "debugger"
     return END
 
-# Define edges
-# For the chat flow: Planner -> Coder -> Executor -> (Debugger -> Executor) -> END
-workflow.add_edge("planner", "coder")
-workflow.add_edge("coder", "executor")
-workflow.add_conditional_edges(
-    "executor",
-    should_continue,
-    {
-        "debugger": "debugger",
-        END: END
-    }
-)
-workflow.add_edge("debugger", "executor")
-
-# Set entry point
-workflow.set_entry_point("planner")
-
-# Compile
-app_graph = workflow.compile()
+def after_validation(state: AgentState):
+    """Run the code only if it passed static checks; otherwise route like a runtime failure."""
+    if state.get('error'):
+        return should_continue(state)
+    return "executor"
+
+def after_index(state: AgentState):
+    """End the turn when the dataset index answered it; otherwise hand over to the LLM path."""
+    return END if state.get('index_hit') else "llm"
+
+def after_fused(state: AgentState):
+    """Skip validation and execution when the fused call itself failed to produce code."""
+    return "planner" if state.get('error') else "validator"
+
+def build_graph(fused: bool = False):
+    """Compiles the chat graph.
+
+    Every turn starts at the index node, which ends the turn when the
+    question can be answered from the precomputed dataset index.
+    Two-stage: Planner -> Coder -> Validator -> Executor -> (Debugger -> Validator -> Executor) -> END
+    Fused:     Fused -> Validator -> Executor -> END, falling back to the two-stage
+               path (Planner -> Coder -> ...) only when the fused code fails.
+    The validator sends statically detectable failures to the debugger without
+    executing the code.
+    """
+    workflow = StateGraph(AgentState)
+
+    # Add nodes (async variants: run the graph with ainvoke/astream_events), each timed for /metrics
+    workflow.add_node("summarizer", instrument_node("summarizer", asummarizer_node))
+    workflow.add_node("index", instrument_node("index", aindex_node))
+    workflow.add_node("planner", instrument_node("planner", aplanner_node))
+    workflow.add_node("coder", instrument_node("coder", acoder_node))
+    workflow.add_node("validator", instrument_node("validator", avalidator_node))
+    workflow.add_node("executor", instrument_node("executor", aexecutor_node))
+    workflow.add_node("debugger", instrument_node("debugger", adebugger_node))
+
+    # Define edges
+    workflow.add_edge("planner", "coder")
+    workflow.add_edge("coder", "validator")
+    routes = {"debugger": "debugger", END: END}
+    if fused:
+        routes["planner"] = "planner"
+    workflow.add_conditional_edges("validator", after_validation, {**routes, "executor": "executor"})
+    workflow.add_conditional_edges("executor", should_continue, routes)
+    workflow.add_edge("debugger", "validator")
+
+    # Set entry point: the index fast path, then the LLM path
+    first = "planner"
+    if fused:
+        workflow.add_node("fused", instrument_node("fused", afused_node))
+        workflow.add_conditional_edges("fused", after_fused, {"planner": "planner", "validator": "validator"})
+        first = "fused"
+    workflow.add_conditional_edges("index", after_index, {END: END, "llm": first})
+    workflow.set_entry_point("index")
+
+    # Compile
+    return workflow.compile()
+
+app_graph = build_graph()
+app_fused_graph = build_graph(fused=True)
+
+def get_graph(mode: str = None):
+    """Graph for a request: 'fused' or 'two_stage', defaulting to settings.GRAPH_MODE."""
+    return app_fused_graph if (mode or settings.GRAPH_MODE) == "fused" else app_graph
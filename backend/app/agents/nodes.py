@@ -1,30 +1,42 @@
+import asyncio
 import logging
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from app.state import AgentState
-from app.tools import execute_python_code, get_data_summary
+from app.models import PlanAndCode
+from app.tools import execute_python_code, profile_dataset, use_lazy_engine, answer_from_dataset_index
 from app.core.config import settings
+from app.llm_cache import build_llm_cache
+from app.storage import load_summary, save_summary
+from app.schema_context import render_schema_context
+from app.validation import validate_code
+from app.sampling import select_sample, samples_dir
+from app.metrics import token_usage_handler, track_node
+from app.memory import compact_turn, add_turn, new_memory, render_history, render_turns, window_messages
 
 # Setup logger
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-llm = ChatOpenAI(model="gpt-4o-mini", api_key=settings.OPENAI_API_KEY)
-
-def summarizer_node(state: AgentState):
-    """Generates an intelligent LLM-based summary of the uploaded data."""
-    print("DEBUG: --- Node: Summarizer ---")
-    logger.info("--- Node: Summarizer ---")
-    file_path = state['file_path']
-    
-    # Get technical data overview
-    technical_summary = get_data_summary(file_path)
-    print(f"DEBUG: Technical summary generated (len: {len(technical_summary)})")
-    
-    # Use LLM to generate theoretical insights
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", """You are an expert data analyst. Analyze the provided dataset information and generate a concise, insightful summary.
+# Shared response cache: identical rendered prompts skip the LLM round trip
+response_cache = build_llm_cache(
+    settings.LLM_CACHE_BACKEND,
+    settings.LLM_CACHE_MAX_ENTRIES,
+    settings.LLM_CACHE_PATH,
+    settings.LLM_CACHE_TTL_SECONDS,
+)
+
+llm = ChatOpenAI(model="gpt-4o-mini", api_key=settings.OPENAI_API_KEY, cache=response_cache,
+                 callbacks=[token_usage_handler])
+summary_llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.3, api_key=settings.OPENAI_API_KEY, cache=response_cache,
+                         callbacks=[token_usage_handler])
+
+# Each node comes in a sync and an async flavour sharing the same prompt and
+# state handling. The graph runs the async ones so LLM calls are awaited and
+# CPU-bound work (parsing, code execution) is pushed to worker threads.
+
+SUMMARIZER_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You are an expert data analyst. Analyze the provided dataset information and generate a concise, insightful summary.
 
         Focus on:
         1. **Dataset Purpose**: What kind of data is this? What domain does it belong to?
@@ -37,89 +49,27 @@ def summarizer_node(state: AgentState):
 
         Be concise, professional, and focus on theoretical understanding rather than just listing technical details.
         Avoid repeating raw technical information - instead provide meaningful interpretation."""),
-        
-        ("human", "Dataset Information:\n{data_info}")
-    ])
-    
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.3)
-    chain = prompt | llm
-    
-    response = chain.invoke({"data_info": technical_summary})
-    theoretical_summary = response.content
-    
-    print(f"DEBUG: Theoretical summary generated (len: {len(theoretical_summary)})")
-    
-    return {
-        "df_head": technical_summary,  # Store technical info for later use
-        "messages": [AIMessage(content=f"{theoretical_summary}")]
-    }
 
-def supervisor_node(state: AgentState):
-    """Decides which agent to call next."""
-    print("DEBUG: --- Node: Supervisor ---")
-    logger.info("--- Node: Supervisor ---")
-    messages = state['messages']
-    last_message = messages[-1]
-    
-    # Simple router for now: if last message is from user, go to planner.
-    # If from executor, go to summarizer (to show result) or end?
-    # Actually, let's make it simpler: User -> Planner -> Coder -> Executor -> Response
-    
-    return {}
+    ("human", "Dataset Information:\n{data_info}")
+])
+
+PLANNER_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You are a data analysis planner. Given a user query, dataframe summary, and conversation history, plan the steps to answer the query.
 
-def planner_node(state: AgentState):
-    """Breaks down the user query into steps."""
-    print("DEBUG: --- Node: Planner ---")
-    logger.info("--- Node: Planner ---")
-    messages = state['messages']
-    df_head = state.get('df_head', '')
-    
-    # Build conversation history for context
-    # Filter to get only user and AI message pairs (skip system messages)
-    conversation_history = []
-    for msg in messages[:-1]:  # Exclude the current user message
-        if hasattr(msg, 'content'):
-            role = "User" if msg.type == "human" else "Assistant"
-            conversation_history.append(f"{role}: {msg.content}")
-    
-    history_text = "\n".join(conversation_history[-6:]) if conversation_history else "No previous conversation"
-    
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", """You are a data analysis planner. Given a user query, dataframe summary, and conversation history, plan the steps to answer the query.
-        
 The available tool is python code execution on a dataframe 'df'.
 IMPORTANT: Use the conversation history to understand context and references (like "that", "those", "previous", etc.)
 Output a concise plan."""),
-        ("user", """Data Summary:
+    ("user", """Data Summary:
 {df_head}
 
 Previous Conversation:
 {history}
 
 Current Query: {query}""")
-    ])
-    
-    chain = prompt | llm
-    current_query = messages[-1].content
-    print(f"DEBUG: Invoking Planner LLM with query: {current_query}")
-    logger.info(f"Invoking Planner LLM with query: {current_query}")
-    response = chain.invoke({"df_head": df_head, "history": history_text, "query": current_query})
-    print(f"DEBUG: Planner Output: {response.content}")
-    logger.info(f"Planner Output: {response.content}")
-    return {"messages": [response]}
-
-def coder_node(state: AgentState):
-    """Generates Python code based on the plan."""
-    print("DEBUG: --- Node: Coder ---")
-    logger.info("--- Node: Coder ---")
-    messages = state['messages']
-    df_head = state.get('df_head', '')
-    plan = messages[-1].content
-    
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", """You are a Python data analyst. Write python code to analyze the dataframe 'df' based on the plan.
+])
 
-CRITICAL: Your code MUST always produce output. Never write code that doesn't show results.
+# Code-writing rules shared by the coder and the fused plan+code prompt
+CODER_INSTRUCTIONS = """CRITICAL: Your code MUST always produce output. Never write code that doesn't show results.
 
 FORMATTING RULES:
 1. For DataFrame results (like top N rows, filtered data, aggregations):
@@ -144,16 +94,16 @@ FORMATTING RULES:
      * color_discrete_sequence=['#FF6B9D', '#C44569', '#8E44AD', '#3742FA']
      * color_continuous_scale='Viridis' or 'Sunset' or 'Turbo'
    - For EACH plot, print insights in this EXACT format:
-     
+
      print("PLOT_INSIGHT_START")
      print("Title: [Short descriptive title]")
      print("Key Finding: [Main insight from this visualization]")
      print("Details: [2-3 sentences explaining what the plot shows]")
      print("PLOT_INSIGHT_END")
-     
+
      fig = px.histogram(df, x='Price', color_discrete_sequence=['#FF6B9D'])
      fig.show()
-   
+
    - Example with insights:
      print("PLOT_INSIGHT_START")
      print("Title: Price Distribution Analysis")
@@ -169,44 +119,70 @@ REMEMBER:
 - Use colorful, vibrant palettes
 - Insights must be data-driven and specific
 - Do NOT use markdown blocks like ```python - just return raw code
-The 'df' variable is already loaded."""),
-        ("user", "Data Summary:\n{df_head}\n\nPlan: {plan}")
-    ])
-    
-    chain = prompt | llm
-    print("DEBUG: Invoking Coder LLM...")
-    logger.info("Invoking Coder LLM...")
-    response = chain.invoke({"df_head": df_head, "plan": plan})
-    code = response.content.replace("```python", "").replace("```", "").strip()
-    print(f"DEBUG: Coder Output: {code}")
-    logger.info(f"Coder Output: {code}")
-    return {"analysis_code": code, "messages": [AIMessage(content=f"Generated Code:\n```python\n{code}\n```")]}
+The 'df' variable is already loaded."""
+
+# Appended to the data summary when `df` is a LazyFrame (see app/lazy_frame.py)
+LAZY_ENGINE_NOTES = """
+
+EXECUTION ENGINE: This dataset is too large for memory. 'df' is a lazy, DuckDB-backed frame, not a pandas DataFrame.
+- Supported and pushed down to the engine: df['col'], df[['a', 'b']], boolean filters (df[df['a'] > 5], &, |, ~, isin, between, isna, .str.contains/startswith, .dt.year/month/day), df['new'] = expression, sort_values(...).head(n), nlargest/nsmallest, groupby(...).agg/sum/mean/min/max/count/nunique/size (incl. named aggregation), value_counts(), unique(), describe(), sample(n), len(df), df.shape.
+- For anything else, write DuckDB SQL against the table df: result = df.sql("SELECT city, AVG(price) AS avg_price FROM df GROUP BY city")
+- Results of aggregations, head(), sample() and df.sql() are regular pandas objects: plot and post-process those, never df itself.
+- Never call df.to_pandas() without a limit, and do not pass df directly to plotting functions."""
+
+# Appended to the data summary when the upload has samples (see app/sampling.py)
+SAMPLING_NOTES = """
+
+SAMPLING: To answer quickly, 'df' may be a random sample of the dataset rather than all rows.
+- Means, medians, proportions (value_counts(normalize=True)), correlations and plots of shares need no adjustment.
+- Code that computes counts, sums, lengths, extremes, sorting, distinct values or looks up single rows is run on all rows automatically; write it as usual.
+- Do not mention sampling yourself; the result is labeled automatically."""
+
+# Appended when dtype optimization turned low-cardinality text columns into categoricals (see app/dtypes.py)
+CATEGORY_NOTES = """
+
+CATEGORICAL COLUMNS: {columns} have dtype 'category', not plain strings.
+- Convert with .astype(str) before string concatenation or .str methods that build new text (df['a'].astype(str) + '-' + df['b'].astype(str)).
+- Assigning a value that is not already a category fails: convert first (df['col'] = df['col'].astype(str)) or use .cat.add_categories."""
+
+CODER_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You are a Python data analyst. Write python code to analyze the dataframe 'df' based on the plan.
+
+""" + CODER_INSTRUCTIONS),
+    ("user", "Data Summary:\n{df_head}{engine_notes}\n\nPlan: {plan}")
+])
+
+FUSED_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You are a data analyst working with python code execution on a dataframe 'df'. Given a user query, dataframe summary, and conversation history, return BOTH a concise plan and the python code that carries it out.
+IMPORTANT: Use the conversation history to understand context and references (like "that", "those", "previous", etc.)
+
+Rules for the code:
+""" + CODER_INSTRUCTIONS),
+    ("user", """Data Summary:
+{df_head}{engine_notes}
+
+Previous Conversation:
+{history}
+
+Current Query: {query}""")
+])
+
+DEBUGGER_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You are a Python debugging expert. The following code failed with an error.
 
-def debugger_node(state: AgentState):
-    """Refines code based on errors."""
-    print("DEBUG: --- Node: Debugger ---")
-    logger.info("--- Node: Debugger ---")
-    messages = state['messages']
-    code = state['analysis_code']
-    error = state['error']
-    df_head = state.get('df_head', '')
-    
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", """You are a Python debugging expert. The following code failed with an error.
-        
         Your task is to FIX the code.
         1. Analyze the error message and the code.
         2. Rewrite the code to resolve the issue.
         3. Ensure the fixed code still fulfills the original goal.
         4. CRITICAL: Return ONLY the fixed python code. No markdown, no explanations.
-        
+
         Common Fixes:
         - "Value of 'names' is not the name of a column...": Use df.index if trying to plot the index, or check column names.
         - "No module named...": Use standard libraries or pandas/matplotlib/seaborn/plotly only.
         - Syntax errors: Fix indentation or missing brackets.
         """),
-        ("user", """Data Summary:
-        {df_head}
+    ("user", """Data Summary:
+        {df_head}{engine_notes}
 
         Failed Code:
         {code}
@@ -215,60 +191,352 @@ def debugger_node(state: AgentState):
         {error}
 
         Fix the code:""")
-            ])
-    
-    chain = prompt | llm
-    print("DEBUG: Invoking Debugger LLM...")
-    logger.info("Invoking Debugger LLM...")
-    response = chain.invoke({"df_head": df_head, "code": code, "error": error})
-    fixed_code = response.content.replace("```python", "").replace("```", "").strip()
-    
-    print(f"DEBUG: Debugger Output: {fixed_code}")
-    logger.info(f"Debugger Output: {fixed_code}")
-    
+])
+
+MEMORY_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You maintain the running memory of a data analysis conversation.
+Merge the older turns below into the existing summary. Keep the facts a follow-up question may refer to: what was asked, which columns, filters and groupings were used, and the key numbers found.
+Drop code and formatting. Reply with the updated summary only, in at most 120 words."""),
+    ("user", """Existing summary:
+{summary}
+
+Older turns:
+{turns}""")
+])
+
+def _model_for(model, state: AgentState):
+    """Returns the model, or an uncached copy when the request asked to bypass the response cache."""
+    if state.get('bypass_cache'):
+        return model.model_copy(update={"cache": False})
+    return model
+
+def _strip_code_fences(content: str) -> str:
+    return content.replace("```python", "").replace("```", "").strip()
+
+def _memoized_summary(state: AgentState):
+    """Summary result for a file already summarized in another session, or None."""
+    if state.get('bypass_cache'):
+        return None
+    memo = load_summary(state.get('content_hash'))
+    if memo is None:
+        return None
+    logger.debug("Reusing memoized summary")
+    return {"df_head": memo["df_head"], "schema": memo.get("schema"), "messages": [AIMessage(content=memo["summary"])]}
+
+def _summarizer_result(state: AgentState, technical_summary: str, schema, response):
+    theoretical_summary = response.content
+
+    logger.debug("Theoretical summary generated (len: %d)", len(theoretical_summary))
+    if schema is not None:
+        save_summary(state.get('content_hash'), technical_summary, theoretical_summary, schema)
+
+    return {
+        "df_head": technical_summary,  # Store technical info for later use
+        "schema": schema,  # Compact column profile used in planner/coder/debugger prompts
+        "messages": [AIMessage(content=f"{theoretical_summary}")]
+    }
+
+def _dataset_context(state: AgentState, query: str = "") -> str:
+    """Data Summary section for a prompt: the compact schema, trimmed to the token budget around `query`."""
+    schema = state.get('schema')
+    if not schema:
+        return state.get('df_head', '')
+    return render_schema_context(schema, query, settings.CONTEXT_TOKEN_BUDGET)
+
+def _engine_notes(state: AgentState) -> str:
+    """Extra coding instructions when generated code may run against a LazyFrame, a sample or categoricals."""
+    notes = LAZY_ENGINE_NOTES if use_lazy_engine(state['file_path']) else ""
+    if state.get('sampling'):
+        notes += SAMPLING_NOTES
+    categorical = [col["name"] for col in (state.get('schema') or {}).get("columns", []) if col["dtype"] == "category"]
+    if categorical:
+        notes += CATEGORY_NOTES.format(columns=", ".join(repr(name) for name in categorical))
+    return notes
+
+def _query_index(messages) -> int:
+    # The current query is the latest user message; after a failed fused
+    # attempt or inside the coder it is no longer the last message in the list
+    index = len(messages) - 1
+    while index > 0 and messages[index].type != "human":
+        index -= 1
+    return index
+
+async def asummarizer_node(state: AgentState):
+    """Generates an intelligent LLM-based summary of the uploaded data; profiling runs in a worker thread."""
+    logger.debug("--- Node: Summarizer ---")
+    memoized = _memoized_summary(state)
+    if memoized:
+        return memoized
+
+    technical_summary, schema = await asyncio.to_thread(profile_dataset, state['file_path'], state.get('session_id'))
+    logger.debug("Technical summary generated (len: %d)", len(technical_summary))
+
+    chain = SUMMARIZER_PROMPT | _model_for(summary_llm, state)
+    response = await chain.ainvoke({"data_info": technical_summary})
+    return _summarizer_result(state, technical_summary, schema, response)
+
+def supervisor_node(state: AgentState):
+    """Decides which agent to call next."""
+    logger.debug("--- Node: Supervisor ---")
+    messages = state['messages']
+    last_message = messages[-1]
+
+    # Simple router for now: if last message is from user, go to planner.
+    # If from executor, go to summarizer (to show result) or end?
+    # Actually, let's make it simpler: User -> Planner -> Coder -> Executor -> Response
+
+    return {}
+
+def _planner_inputs(state: AgentState) -> dict:
+    messages = state['messages']
+    query_index = _query_index(messages)
+
+    if 'memory' in state:
+        # Running summary plus the recent window: independent of session length
+        history_text = render_history(state['memory'])
+    else:
+        # Sessions from before conversation memory: fall back to the raw messages
+        conversation_history = []
+        for msg in messages[:query_index]:  # Exclude the current user message
+            if hasattr(msg, 'content'):
+                role = "User" if msg.type == "human" else "Assistant"
+                conversation_history.append(f"{role}: {msg.content}")
+        history_text = "\n".join(conversation_history[-6:]) if conversation_history else "No previous conversation"
+    current_query = messages[query_index].content
+    logger.debug("Invoking Planner LLM with query: %s", current_query)
+    return {"df_head": _dataset_context(state, current_query), "history": history_text, "query": current_query, "engine_notes": _engine_notes(state)}
+
+def _planner_result(response):
+    logger.debug("Planner Output: %s", response.content)
+    # A plan starts a fresh attempt at the query
+    return {"messages": [response], "fused": False, "error": None, "retry_count": 0}
+
+async def aplanner_node(state: AgentState):
+    """Breaks down the user query into steps."""
+    logger.debug("--- Node: Planner ---")
+    chain = PLANNER_PROMPT | _model_for(llm, state)
+    response = await chain.ainvoke(_planner_inputs(state))
+    return _planner_result(response)
+
+def _fused_result(result: PlanAndCode):
+    code = _strip_code_fences(result.code)
+    logger.debug("Fused Output: %s\n%s", result.plan, code)
     return {
-        "analysis_code": fixed_code, 
+        "analysis_code": code,
+        "fused": True,
+        "error": None,
+        "retry_count": 0,
+        "messages": [AIMessage(content=result.plan), AIMessage(content=f"Generated Code:\n```python\n{code}\n```")]
+    }
+
+def _fused_failure(error: Exception):
+    logger.warning("Fused call failed, falling back to planner: %s", error)
+    return {"fused": False, "error": f"Fused plan+code call failed: {error}"}
+
+async def afused_node(state: AgentState):
+    """Plans and writes the code in a single structured-output call."""
+    logger.debug("--- Node: Fused ---")
+    try:
+        chain = FUSED_PROMPT | _model_for(llm, state).with_structured_output(PlanAndCode)
+        result = await chain.ainvoke(_planner_inputs(state))
+    except Exception as e:
+        return _fused_failure(e)
+    return _fused_result(result)
+
+def _coder_inputs(state: AgentState) -> dict:
+    logger.debug("Invoking Coder LLM...")
+    messages = state['messages']
+    plan = messages[-1].content
+    query = messages[_query_index(messages)].content
+    return {"df_head": _dataset_context(state, f"{query}\n{plan}"), "plan": plan, "engine_notes": _engine_notes(state)}
+
+def _coder_result(response):
+    code = _strip_code_fences(response.content)
+    logger.debug("Coder Output: %s", code)
+    return {"analysis_code": code, "messages": [AIMessage(content=f"Generated Code:\n```python\n{code}\n```")]}
+
+async def acoder_node(state: AgentState):
+    """Generates Python code based on the plan."""
+    logger.debug("--- Node: Coder ---")
+    chain = CODER_PROMPT | _model_for(llm, state)
+    response = await chain.ainvoke(_coder_inputs(state))
+    return _coder_result(response)
+
+def _debugger_inputs(state: AgentState) -> dict:
+    logger.debug("Invoking Debugger LLM...")
+    return {
+        "df_head": _dataset_context(state, f"{state['analysis_code']}\n{state['error']}"),
+        "code": state['analysis_code'],
+        "error": state['error'],
+        "engine_notes": _engine_notes(state),
+    }
+
+def _debugger_result(response):
+    fixed_code = _strip_code_fences(response.content)
+
+    logger.debug("Debugger Output: %s", fixed_code)
+
+    return {
+        "analysis_code": fixed_code,
         "messages": [AIMessage(content=f"Debugger Fixed Code:\n```python\n{fixed_code}\n```")]
     }
 
-def executor_node(state: AgentState):
-    """Executes the generated code."""
-    print("DEBUG: --- Node: Executor ---")
-    logger.info("--- Node: Executor ---")
-    code = state['analysis_code']
-    file_path = state['file_path']
-    session_id = state.get('session_id', 'default')
+async def adebugger_node(state: AgentState):
+    """Refines code based on errors."""
+    logger.debug("--- Node: Debugger ---")
+    chain = DEBUGGER_PROMPT | _model_for(llm, state)
+    response = await chain.ainvoke(_debugger_inputs(state))
+    return _debugger_result(response)
+
+def _validator_result(state: AgentState):
+    if not settings.VALIDATE_CODE:
+        return {"error": None}
+    schema = state.get('schema') or {}
+    columns = [col["name"] for col in schema.get("columns", [])]
+    code, fixes, problems = validate_code(state['analysis_code'], columns, settings.COLUMN_MATCH_CUTOFF)
+
+    update = {}
+    messages = []
+    if fixes:
+        logger.info("Validator fixed column names: %s", fixes)
+        update["analysis_code"] = code
+        messages.append(AIMessage(content=f"Validator Fixed Code ({', '.join(fixes)}):\n```python\n{code}\n```"))
+    if problems:
+        # Counts as a failed attempt, exactly like a runtime error, but without running anything
+        retry_count = state.get('retry_count', 0)
+        error = "Validation failed:\n" + "\n".join(problems)
+        logger.info(error)
+        update.update({"error": error, "retry_count": retry_count + 1})
+        messages.append(AIMessage(content=f"Execution Error (Attempt {retry_count+1}): {error}"))
+    else:
+        update["error"] = None  # Clear the previous attempt's error so the code gets executed
+    if messages:
+        update["messages"] = messages
+    return update
+
+async def avalidator_node(state: AgentState):
+    """Statically checks generated code: syntax, imports and column names; the checks are cheap AST walks, so they run inline."""
+    logger.debug("--- Node: Validator ---")
+    return _validator_result(state)
+
+def _execution_sample(state: AgentState):
+    """The sample to run this code on, or None for all rows (no samples, exact requested or needed, or bound not met)."""
+    manifest = state.get('sampling')
+    if not manifest or state.get('exact'):
+        return None
+    error_bound = state.get('error_bound') or settings.SAMPLING_ERROR_BOUND
+    cardinality = {col["name"]: col["cardinality"] for col in (state.get('schema') or {}).get("columns", [])}
+    return select_sample(
+        manifest, samples_dir(state.get('content_hash')), error_bound, state['analysis_code'],
+        cardinality, settings.SAMPLING_MAX_STRATA,
+    )
+
+def _executor_result(state: AgentState, result: dict):
     retry_count = state.get('retry_count', 0)
-    
-    result = execute_python_code(code, file_path, session_id)
     output = result['output']
+    approximate = result.get('approximate')
     image = result['image']
     plotly_figures = result.get('plotly_figures', [])
-    
-    print(f"DEBUG: Executor Output: {output}")
-    logger.info(f"Executor Output: {output}")
-    
+
+    logger.debug("Executor Output: %s", output)
+
     # Check for execution errors
     if "Error executing code" in output or "System Error" in output:
-        print(f"DEBUG: Execution failed. Retry count: {retry_count}")
+        logger.info("Execution failed. Retry count: %d", retry_count)
         return {
             "error": output,
             "retry_count": retry_count + 1,
             "messages": [AIMessage(content=f"Execution Error (Attempt {retry_count+1}): {output}")]
         }
-    
+
     # Success! Clear error state
+    if approximate:
+        output = f"{approximate['label']}\n\n{output}"
     response_content = f"Execution Output:\n{output}"
     if image:
         response_content += "\n(Image generated)"
     if plotly_figures:
         response_content += f"\n({len(plotly_figures)} interactive plot(s) generated)"
-        
+
     return {
-        "analysis_output": output, 
-        "image_path": image, 
-        "plotly_html": plotly_figures, 
+        "analysis_output": output,
+        "image_path": image,
+        "plotly_html": plotly_figures,
+        "approximate": approximate,
         "error": None, # Clear error
         "retry_count": 0, # Reset retries
         "messages": [AIMessage(content=response_content)]
     }
+
+async def aexecutor_node(state: AgentState):
+    """Executes the generated code; execution blocks a worker thread, not the event loop."""
+    logger.debug("--- Node: Executor ---")
+    result = await asyncio.to_thread(
+        execute_python_code, state['analysis_code'], state['file_path'], state.get('session_id', 'default'),
+        state.get('content_hash'), not state.get('bypass_cache'), _execution_sample(state),
+    )
+    return _executor_result(state, result)
+
+
+def _index_result(state: AgentState, result):
+    if result is None:
+        return {"index_hit": False}
+    logger.info("Answered from the dataset index")
+    update = _executor_result(state, result)
+    # Nothing was generated, so there is no code for an exact rerun to repeat
+    update.update({"index_hit": True, "analysis_code": ""})
+    return update
+
+def _index_question(state: AgentState):
+    if not settings.INDEX_FAST_PATH or not state.get('messages'):
+        return None
+    return state['messages'][_query_index(state['messages'])].content
+
+async def aindex_node(state: AgentState):
+    """Answers distribution/count/most-common/correlation/stat questions from the upload's precomputed index; reading the index and serializing figures run in a worker thread."""
+    logger.debug("--- Node: Index ---")
+    question = _index_question(state)
+    if question is None:
+        return {"index_hit": False}
+    result = await asyncio.to_thread(
+        answer_from_dataset_index, state.get('content_hash'), question, state.get('session_id', 'default'),
+    )
+    return _index_result(state, result)
+
+
+def _turn_update(state: AgentState, turn_messages: list):
+    """Compacts the finished turn into memory. Returns (memory, evicted_turns)."""
+    messages = state['messages']
+    query = messages[_query_index(messages)].content if messages else ""
+    turn = compact_turn(query, turn_messages, settings.MEMORY_TURN_MAX_CHARS)
+    return add_turn(state.get('memory') or new_memory(), turn, settings.MEMORY_WINDOW_TURNS)
+
+def _memory_result(state: AgentState, memory: dict):
+    # Stored messages: the dataset summary shown on connect, then the compact window
+    pinned = []
+    for msg in state['messages']:
+        if msg.type == "human":
+            break
+        pinned.append(msg)
+    return {"memory": memory, "messages": pinned + window_messages(memory)}
+
+def _folded_summary(memory: dict, summary: str) -> dict:
+    return {"summary": summary.strip()[:settings.MEMORY_SUMMARY_MAX_CHARS], "turns": memory["turns"]}
+
+def _fallback_summary(memory: dict, evicted: list, error: Exception) -> dict:
+    logger.warning("Memory summary failed, keeping queries only: %s", error)
+    summary = " ".join([memory["summary"]] + [f"Asked: {t['user']}" for t in evicted]).strip()
+    return {"summary": summary[-settings.MEMORY_SUMMARY_MAX_CHARS:], "turns": memory["turns"]}
+
+async def aremember_turn(state: AgentState, turn_messages: list):
+    """Folds a finished turn into the conversation memory and compacts the stored messages."""
+    memory, evicted = _turn_update(state, turn_messages)
+    if evicted:
+        with track_node("memory"):
+            try:
+                chain = MEMORY_PROMPT | _model_for(summary_llm, state)
+                response = await chain.ainvoke({"summary": memory["summary"] or "None yet", "turns": render_turns(evicted)})
+                memory = _folded_summary(memory, response.content)
+            except Exception as e:
+                memory = _fallback_summary(memory, evicted, e)
+    return _memory_result(state, memory)
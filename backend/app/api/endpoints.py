@@ -1,13 +1,27 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, UploadFile, File, HTTPException, WebSocket, WebSocketDisconnect, Request, Query
+from fastapi.responses import FileResponse, Response
+from fastapi.concurrency import run_in_threadpool
 from app.models import ChatRequest, ChatResponse
-from app.agents.graph import app_graph
-from app.agents.nodes import summarizer_node
+from app.agents.graph import get_graph
 from app.core.config import settings
-import shutil
+from app.ingest import convert_to_columnar
+from app.storage import UploadWriter, load_summary, CHUNK_SIZE
+from app.session_store import build_session_store
+from app.artifacts import artifact_path, media_type
+from app.agents.nodes import response_cache, aremember_turn, asummarizer_node
+from app.jobs import JobQueue, DONE, PRIORITY_INTERACTIVE, PRIORITY_SMALL, PRIORITY_LARGE
+from app.memory import new_memory
+from app.metrics import track_stage, track_node
+from app.tools import df_cache, result_cache, use_lazy_engine, optimize_frame, dtype_report, load_dataframe, build_dataset_index
+from app.sampling import ensure_samples
+from app.profiling import is_streamable
+from typing import Optional
+import asyncio
+import functools
 import os
 import uuid
-from langchain_core.messages import HumanMessage
-import traceback
+import weakref
+from langchain_core.messages import HumanMessage, AIMessage
 import json
 import logging
 
@@ -15,53 +29,172 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# In-memory storage for session state (for demo purposes)
-session_store = {}
+# Session state: bounded in memory, persisted to SQLite so workers can share it
+session_store = build_session_store(
+    settings.SESSION_BACKEND,
+    settings.SESSION_DB_PATH,
+    settings.SESSION_MEMORY_MAX_BYTES,
+    settings.SESSION_IDLE_TTL_SECONDS,
+    settings.SESSION_DISK_TTL_SECONDS,
+)
+
+# Upload post-processing runs here, at most INGEST_WORKERS jobs at a time
+ingest_queue = JobQueue(settings.INGEST_WORKERS, settings.INGEST_JOB_HISTORY)
+
+# Jobs are shared per content and sampling option; jobs for the same content still run one at a
+# time, so the later one finds the columnar copy, index and summary ready instead of rewriting them
+_ingest_locks = weakref.WeakValueDictionary()
+
+async def _ingest_upload(job, file_path: str, content_hash: str, session_id: str, sampling: bool):
+    """Runs the ingestion job once no other job is ingesting the same content."""
+    lock = _ingest_locks.get(content_hash)
+    if lock is None:
+        lock = _ingest_locks[content_hash] = asyncio.Lock()
+    async with lock:
+        return await _ingest_content(job, file_path, content_hash, session_id, sampling)
+
+
+async def _ingest_content(job, file_path: str, content_hash: str, session_id: str, sampling: bool):
+    """Background ingestion: columnar copy, samples, dataset index, then profile and LLM summary."""
+    # Convert once to a columnar copy so later turns memory-map it instead of re-parsing.
+    # Files handled by the out-of-core engine are scanned by DuckDB directly instead.
+    if not use_lazy_engine(file_path):
+        job.report("columnar", "Converting to columnar format...")
+        with track_stage("ingest", "columnar"):
+            await run_in_threadpool(convert_to_columnar, file_path, optimize_frame if settings.OPTIMIZE_DTYPES else None)
+
+    sample_manifest = None
+    if sampling and is_streamable(file_path):
+        job.report("sampling", "Building samples...")
+        with track_stage("ingest", "sampling"):
+            sample_manifest = await run_in_threadpool(
+                ensure_samples, file_path, content_hash, settings.SAMPLE_SIZES,
+                settings.PROFILE_CHUNK_ROWS, settings.SAMPLING_MAX_STRATA,
+            )
+
+    # Precompute per-column statistics once so common questions skip the LLM and the full scan
+    if settings.DATASET_INDEX:
+        job.report("index", "Indexing columns...")
+        with track_stage("ingest", "index"):
+            await run_in_threadpool(build_dataset_index, file_path, content_hash)
+
+    job.report("summary", "Profiling and summarizing your data...")
+    with track_node("summarizer"):
+        summary = await asummarizer_node({"file_path": file_path, "content_hash": content_hash, "session_id": session_id})
+    return {
+        "df_head": summary["df_head"],
+        "schema": summary.get("schema"),
+        "summary": summary["messages"][0].content,
+        "sampling": sample_manifest,
+    }
+
+
+async def apply_ingest_result(file_id: str, job):
+    """Copies a finished ingestion job's outcome into the session (once) and returns the session state."""
+    state = await session_store.aget(file_id)
+    if state is None or job is None or not job.finished or state.get("ingest_job") != job.id:
+        return state
+    if job.status == DONE:
+        result = job.result
+        state["sampling"] = result["sampling"]
+        if not state.get("df_head"):
+            state["df_head"] = result["df_head"]
+            state["schema"] = result["schema"]
+            state["messages"] = [AIMessage(content=result["summary"])] + state["messages"]
+    state["ingest_job"] = None
+    await session_store.aset(file_id, state)
+    return state
+
+
+async def wait_for_ingestion(file_id: str, state: dict):
+    """Waits for the session's ingestion job, if one is pending, and returns the updated state."""
+    job = ingest_queue.get(state.get("ingest_job"))
+    if job is None:
+        return state
+    ingest_queue.prioritize(job.id, PRIORITY_INTERACTIVE)
+    await job.wait()
+    return await apply_ingest_result(file_id, job)
+
 
 @router.post("/upload")
-async def upload_file(file: UploadFile = File(...)):
+async def upload_file(file: UploadFile = File(...), sampling: Optional[bool] = Query(None)):
     try:
         # Generate session ID
         session_id = str(uuid.uuid4())
-        
-        # Create session-specific directory
-        session_dir = os.path.join(settings.UPLOAD_DIR, session_id)
-        os.makedirs(session_dir, exist_ok=True)
-        
-        # Use original filename
         original_filename = file.filename
-        file_path = os.path.join(session_dir, original_filename)
         
-        # Check if file already exists
-        if os.path.exists(file_path):
-            # File already exists, reuse it (no duplication)
-            print(f"File already exists: {file_path}, reusing...")
+        # Store by content hash: identical data is kept once and reused. Chunks are awaited
+        # from the request and processed (decompress, hash, sniff, count) off the event loop.
+        writer = UploadWriter(settings.UPLOAD_MAX_BYTES)
+        try:
+            while True:
+                chunk = await file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                await run_in_threadpool(writer.write, chunk)
+            content_hash, file_path, is_new, upload_meta = await run_in_threadpool(writer.finish)
+        except ValueError as e:
+            writer.abort()
+            raise HTTPException(status_code=400, detail=str(e))
+        except BaseException:
+            writer.abort()
+            raise
+        if is_new:
+            logger.info("Saved new file: %s", file_path)
         else:
-            # Save the new file
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            print(f"Saved new file: {file_path}")
+            logger.info("File already exists: %s, reusing...", file_path)
+        
+        # Sampling mode: build nested uniform/stratified samples once per content hash
+        if sampling is None:
+            sampling = settings.SAMPLING_MODE == "always" or (
+                settings.SAMPLING_MODE == "auto" and upload_meta["bytes"] > settings.SAMPLING_MIN_BYTES
+            )
             
         # Initialize state for this session with session_id
-        # Don't generate summary yet - let WebSocket handle it for better UX
+        # Parsing, profiling and the summary run in the ingestion queue, not on this request
         initial_state = {
             "messages": [],
             "file_path": file_path,
             "session_id": session_id,
+            "content_hash": content_hash,
             "df_head": "",
+            "memory": new_memory(),
+            "sampling": None,
             "analysis_code": "",
             "analysis_output": "",
             "image_path": ""
         }
         
-        session_store[session_id] = initial_state
+        # Seen this file before: the session starts with the memoized summary
+        memo = load_summary(content_hash)
+        if memo:
+            initial_state["df_head"] = memo["df_head"]
+            initial_state["schema"] = memo.get("schema")
+            initial_state["messages"] = [AIMessage(content=memo["summary"])]
+        
+        # Identical content and sampling option share one pending job; small files run ahead of large ones
+        priority = PRIORITY_SMALL if upload_meta["bytes"] <= settings.STREAMING_PROFILE_THRESHOLD_BYTES else PRIORITY_LARGE
+        job = ingest_queue.submit(
+            f"ingestion of {original_filename}",
+            functools.partial(_ingest_upload, file_path=file_path, content_hash=content_hash, session_id=session_id, sampling=sampling),
+            priority,
+            key=f"{content_hash}:{'sampled' if sampling else 'full'}",
+        )
+        initial_state["ingest_job"] = job.id
+        await session_store.aset(session_id, initial_state)
         
         # Return immediately so frontend can show chat interface
         return {
             "message": "File uploaded successfully",
             "file_id": session_id,
-            "filename": original_filename
+            "job_id": job.id,
+            "filename": original_filename,
+            "format": upload_meta.get("format"),
+            "compression": upload_meta.get("compression"),
+            "rows": upload_meta.get("rows")
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -70,37 +203,92 @@ async def upload_file(file: UploadFile = File(...)):
 @router.post("/chat/{file_id}", response_model=ChatResponse)
 async def chat(file_id: str, request: ChatRequest):
     # Keep existing endpoint for backward compatibility or fallback
-    if file_id not in session_store:
+    state = await session_store.aget(file_id)
+    if state is None:
         raise HTTPException(status_code=404, detail="Session not found. Please upload a file first.")
     
     try:
-        state = session_store[file_id]
+        state = await wait_for_ingestion(file_id, state)
         
         # Add user message
         user_message = HumanMessage(content=request.message)
         state["messages"].append(user_message)
+        state["bypass_cache"] = request.bypass_cache
+        state["error_bound"] = request.error_bound
+        state["exact"] = request.exact
         
         # Run the graph
         inputs = state
-        result = app_graph.invoke(inputs)
-        
-        # Update state
-        session_store[file_id] = result
+        result = await get_graph(request.mode).ainvoke(inputs)
         
         # Get the last message (from executor)
         last_message = result["messages"][-1]
         response_text = last_message.content
         
+        # Update state, folding this turn into conversation memory
+        turn_messages = result["messages"][len(state["messages"]):]
+        result.update(await aremember_turn(result, turn_messages))
+        
         # Include image if present
         history = []
         if result.get("image_path"):
             history.append({"type": "image", "data": result["image_path"]})
             # Reset image path so it doesn't persist to next turn unless regenerated
             result["image_path"] = ""
-            session_store[file_id] = result
+        await session_store.aset(file_id, result)
             
         return ChatResponse(response=response_text, history=history)
     except Exception as e:
-        print("Error processing chat request:")
-        traceback.print_exc()
+        logger.exception("Error processing chat request")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss metrics for the LLM response cache, the DataFrame cache and the session store."""
+    return {
+        "llm_responses": response_cache.stats() if response_cache is not None else None,
+        "dataframes": df_cache.stats(),
+        "results": result_cache.stats(),
+        "ingestion": ingest_queue.stats(),
+        "sessions": session_store.stats()
+    }
+
+
+@router.get("/memory/{file_id}")
+async def memory_report(file_id: str):
+    """Per-column memory saved by dtype optimization of the session's dataset."""
+    state = await session_store.aget(file_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    file_path = state["file_path"]
+    if use_lazy_engine(file_path):
+        raise HTTPException(status_code=409, detail="Dataset is queried out-of-core and never loaded into memory")
+    report = dtype_report(file_path)
+    if report is None:
+        # Not loaded in this process yet: loading records the report
+        await run_in_threadpool(load_dataframe, file_path, file_id)
+        report = dtype_report(file_path)
+    return {"optimized": settings.OPTIMIZE_DTYPES, "report": report}
+
+
+@router.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    """Status of a background ingestion job."""
+    job = ingest_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.snapshot()
+
+
+@router.get("/artifacts/{session_id}/{artifact_id}")
+async def get_artifact(session_id: str, artifact_id: str, request: Request):
+    """Serves a rendered plot. Artifact ids are content hashes, so they are immutable and double as ETags."""
+    path = artifact_path(session_id, artifact_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Artifact not found")
+    etag = f'"{artifact_id}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=media_type(artifact_id), headers=headers)
@@ -0,0 +1,60 @@
+import hashlib
+import os
+import re
+import shutil
+from app.core.config import settings
+
+# Artifact ids are content hashes plus an extension, so they double as ETags
+ARTIFACT_ID_RE = re.compile(r"^[0-9a-f]{32}\.(png|json)$")
+SESSION_ID_RE = re.compile(r"^[A-Za-z0-9_-]+$")
+
+MEDIA_TYPES = {"png": "image/png", "json": "application/json"}
+
+
+def artifacts_dir(session_id: str) -> str:
+    return os.path.join(settings.UPLOAD_DIR, 'plots', session_id or 'default')
+
+
+def artifact_url(session_id: str, artifact_id: str) -> str:
+    return f"{settings.API_V1_STR}/artifacts/{session_id or 'default'}/{artifact_id}"
+
+
+def save_artifact(session_id: str, data: bytes, ext: str) -> dict:
+    """Writes a rendered plot once under uploads/plots/<session_id> and returns its reference."""
+    artifact_id = f"{hashlib.sha256(data).hexdigest()[:32]}.{ext}"
+    directory = artifacts_dir(session_id)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, artifact_id)
+    if not os.path.exists(path):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return {"id": artifact_id, "url": artifact_url(session_id, artifact_id)}
+
+
+def copy_artifact(src_session_id: str, dst_session_id: str, artifact_id: str):
+    """Copies an artifact into another session's directory and returns its reference, or None if it's gone."""
+    src = os.path.join(artifacts_dir(src_session_id), artifact_id)
+    directory = artifacts_dir(dst_session_id)
+    dst = os.path.join(directory, artifact_id)
+    if not os.path.exists(dst):
+        if not os.path.exists(src):
+            return None
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = dst + '.tmp'
+        shutil.copyfile(src, tmp_path)
+        os.replace(tmp_path, dst)
+    return {"id": artifact_id, "url": artifact_url(dst_session_id, artifact_id)}
+
+
+def artifact_path(session_id: str, artifact_id: str):
+    """Filesystem path of an artifact, or None if the ids are malformed or it doesn't exist."""
+    if not SESSION_ID_RE.match(session_id or '') or not ARTIFACT_ID_RE.match(artifact_id or ''):
+        return None
+    path = os.path.join(artifacts_dir(session_id), artifact_id)
+    return path if os.path.exists(path) else None
+
+
+def media_type(artifact_id: str) -> str:
+    return MEDIA_TYPES[artifact_id.rsplit('.', 1)[1]]
@@ -1,4 +1,5 @@
 import os
+from typing import Dict, List
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv, find_dotenv
 
@@ -14,6 +15,116 @@ class Settings(BaseSettings):
 
     UPLOAD_DIR: str = os.path.join(os.getcwd(), "uploads")
 
+    # Largest accepted upload, measured after gzip/zstd decompression
+    UPLOAD_MAX_BYTES: int = 20 * 1024 ** 3
+
+    # Background ingestion (columnar copy, samples, index, summary): concurrent jobs
+    # and how many finished jobs are kept for status queries
+    INGEST_WORKERS: int = 2
+    INGEST_JOB_HISTORY: int = 1000
+
+    # Upper bound on memory held by the per-session DataFrame cache
+    DF_CACHE_MAX_BYTES: int = 2 * 1024 ** 3
+
+    # Compact dtypes when a dataset is first parsed: int downcasting (never below
+    # DTYPE_INT_MIN_BITS, and only where products can't overflow), date parsing,
+    # categoricals for text with at most this share of distinct values, Arrow strings otherwise.
+    # DTYPE_FLOAT32 also narrows floats whose values fit exactly, but sums and cumsums then
+    # accumulate in float32 and drift, so it is off by default
+    OPTIMIZE_DTYPES: bool = True
+    DTYPE_CATEGORY_MAX_RATIO: float = 0.05
+    DTYPE_INT_MIN_BITS: int = 32
+    DTYPE_FLOAT32: bool = False
+
+    # Files larger than this are profiled in chunks instead of being loaded whole
+    STREAMING_PROFILE_THRESHOLD_BYTES: int = 256 * 1024 ** 2
+    PROFILE_CHUNK_ROWS: int = 100_000
+
+    # Sandboxed code execution: number of worker processes (0 runs code in-process)
+    # and the per-call CPU time, memory and wall-clock limits
+    EXECUTOR_POOL_SIZE: int = 2
+    EXECUTOR_CPU_SECONDS: int = 60
+    EXECUTOR_MEMORY_BYTES: int = 4 * 1024 ** 3
+    EXECUTOR_TIMEOUT_SECONDS: float = 120.0
+
+    # Execution engine for `df`: "pandas", "duckdb" (lazy, out-of-core) or "auto",
+    # which switches to DuckDB for uploads larger than the threshold
+    EXECUTION_ENGINE: str = "auto"
+    LAZY_ENGINE_THRESHOLD_BYTES: int = 2 * 1024 ** 3
+    LAZY_ENGINE_MEMORY_LIMIT: str = "2GB"
+    LAZY_RESULT_ROWS: int = 50
+
+    # Approximate answers: "auto" builds samples at upload for files above SAMPLING_MIN_BYTES,
+    # "always"/"off" force it; questions then run on the smallest sample meeting the error bound.
+    # SAMPLING_ERROR_BOUND is a margin on proportions and shares (absolute, 0.01 = ±1 percentage
+    # point at 95% confidence, worst case p=0.5); it is not a relative error on means or sums
+    SAMPLING_MODE: str = "auto"
+    SAMPLING_MIN_BYTES: int = 256 * 1024 ** 2
+    SAMPLE_SIZES: List[int] = [10_000, 100_000, 1_000_000]
+    SAMPLING_ERROR_BOUND: float = 0.01
+    SAMPLING_MAX_STRATA: int = 50
+
+    # Dataset index built at upload (histograms, top values, quantiles, correlations);
+    # the fast path answers "distribution of X" / "count by X" style questions from it
+    DATASET_INDEX: bool = True
+    INDEX_FAST_PATH: bool = True
+    INDEX_HISTOGRAM_BINS: int = 30
+    INDEX_TOP_K: int = 50
+    INDEX_MAX_TRACKED_VALUES: int = 10_000
+    INDEX_MAX_CORRELATION_COLUMNS: int = 30
+    INDEX_QUANTILE_SAMPLE: int = 100_000
+
+    # Threads used to render figures in parallel inside each executor
+    RENDER_THREADS: int = 4
+
+    # Results of side-effect-free code, keyed by dataset content and code AST
+    RESULT_CACHE_MAX_BYTES: int = 64 * 1024 ** 2
+
+    # LLM response cache: "tiered" (memory LRU + SQLite), "memory", or "none"
+    LLM_CACHE_BACKEND: str = "tiered"
+    LLM_CACHE_MAX_ENTRIES: int = 1024
+    LLM_CACHE_PATH: str = os.path.join(os.getcwd(), "cache", "llm_cache.sqlite3")
+    LLM_CACHE_TTL_SECONDS: float = 7 * 24 * 3600
+
+    # Session store: "sqlite" (bounded memory tier over a shared SQLite file) or "memory"
+    SESSION_BACKEND: str = "sqlite"
+    SESSION_DB_PATH: str = os.path.join(os.getcwd(), "cache", "sessions.sqlite3")
+    SESSION_MEMORY_MAX_BYTES: int = 256 * 1024 ** 2
+    SESSION_IDLE_TTL_SECONDS: float = 3600
+    SESSION_DISK_TTL_SECONDS: float = 7 * 24 * 3600
+
+    # Chat graph: "two_stage" (planner then coder) or "fused" (one plan+code call)
+    GRAPH_MODE: str = "two_stage"
+
+    # Token budget for the dataset schema included in planner/coder/debugger prompts
+    CONTEXT_TOKEN_BUDGET: int = 1500
+
+    # Check generated code (syntax, imports, column names) before running it; near-miss
+    # column names at or above the difflib cutoff are corrected without an LLM call
+    VALIDATE_CODE: bool = True
+    COLUMN_MATCH_CUTOFF: float = 0.8
+
+    # Conversation memory: recent turns kept verbatim (compacted), older ones folded into a running summary
+    MEMORY_WINDOW_TURNS: int = 3
+    MEMORY_TURN_MAX_CHARS: int = 600
+    MEMORY_SUMMARY_MAX_CHARS: int = 1500
+
+    # Forward LLM tokens from these nodes over the WebSocket, batched into frames
+    STREAM_TOKENS: bool = True
+    STREAM_TOKEN_NODES: List[str] = ["planner", "coder"]
+    STREAM_FRAME_INTERVAL_SECONDS: float = 0.05
+
+    # Per-node/tool latency, token and peak-RSS histograms on /metrics, and per-turn timings in result frames
+    METRICS_ENABLED: bool = True
+
+    # Logging goes through a queue to one writer thread. Per-module levels override LOG_LEVEL,
+    # e.g. LOG_LEVELS='{"app.tools": "DEBUG"}'; LOG_FORMAT is "text" or "json".
+    # Each DEBUG call site logs its first record and then every LOG_DEBUG_SAMPLE_EVERY-th one.
+    LOG_LEVEL: str = "INFO"
+    LOG_LEVELS: Dict[str, str] = {}
+    LOG_FORMAT: str = "text"
+    LOG_DEBUG_SAMPLE_EVERY: int = 1
+
     class Config:
         case_sensitive = True
 
@@ -0,0 +1,92 @@
+import os
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+# Copy-on-write makes shallow copies safe to hand out: any mutation in generated
+# code materializes new data instead of writing into the cached frame.
+# pandas >= 3 always behaves this way and no longer accepts the option.
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+
+def file_fingerprint(file_path: str) -> tuple:
+    """Returns (mtime_ns, size) so a re-written file never hits a stale entry."""
+    stat = os.stat(file_path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def frame_nbytes(df: pd.DataFrame) -> int:
+    """Deep memory footprint of a DataFrame in bytes."""
+    return int(df.memory_usage(deep=True).sum())
+
+
+class DataFrameCache:
+    """Session-scoped LRU cache of parsed DataFrames bounded by total memory.
+
+    Entries are keyed by session id and validated against the file's mtime and
+    size. Callers always receive a copy-on-write view of the cached frame.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # session_key -> (fingerprint, df, nbytes)
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, session_key: str, file_path: str, loader) -> pd.DataFrame:
+        """Returns the cached frame for the session, loading it with `loader(file_path)` on a miss."""
+        fingerprint = file_fingerprint(file_path)
+        with self._lock:
+            entry = self._entries.get(session_key)
+            if entry is not None and entry[0] == fingerprint:
+                self._entries.move_to_end(session_key)
+                self.hits += 1
+                return entry[1].copy(deep=False)
+            self.misses += 1
+
+        df = loader(file_path)
+        self.put(session_key, fingerprint, df)
+        return df.copy(deep=False)
+
+    def put(self, session_key: str, fingerprint: tuple, df: pd.DataFrame):
+        """Stores a frame and evicts least recently used entries until under budget."""
+        nbytes = frame_nbytes(df)
+        with self._lock:
+            self._discard(session_key)
+            if nbytes > self.max_bytes:
+                # Larger than the whole budget: serve it uncached
+                return
+            self._entries[session_key] = (fingerprint, df, nbytes)
+            self.current_bytes += nbytes
+            while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+                self.evictions += 1
+
+    def invalidate(self, session_key: str):
+        """Drops the cached frame for a session, if any."""
+        with self._lock:
+            self._discard(session_key)
+
+    def _discard(self, session_key: str):
+        entry = self._entries.pop(session_key, None)
+        if entry is not None:
+            self.current_bytes -= entry[2]
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current memory usage."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
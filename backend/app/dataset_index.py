@@ -0,0 +1,409 @@
+import json
+import os
+import re
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+from app.ingest import load_file
+from app.profiling import RunningMoments, ReservoirSample, is_streamable, iter_chunks
+from app.storage import blob_dir
+
+INDEX_NAME = "index.json"
+INDEX_VERSION = 1
+QUANTILES = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+
+
+def index_path(content_hash: str) -> str:
+    return os.path.join(blob_dir(content_hash), INDEX_NAME)
+
+
+def _is_numeric(series: pd.Series) -> bool:
+    return pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+
+
+def _chunk_source(file_path: str, chunk_rows: int):
+    """Callable returning a fresh chunk iterator; non-streamable files (Excel) are loaded once."""
+    if is_streamable(file_path):
+        return lambda: iter_chunks(file_path, chunk_rows)
+    df = load_file(file_path)
+    return lambda: iter([df])
+
+
+class ValueCounter:
+    """Exact value counts of one column, abandoned once it holds more than max_values distinct values."""
+
+    def __init__(self, max_values: int):
+        self.max_values = max_values
+        self.counts = pd.Series(dtype="int64")
+
+    def update(self, series: pd.Series):
+        if self.counts is None:
+            return
+        chunk_counts = series.dropna().astype(str).value_counts()
+        self.counts = self.counts.add(chunk_counts, fill_value=0)
+        if len(self.counts) > self.max_values:
+            self.counts = None
+
+    def top(self, k: int):
+        if self.counts is None:
+            return None
+        top = self.counts.sort_values(ascending=False, kind="stable").head(k)
+        return [[value, int(count)] for value, count in top.items()]
+
+
+class CorrelationAccumulator:
+    """Pairwise-complete Pearson correlations of numeric columns, from running sums (one pass)."""
+
+    def __init__(self, columns: list):
+        k = len(columns)
+        self.columns = columns
+        self.n = np.zeros((k, k))
+        self.sx = np.zeros((k, k))
+        self.sxx = np.zeros((k, k))
+        self.sxy = np.zeros((k, k))
+
+    def update(self, chunk: pd.DataFrame):
+        values = chunk[self.columns].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+        present = (~np.isnan(values)).astype(float)
+        filled = np.nan_to_num(values)
+        # Entry (i, j) only sums over rows where both column i and column j are present
+        self.n += present.T @ present
+        self.sx += filled.T @ present
+        self.sxx += (filled ** 2).T @ present
+        self.sxy += filled.T @ filled
+
+    def matrix(self) -> list:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cov = self.n * self.sxy - self.sx * self.sx.T
+            var_x = self.n * self.sxx - self.sx ** 2
+            corr = cov / np.sqrt(var_x * var_x.T)
+        corr = np.clip(corr, -1.0, 1.0)
+        return [[None if np.isnan(v) else round(float(v), 4) for v in row] for row in corr]
+
+
+def build_index(file_path: str, chunk_rows: int = 100_000, bins: int = 30, top_k: int = 20,
+                max_values: int = 10_000, max_corr_columns: int = 30, quantile_sample: int = 100_000) -> dict:
+    """Profiles the whole upload into a JSON-serializable index.
+
+    Pass one collects exact counts, moments, value counts (up to max_values
+    distinct values per column) and correlations; pass two bins numeric
+    columns between their exact min and max. Quantiles come from a reservoir
+    and are exact whenever the column has at most quantile_sample values.
+    """
+    chunks = _chunk_source(file_path, chunk_rows)
+    columns = None
+    numeric = []
+    total_rows = 0
+    nulls, dtypes, counters, moments, samples, sums = {}, {}, {}, {}, {}, {}
+    correlations = None
+
+    for chunk in chunks():
+        if columns is None:
+            columns = [col for col in chunk.columns if isinstance(col, str)]
+            numeric = [col for col in columns if _is_numeric(chunk[col])]
+            for col in columns:
+                nulls[col] = 0
+                dtypes[col] = str(chunk[col].dtype)
+                counters[col] = ValueCounter(max_values)
+            for col in numeric:
+                moments[col] = RunningMoments()
+                samples[col] = ReservoirSample(quantile_sample)
+                # Integer columns keep an exact integer total
+                sums[col] = 0 if pd.api.types.is_integer_dtype(chunk[col]) else 0.0
+            if len(numeric) > 1:
+                correlations = CorrelationAccumulator(numeric[:max_corr_columns])
+        total_rows += len(chunk)
+        for col in columns:
+            series = chunk[col]
+            nulls[col] += int(series.isna().sum())
+            counters[col].update(series)
+            if col in moments:
+                # Later CSV chunks may infer another dtype; stray text counts as missing
+                values = pd.to_numeric(series, errors="coerce").dropna()
+                sums[col] += int(values.sum()) if isinstance(sums[col], int) and pd.api.types.is_integer_dtype(values) else float(values.sum())
+                values = values.to_numpy(dtype=float)
+                moments[col].update(values)
+                samples[col].update(values)
+        if correlations is not None:
+            correlations.update(chunk)
+
+    if columns is None:
+        raise ValueError("File contains no data.")
+
+    histograms = {}
+    for col in numeric:
+        m = moments[col]
+        if m.count:
+            histograms[col] = np.zeros(bins, dtype=np.int64)
+    if histograms:
+        for chunk in chunks():
+            for col in histograms:
+                values = pd.to_numeric(chunk[col], errors="coerce").dropna().to_numpy(dtype=float)
+                low, high = float(moments[col].min), float(moments[col].max)
+                counts, _ = np.histogram(values, bins=bins, range=(low, high) if high > low else (low - 0.5, low + 0.5))
+                histograms[col] += counts
+
+    index = {"version": INDEX_VERSION, "total_rows": total_rows, "columns": {}, "correlations": None}
+    for col in columns:
+        entry = {"dtype": dtypes[col], "count": total_rows - nulls[col], "nulls": nulls[col]}
+        counts = counters[col].counts
+        entry["distinct"] = int(len(counts)) if counts is not None else None
+        entry["top"] = counters[col].top(top_k)
+        if col in histograms:
+            m = moments[col]
+            low, high = float(m.min), float(m.max)
+            edges = np.linspace(low, high, bins + 1) if high > low else np.linspace(low - 0.5, low + 0.5, bins + 1)
+            entry["numeric"] = {
+                "min": low,
+                "max": high,
+                "mean": m.mean,
+                "std": None if np.isnan(m.std) else m.std,
+                "sum": sums[col],
+                "quantiles": {str(q): float(v) for q, v in zip(QUANTILES, samples[col].quantiles(QUANTILES))},
+                "quantiles_exact": m.count <= quantile_sample,
+                "histogram": {"edges": [float(e) for e in edges], "counts": histograms[col].tolist()},
+            }
+        index["columns"][col] = entry
+    if correlations is not None:
+        index["correlations"] = {"columns": correlations.columns, "matrix": correlations.matrix()}
+    return index
+
+
+def save_index(content_hash: str, index: dict):
+    path = index_path(content_hash)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp_path, path)
+
+
+@lru_cache(maxsize=64)
+def _read_index(path: str, mtime_ns: int):
+    with open(path) as f:
+        return json.load(f)
+
+
+def load_index(content_hash: str):
+    """The dataset index of an upload, or None if it hasn't been built. Parsed files are cached per mtime."""
+    if not content_hash:
+        return None
+    path = index_path(content_hash)
+    try:
+        index = _read_index(path, os.stat(path).st_mtime_ns)
+    except (OSError, ValueError):
+        return None
+    return index if index.get("version") == INDEX_VERSION else None
+
+
+def ensure_index(file_path: str, content_hash: str, **options):
+    """Returns the upload's index, building it on first use. Indexes are shared by content hash."""
+    index = load_index(content_hash)
+    if index is None:
+        index = build_index(file_path, **options)
+        save_index(content_hash, index)
+    return index
+
+
+# --- Fast path: questions answerable from the index alone ---
+
+_LEAD = r"^(?:please\s+)?(?:show|plot|display|give|list|tell|what\s+is|what's|what\s+are|visuali[sz]e)?\s*(?:me\s+)?(?:the\s+)?"
+_TAIL = r"(?:\s+(?:column|field|values?))?\s*(?:please)?\s*[?.!]*$"
+PATTERNS = [
+    ("distribution", re.compile(_LEAD + r"(?:distribution|histogram|spread)\s+(?:of|for)\s+(?:the\s+)?(?P<a>.+?)" + _TAIL)),
+    ("counts", re.compile(_LEAD + r"(?:(?:counts?|number\s+of\s+rows|row\s+counts?|breakdown)\s+(?:by|per|for\s+each|of\s+each)|breakdown\s+of)\s+(?:the\s+)?(?P<a>.+?)" + _TAIL)),
+    ("counts", re.compile(r"^how\s+many\s+(?:rows|records|entries)\s+(?:are\s+there\s+)?(?:by|per|for\s+each|in\s+each)\s+(?:the\s+)?(?P<a>.+?)" + _TAIL)),
+    # Frequency only: "top N X" usually means the largest values or "top N by Y", which the planner handles
+    ("most_common", re.compile(_LEAD + r"(?:top\s+)?(?P<n>\d+\s+)?most\s+(?:common|frequent)\s+(?P<a>.+?)" + _TAIL)),
+    ("correlation", re.compile(_LEAD + r"correlation\s+(?:coefficient\s+)?between\s+(?:the\s+)?(?P<a>.+?)\s+and\s+(?:the\s+)?(?P<b>.+?)" + _TAIL)),
+    ("correlation_matrix", re.compile(_LEAD + r"(?:correlations?|correlation\s+matrix|correlation\s+heatmap)(?:\s+(?:between|of|for)\s+(?:all\s+)?(?:the\s+)?numeric\s+columns)?" + _TAIL)),
+    ("stat", re.compile(_LEAD + r"(?P<stat>average|mean|median|minimum|min|maximum|max|sum|total)\s+(?:of\s+|for\s+)?(?:the\s+)?(?P<a>.+?)" + _TAIL)),
+]
+STAT_FIELDS = {"average": "mean", "mean": "mean", "median": "median", "minimum": "min", "min": "min",
+               "maximum": "max", "max": "max", "sum": "sum", "total": "sum"}
+
+
+def _normalize(name: str) -> str:
+    return re.sub(r"[\s_\-]+", " ", name.strip().strip("'\"`").lower())
+
+
+def resolve_column(phrase: str, columns) -> str:
+    """Column named exactly by a phrase (ignoring case, underscores and a plural 's'), or None."""
+    wanted = _normalize(phrase)
+    by_name = {_normalize(col): col for col in columns}
+    for candidate in (wanted, wanted[:-1] if wanted.endswith("s") else None, wanted[:-2] if wanted.endswith("es") else None):
+        if candidate and candidate in by_name:
+            return by_name[candidate]
+    return None
+
+
+def match_question(question: str, index: dict):
+    """(kind, params) when the question is one the index answers exactly, else None.
+
+    Only whole-question matches count: anything with filters, groupings by a
+    second column or extra clauses goes to the planner.
+    """
+    text = " ".join(question.strip().lower().split())
+    columns = index["columns"]
+    for kind, pattern in PATTERNS:
+        match = pattern.match(text)
+        if not match:
+            continue
+        groups = match.groupdict()
+        if kind == "correlation_matrix":
+            return (kind, {}) if index.get("correlations") else None
+        col = resolve_column(groups["a"], columns)
+        if col is None:
+            continue
+        entry = columns[col]
+        if kind == "correlation":
+            other = resolve_column(groups["b"], columns)
+            corr = index.get("correlations")
+            if other is None or not corr or col not in corr["columns"] or other not in corr["columns"]:
+                return None
+            return kind, {"a": col, "b": other}
+        if kind == "stat":
+            if "numeric" not in entry:
+                return None
+            return kind, {"column": col, "stat": STAT_FIELDS[groups["stat"]]}
+        if kind in ("counts", "most_common"):
+            if entry["top"] is None or (kind == "counts" and entry["distinct"] > len(entry["top"])):
+                # Too many distinct values to list from the index
+                return None
+            n = int(groups["n"]) if groups.get("n") else 10
+            return kind, {"column": col, "n": n}
+        if kind == "distribution":
+            if "numeric" not in entry and entry["top"] is None:
+                return None
+            return kind, {"column": col}
+    return None
+
+
+def _fmt(value) -> str:
+    if value is None:
+        return "n/a"
+    if isinstance(value, (int, np.integer)):
+        return f"{value:,}"
+    if isinstance(value, float):
+        if abs(value) >= 1e15 or (value and abs(value) < 1e-4):
+            return f"{value:.6g}"
+        return f"{value:,.4f}".rstrip("0").rstrip(".")
+    return str(value)
+
+
+def _bar_figure(x, y, title: str, x_title: str, widths=None):
+    import plotly.graph_objects as go
+    fig = go.Figure(go.Bar(x=x, y=y, width=widths, marker_color="#d4af37"))
+    fig.update_layout(title=title, xaxis_title=x_title, yaxis_title="Count", template="plotly_dark", bargap=0.05)
+    return fig
+
+
+def _distribution(index: dict, column: str):
+    entry = index["columns"][column]
+    stats = entry.get("numeric")
+    if stats is None:
+        return _value_counts(index, column, len(entry["top"]), "Distribution")
+    edges = stats["histogram"]["edges"]
+    counts = stats["histogram"]["counts"]
+    centers = [(lo + hi) / 2 for lo, hi in zip(edges[:-1], edges[1:])]
+    widths = [hi - lo for lo, hi in zip(edges[:-1], edges[1:])]
+    q = stats["quantiles"]
+    approx = "" if stats["quantiles_exact"] else " (quantiles approximate)"
+    lines = [
+        f"**Distribution of {column}** ({entry['count']:,} values, {entry['nulls']:,} missing){approx}",
+        "",
+        "| statistic | value |",
+        "|---|---|",
+    ] + [f"| {label} | {_fmt(value)} |" for label, value in [
+        ("min", stats["min"]), ("1%", q["0.01"]), ("25%", q["0.25"]), ("median", q["0.5"]),
+        ("75%", q["0.75"]), ("99%", q["0.99"]), ("max", stats["max"]), ("mean", stats["mean"]), ("std", stats["std"]),
+    ]]
+    peak = int(np.argmax(counts))
+    insight = {
+        "title": f"Distribution of {column}",
+        "key_finding": f"Most values fall between {_fmt(edges[peak])} and {_fmt(edges[peak + 1])}; the median is {_fmt(q['0.5'])}.",
+        "details": f"Histogram of all {entry['count']:,} non-missing values in {len(counts)} equal-width bins.",
+    }
+    return "\n".join(lines), [(_bar_figure(centers, counts, f"Distribution of {column}", column, widths), insight)]
+
+
+def _value_counts(index: dict, column: str, n: int, heading: str = "Counts"):
+    entry = index["columns"][column]
+    top = entry["top"][:n]
+    total = entry["count"]
+    complete = entry["distinct"] == len(top)
+    lines = [
+        f"**{heading} of {column}** ({entry['distinct']:,} distinct values, {total:,} non-missing rows)"
+        + ("" if complete else f", top {len(top)}"),
+        "",
+        f"| {column} | count | share |",
+        "|---|---|---|",
+    ] + [f"| {value} | {count:,} | {count / total:.1%} |" for value, count in top]
+    insight = {
+        "title": f"{heading} of {column}",
+        "key_finding": f"'{top[0][0]}' is the most common value with {top[0][1]:,} rows ({top[0][1] / total:.1%})." if top else "No values.",
+        "details": "Exact counts over the full dataset.",
+    }
+    fig = _bar_figure([value for value, _ in top], [count for _, count in top], f"{heading} of {column}", column)
+    return "\n".join(lines), [(fig, insight)]
+
+
+def _correlation(index: dict, a: str, b: str):
+    corr = index["correlations"]
+    value = corr["matrix"][corr["columns"].index(a)][corr["columns"].index(b)]
+    if value is None:
+        return f"The correlation between {a} and {b} is undefined (a column is constant or they share no rows).", []
+    strength = "strong" if abs(value) >= 0.7 else "moderate" if abs(value) >= 0.4 else "weak"
+    direction = "positive" if value > 0 else "negative"
+    return f"The Pearson correlation between **{a}** and **{b}** is **{value:.4f}** ({strength} {direction}), computed over all rows where both are present.", []
+
+
+def _correlation_matrix(index: dict):
+    import plotly.graph_objects as go
+    corr = index["correlations"]
+    cols = corr["columns"]
+    fig = go.Figure(go.Heatmap(z=corr["matrix"], x=cols, y=cols, zmin=-1, zmax=1, colorscale="RdBu", reversescale=True))
+    fig.update_layout(title="Correlation matrix", template="plotly_dark")
+    pairs = [
+        (abs(corr["matrix"][i][j]), cols[i], cols[j], corr["matrix"][i][j])
+        for i in range(len(cols)) for j in range(i + 1, len(cols)) if corr["matrix"][i][j] is not None
+    ]
+    pairs.sort(reverse=True)
+    lines = ["**Strongest correlations**", "", "| column | column | r |", "|---|---|---|"]
+    lines += [f"| {a} | {b} | {r:.3f} |" for _, a, b, r in pairs[:10]]
+    insight = {
+        "title": "Correlation matrix",
+        "key_finding": f"Strongest pair: {pairs[0][1]} and {pairs[0][2]} (r = {pairs[0][3]:.3f})." if pairs else "No defined correlations.",
+        "details": "Pearson correlations over pairwise-complete rows of the numeric columns.",
+    }
+    return "\n".join(lines), [(fig, insight)]
+
+
+def _stat(index: dict, column: str, stat: str):
+    stats = index["columns"][column]["numeric"]
+    if stat == "median":
+        value = stats["quantiles"]["0.5"]
+        note = "" if stats["quantiles_exact"] else " (approximate, from a uniform sample)"
+    else:
+        value = stats[stat]
+        note = ""
+    label = {"mean": "average", "sum": "total"}.get(stat, stat)
+    return f"The {label} of **{column}** is **{_fmt(value)}**{note}, over {index['columns'][column]['count']:,} non-missing values.", []
+
+
+def answer_from_index(index: dict, question: str):
+    """Answers a matching question from the index. Returns (output, [(plotly_figure, insight)]) or None."""
+    if not index:
+        return None
+    matched = match_question(question, index)
+    if matched is None:
+        return None
+    kind, params = matched
+    if kind == "distribution":
+        return _distribution(index, params["column"])
+    if kind in ("counts", "most_common"):
+        return _value_counts(index, params["column"], params["n"], "Counts" if kind == "counts" else "Most common values")
+    if kind == "correlation":
+        return _correlation(index, params["a"], params["b"])
+    if kind == "correlation_matrix":
+        return _correlation_matrix(index)
+    return _stat(index, params["column"], params["stat"])
@@ -0,0 +1,152 @@
+import logging
+import re
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:  # Arrow-backed strings are optional; text columns stay as parsed
+    pa = None
+
+# Values that look like dates or timestamps (2024-01-31, 31/01/2024, 2024-01-31T10:00)
+DATE_PATTERN = re.compile(r"^\s*\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}([ T]\d{1,2}:\d{2}(:\d{2}(\.\d+)?)?)?(Z|[+-]\d{2}:?\d{2})?\s*$")
+DATE_SNIFF_ROWS = 200
+INTEGER_TYPES = [np.int8, np.int16, np.int32, np.int64]
+UNSIGNED_TYPES = [np.uint8, np.uint16, np.uint32, np.uint64]
+
+logger = logging.getLogger(__name__)
+
+
+def _arrow_string_dtype():
+    if pa is None:
+        return None
+    try:
+        # NaN as the missing value keeps the semantics of the default str/object columns
+        return pd.StringDtype("pyarrow", na_value=np.nan)
+    except TypeError:
+        return pd.StringDtype("pyarrow")
+
+
+ARROW_STRING = _arrow_string_dtype()
+
+
+def _downcast_integer(series: pd.Series, min_bits: int):
+    """Smallest integer type (at least min_bits wide) that holds every value, or None.
+
+    The square of the largest magnitude must fit as well, so products of two
+    columns in generated code can't silently wrap around.
+    """
+    if len(series) == 0 or series.dtype.itemsize * 8 <= min_bits:
+        return None
+    largest = max(abs(int(series.min())), abs(int(series.max())))
+    candidates = UNSIGNED_TYPES if series.dtype.kind == "u" else INTEGER_TYPES
+    for dtype in candidates:
+        info = np.iinfo(dtype)
+        if info.bits >= series.dtype.itemsize * 8:
+            return None
+        if info.bits >= min_bits and largest * largest <= info.max:
+            return series.astype(dtype)
+    return None
+
+
+def _downcast_float(series: pd.Series):
+    """float32 copy of a float64 column when every value survives the round trip exactly, or None."""
+    if series.dtype != np.float64:
+        return None
+    values = series.to_numpy()
+    narrowed = values.astype(np.float32)
+    if np.array_equal(narrowed.astype(np.float64), values, equal_nan=True):
+        return pd.Series(narrowed, index=series.index, name=series.name)
+    return None
+
+
+def _parse_dates(series: pd.Series, non_null: pd.Series):
+    """Datetime copy of a text column when every non-null value parses as a date, or None."""
+    head = non_null.head(DATE_SNIFF_ROWS).astype(str)
+    if not head.map(lambda v: bool(DATE_PATTERN.match(v))).all():
+        return None
+    for date_format in ("ISO8601", None):
+        try:
+            parsed = pd.to_datetime(series, format=date_format, errors="coerce")
+        except (ValueError, TypeError, OverflowError):
+            continue
+        if parsed.notna().sum() == len(non_null):
+            return parsed
+    return None
+
+
+def _optimize_column(series: pd.Series, category_max_ratio: float, int_min_bits: int, float32: bool):
+    if isinstance(series.dtype, pd.CategoricalDtype) or pd.api.types.is_bool_dtype(series):
+        return None
+    if pd.api.types.is_integer_dtype(series) and isinstance(series.dtype, np.dtype):
+        return _downcast_integer(series, int_min_bits)
+    if pd.api.types.is_float_dtype(series) and isinstance(series.dtype, np.dtype):
+        return _downcast_float(series) if float32 else None
+    if not (pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)):
+        return None
+
+    non_null = series.dropna()
+    if len(non_null) == 0 or pd.api.types.infer_dtype(non_null, skipna=True) != "string":
+        return None
+    parsed = _parse_dates(series, non_null)
+    if parsed is not None:
+        return parsed
+    if non_null.nunique() <= category_max_ratio * len(series):
+        return series.astype("category")
+    if ARROW_STRING is not None and series.dtype != ARROW_STRING:
+        return series.astype(ARROW_STRING)
+    return None
+
+
+def optimize_dtypes(df: pd.DataFrame, category_max_ratio: float = 0.05, int_min_bits: int = 32, float32: bool = False):
+    """Shrinks a freshly parsed DataFrame column by column.
+
+    Integers are downcast to the narrowest type of at least int_min_bits that
+    holds the square of their range, text columns that are all dates are parsed,
+    low-cardinality text becomes categorical and other text uses Arrow-backed strings.
+    With float32, float64 columns whose values all survive the round trip are
+    narrowed too; arithmetic on them then runs in float32, so sums drift.
+    Returns (df, report) where report lists the memory saved per column.
+    """
+    columns = []
+    optimized = {}
+    for name in df.columns:
+        series = df[name]
+        if isinstance(series, pd.DataFrame):
+            # Duplicate labels: leave them as parsed
+            continue
+        before = int(series.memory_usage(index=False, deep=True))
+        try:
+            new = _optimize_column(series, category_max_ratio, int_min_bits, float32)
+        except Exception as e:
+            logger.warning("Could not optimize column %r: %s", name, e)
+            new = None
+        after = int(new.memory_usage(index=False, deep=True)) if new is not None else before
+        if new is not None and after < before:
+            optimized[name] = new
+        else:
+            new, after = None, before
+        columns.append({
+            "column": str(name),
+            "from": str(series.dtype),
+            "to": str(new.dtype) if new is not None else str(series.dtype),
+            "bytes_before": before,
+            "bytes_after": after,
+            "saved": before - after,
+        })
+
+    if optimized:
+        # Shallow copy: untouched columns keep sharing their buffers
+        df = df.copy(deep=False)
+        for name, series in optimized.items():
+            df[name] = series
+    bytes_before = sum(c["bytes_before"] for c in columns)
+    bytes_after = sum(c["bytes_after"] for c in columns)
+    return df, {
+        "columns": columns,
+        "bytes_before": bytes_before,
+        "bytes_after": bytes_after,
+        "saved": bytes_before - bytes_after,
+        "ratio": bytes_before / bytes_after if bytes_after else 1.0,
+    }
+
@@ -0,0 +1,148 @@
+import json
+import logging
+import os
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:  # Columnar conversion is optional; loaders fall back to the raw file
+    pa = None
+
+COLUMNAR_SUFFIX = ".arrow"
+# Sniffed upload metadata (format, encoding, delimiter, rows) stored next to the blob
+UPLOAD_META_NAME = "upload.json"
+EXTENSION_FORMATS = {".csv": "csv", ".xlsx": "xlsx", ".xls": "xls"}
+# Arrow schema metadata key holding the dtype optimization report of the stored frame
+DTYPE_REPORT_KEY = b"dtype_report"
+
+logger = logging.getLogger(__name__)
+
+
+def upload_meta_path(file_path: str) -> str:
+    return os.path.join(os.path.dirname(file_path), UPLOAD_META_NAME)
+
+
+def load_upload_meta(file_path: str):
+    """The metadata sniffed when the file was uploaded, or None for files stored before sniffing."""
+    try:
+        with open(upload_meta_path(file_path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def file_format(file_path: str):
+    """'csv', 'xlsx' or 'xls': the sniffed format, falling back to the extension."""
+    meta = load_upload_meta(file_path)
+    if meta and meta.get("format"):
+        return meta["format"]
+    return EXTENSION_FORMATS.get(os.path.splitext(file_path)[1].lower())
+
+
+def csv_options(file_path: str) -> dict:
+    """pandas.read_csv keyword arguments for the sniffed delimiter and encoding."""
+    meta = load_upload_meta(file_path) or {}
+    options = {}
+    if meta.get("delimiter", ",") != ",":
+        options["sep"] = meta["delimiter"]
+    if meta.get("encoding", "utf-8") != "utf-8":
+        options["encoding"] = meta["encoding"]
+    return options
+
+
+def read_raw_file(file_path: str) -> pd.DataFrame:
+    """Parses the uploaded CSV/Excel file into a DataFrame."""
+    fmt = file_format(file_path)
+    if fmt == "csv":
+        return pd.read_csv(file_path, **csv_options(file_path))
+    elif fmt in ("xlsx", "xls"):
+        return pd.read_excel(file_path)
+    raise ValueError("Unsupported file format.")
+
+
+def columnar_path(file_path: str) -> str:
+    """Location of the Arrow IPC copy of an upload, next to the original file."""
+    return file_path + COLUMNAR_SUFFIX
+
+
+def has_columnar(file_path: str) -> bool:
+    """True when an Arrow copy exists and is at least as new as the source file."""
+    if pa is None:
+        return False
+    arrow_path = columnar_path(file_path)
+    return os.path.exists(arrow_path) and os.path.getmtime(arrow_path) >= os.path.getmtime(file_path)
+
+
+def convert_to_columnar(file_path: str, optimize=None) -> str:
+    """Parses the upload once and writes it as an uncompressed Arrow IPC file.
+
+    `optimize(df) -> (df, report)` shrinks dtypes before writing; its report is
+    kept in the file's schema metadata. Returns the Arrow path, or None when
+    pyarrow is unavailable or conversion fails.
+    """
+    if pa is None:
+        return None
+    if has_columnar(file_path):
+        return columnar_path(file_path)
+
+    arrow_path = columnar_path(file_path)
+    try:
+        df = read_raw_file(file_path)
+        report = None
+        if optimize is not None:
+            df, report = optimize(df)
+        write_columnar(df, arrow_path, {DTYPE_REPORT_KEY: json.dumps(report)} if report else None)
+        logger.info("Converted %s to columnar format: %s", file_path, arrow_path)
+        return arrow_path
+    except Exception as e:
+        logger.warning("Could not convert %s to columnar format: %s", file_path, e)
+        return None
+
+
+def write_columnar(df: pd.DataFrame, arrow_path: str, metadata: dict = None):
+    """Atomically writes a DataFrame as an uncompressed Arrow IPC file, with extra schema metadata."""
+    tmp_path = arrow_path + ".tmp"
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if metadata:
+            table = table.replace_schema_metadata({**(table.schema.metadata or {}), **metadata})
+        with pa.OSFile(tmp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, arrow_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def read_columnar(arrow_path: str) -> pd.DataFrame:
+    """Loads an Arrow IPC file through a memory map without copying column buffers into Arrow."""
+    source = pa.memory_map(arrow_path, "r")
+    table = pa.ipc.open_file(source).read_all()
+    # split_blocks avoids consolidating columns into 2D blocks, which would force a copy
+    return table.to_pandas(split_blocks=True)
+
+
+def read_dtype_report(arrow_path: str):
+    """The dtype optimization report stored with an Arrow file, or None if it was written unoptimized."""
+    try:
+        with pa.memory_map(arrow_path, "r") as source:
+            metadata = pa.ipc.open_file(source).schema.metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return None
+    raw = metadata.get(DTYPE_REPORT_KEY)
+    return json.loads(raw) if raw else None
+
+
+def load_file(file_path: str) -> pd.DataFrame:
+    """Loads an upload, preferring its memory-mapped columnar copy over re-parsing the text format."""
+    if file_path.endswith(COLUMNAR_SUFFIX):
+        # Already columnar (e.g. a sample written at upload)
+        return read_columnar(file_path)
+    if has_columnar(file_path):
+        try:
+            return read_columnar(columnar_path(file_path))
+        except Exception as e:
+            logger.warning("Could not read columnar copy of %s, re-parsing: %s", file_path, e)
+    return read_raw_file(file_path)
@@ -0,0 +1,177 @@
+import asyncio
+import itertools
+import logging
+import time
+import uuid
+from collections import OrderedDict
+
+# Lower runs first. A client waiting on its socket jumps ahead of other uploads,
+# and small files go before large ones so a burst doesn't queue them behind a slow parse.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_SMALL = 1
+PRIORITY_LARGE = 2
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    """One unit of background work with a replayable stream of progress events."""
+
+    def __init__(self, name: str, func, priority: int, key: str = None):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.key = key
+        self.priority = priority
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.events = []
+        self._func = func
+        self._listeners = []
+        self._done = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    def report(self, stage: str, message: str):
+        """Publishes a progress event to every subscriber. Call from the event loop."""
+        self._publish({"job_id": self.id, "status": self.status, "stage": stage, "message": message})
+
+    def _publish(self, event: dict):
+        self.events.append(event)
+        for listener in self._listeners:
+            listener.put_nowait(event)
+
+    async def wait(self):
+        await self._done.wait()
+
+    async def _run(self):
+        self.status = RUNNING
+        self.started_at = time.time()
+        self.report("started", f"Started {self.name}")
+        try:
+            self.result = await self._func(self)
+            self.status = DONE
+            self.report("done", f"Finished {self.name}")
+        except Exception as e:
+            logger.exception("%s failed", self.name)
+            self.error = str(e)
+            self.status = FAILED
+            self.report("failed", f"{self.name} failed: {e}")
+        finally:
+            self.finished_at = time.time()
+            self._done.set()
+
+    def snapshot(self) -> dict:
+        return {
+            "job_id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "priority": self.priority,
+            "error": self.error,
+            "queued_seconds": (self.started_at or time.time()) - self.created_at,
+            "run_seconds": ((self.finished_at or time.time()) - self.started_at) if self.started_at else None,
+            "last_event": self.events[-1]["message"] if self.events else None,
+        }
+
+
+class JobQueue:
+    """Local priority queue drained by a fixed number of asyncio worker tasks.
+
+    The worker count bounds how many jobs run at once, however many requests
+    submit them. Jobs with the same key share one run while it is pending.
+    Blocking steps inside a job should go through asyncio.to_thread.
+    """
+
+    def __init__(self, workers: int = 2, history: int = 1000):
+        self.workers = workers
+        self.history = history
+        self._queue = None
+        self._tasks = []
+        self._seq = itertools.count()
+        self._jobs = OrderedDict()  # job_id -> Job, oldest first
+        self._by_key = {}
+
+    def start(self):
+        """Starts the workers on the running loop (also done lazily on first submit)."""
+        if self._tasks:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(max(1, self.workers))]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, name: str, func, priority: int = PRIORITY_SMALL, key: str = None) -> Job:
+        """Queues `await func(job)`. Returns the pending job with the same key instead, if there is one."""
+        self.start()
+        if key is not None:
+            existing = self._by_key.get(key)
+            if existing is not None and not existing.finished:
+                self.prioritize(existing.id, priority)
+                return existing
+        job = Job(name, func, priority, key)
+        self._jobs[job.id] = job
+        if key is not None:
+            self._by_key[key] = job
+        self._prune()
+        job.report("queued", f"Queued {name}")
+        self._queue.put_nowait((priority, next(self._seq), job))
+        return job
+
+    def prioritize(self, job_id: str, priority: int):
+        """Raises a queued job's priority. The old queue entry is skipped when it comes up."""
+        job = self._jobs.get(job_id)
+        if job is None or job.status != QUEUED or priority >= job.priority:
+            return
+        job.priority = priority
+        self._queue.put_nowait((priority, next(self._seq), job))
+
+    def get(self, job_id: str):
+        return self._jobs.get(job_id) if job_id else None
+
+    async def subscribe(self, job: Job):
+        """Yields the job's events so far, then live ones until it finishes."""
+        listener = asyncio.Queue()
+        for event in list(job.events):
+            yield event
+        if job.finished:
+            return
+        job._listeners.append(listener)
+        try:
+            while True:
+                event = await listener.get()
+                yield event
+                if event["stage"] in ("done", "failed"):
+                    return
+        finally:
+            job._listeners.remove(listener)
+
+    async def _worker(self):
+        while True:
+            priority, _, job = await self._queue.get()
+            if job.status != QUEUED or priority != job.priority:
+                continue  # Already run via a re-prioritized entry
+            await job._run()
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            job = self._jobs.pop(job_id)
+            if self._by_key.get(job.key) is job:
+                del self._by_key[job.key]
+
+    def stats(self) -> dict:
+        counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        for job in self._jobs.values():
+            counts[job.status] += 1
+        return {"workers": len(self._tasks), **counts}
@@ -0,0 +1,517 @@
+import numpy as np
+import pandas as pd
+
+try:
+    import duckdb
+except ImportError:  # The out-of-core engine is optional; large files then load into pandas
+    duckdb = None
+
+try:
+    import pyarrow.dataset as pads
+except ImportError:
+    pads = None
+
+from app.ingest import has_columnar, columnar_path, file_format, load_upload_meta, COLUMNAR_SUFFIX
+
+# pandas aggregation name -> DuckDB aggregate template
+AGGREGATES = {
+    "sum": "sum({})",
+    "mean": "avg({})",
+    "min": "min({})",
+    "max": "max({})",
+    "count": "count({})",
+    "nunique": "count(DISTINCT {})",
+    "median": "median({})",
+    "std": "stddev_samp({})",
+    "var": "var_samp({})",
+    "first": "first({})",
+    "last": "last({})",
+}
+
+UNSUPPORTED_HINT = (
+    "df is a lazy DuckDB-backed frame over a file too large for memory and does not support '{name}'. "
+    "Aggregate first (groupby/agg, value_counts, filters, sort_values(...).head(n)) or use "
+    "df.sql(\"SELECT ... FROM df\"); results of those are regular pandas objects."
+)
+
+
+def available() -> bool:
+    return duckdb is not None
+
+
+def _ident(name) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _literal(value) -> str:
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return "NULL"
+    if isinstance(value, (bool, np.bool_)):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return repr(value.item() if hasattr(value, "item") else value)
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return f"TIMESTAMP '{pd.Timestamp(value).isoformat(sep=' ')}'"
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _sql(value) -> str:
+    return value.sql if isinstance(value, LazyExpr) else _literal(value)
+
+
+def _as_list(value) -> list:
+    return list(value) if isinstance(value, (list, tuple, pd.Index)) else [value]
+
+
+class LazyExpr:
+    """A column expression compiled to SQL; comparisons and arithmetic build new expressions."""
+
+    def __init__(self, frame, sql: str, name=None):
+        self._frame = frame
+        self.sql = sql
+        self.name = name
+
+    def _binary(self, op: str, other, reverse: bool = False):
+        left, right = (_sql(other), self.sql) if reverse else (self.sql, _sql(other))
+        return LazyExpr(self._frame, f"({left} {op} {right})")
+
+    def __eq__(self, other):
+        if other is None:
+            return self.isna()
+        return self._binary("=", other)
+
+    def __ne__(self, other):
+        if other is None:
+            return self.notna()
+        # pandas counts missing values as unequal; SQL's <> would yield NULL and drop them
+        return self._binary("IS DISTINCT FROM", other)
+
+    def __lt__(self, other): return self._binary("<", other)
+    def __le__(self, other): return self._binary("<=", other)
+    def __gt__(self, other): return self._binary(">", other)
+    def __ge__(self, other): return self._binary(">=", other)
+    def __add__(self, other): return self._binary("+", other)
+    def __radd__(self, other): return self._binary("+", other, reverse=True)
+    def __sub__(self, other): return self._binary("-", other)
+    def __rsub__(self, other): return self._binary("-", other, reverse=True)
+    def __mul__(self, other): return self._binary("*", other)
+    def __rmul__(self, other): return self._binary("*", other, reverse=True)
+    def __truediv__(self, other): return self._binary("/", other)
+    def __rtruediv__(self, other): return self._binary("/", other, reverse=True)
+    def __mod__(self, other): return self._binary("%", other)
+    def __and__(self, other): return self._binary("AND", other)
+    def __or__(self, other): return self._binary("OR", other)
+    # A comparison with a missing value is False in pandas, so its negation is True
+    def __invert__(self): return LazyExpr(self._frame, f"({self.sql} IS NOT TRUE)")
+    def __neg__(self): return LazyExpr(self._frame, f"(-{self.sql})")
+
+    __hash__ = None
+
+    def __bool__(self):
+        raise TypeError("The truth value of a lazy column expression is ambiguous; use & and | to combine conditions.")
+
+    def isna(self): return LazyExpr(self._frame, f"({self.sql} IS NULL)")
+    def notna(self): return LazyExpr(self._frame, f"({self.sql} IS NOT NULL)")
+    isnull = isna
+    notnull = notna
+
+    def isin(self, values):
+        return LazyExpr(self._frame, f"({self.sql} IN ({', '.join(_literal(v) for v in values)}))")
+
+    def between(self, left, right):
+        return LazyExpr(self._frame, f"({self.sql} BETWEEN {_sql(left)} AND {_sql(right)})")
+
+    def abs(self): return LazyExpr(self._frame, f"abs({self.sql})", self.name)
+    def round(self, decimals: int = 0): return LazyExpr(self._frame, f"round({self.sql}, {int(decimals)})", self.name)
+
+    def fillna(self, value):
+        return LazyExpr(self._frame, f"coalesce({self.sql}, {_sql(value)})", self.name)
+
+    def astype(self, dtype):
+        target = {"int": "BIGINT", "int64": "BIGINT", "float": "DOUBLE", "float64": "DOUBLE", "str": "VARCHAR", "string": "VARCHAR", "bool": "BOOLEAN"}.get(str(dtype), str(dtype))
+        return LazyExpr(self._frame, f"CAST({self.sql} AS {target})", self.name)
+
+    @property
+    def str(self):
+        return _StringAccessor(self)
+
+    @property
+    def dt(self):
+        return _DatetimeAccessor(self)
+
+    # Reductions run immediately and return plain Python/pandas values
+    def _reduce(self, func: str):
+        return self._frame._scalar(AGGREGATES[func].format(self.sql))
+
+    def sum(self): return self._reduce("sum")
+    def mean(self): return self._reduce("mean")
+    def min(self): return self._reduce("min")
+    def max(self): return self._reduce("max")
+    def count(self): return self._reduce("count")
+    def nunique(self): return self._reduce("nunique")
+    def median(self): return self._reduce("median")
+    def std(self): return self._reduce("std")
+    def var(self): return self._reduce("var")
+
+    def quantile(self, q=0.5):
+        if isinstance(q, (list, tuple)):
+            return pd.Series([self.quantile(v) for v in q], index=list(q), name=self.name)
+        return self._frame._scalar(f"quantile_cont({self.sql}, {float(q)})")
+
+    def value_counts(self, normalize: bool = False, ascending: bool = False, dropna: bool = True):
+        where = f"WHERE {self.sql} IS NOT NULL" if dropna else ""
+        order = "ASC" if ascending else "DESC"
+        result = self._frame._query(
+            f"SELECT {self.sql} AS value, count(*) AS n FROM df {where} GROUP BY 1 ORDER BY 2 {order}"
+        )
+        counts = pd.Series(result["n"].to_numpy(), index=pd.Index(result["value"], name=self.name), name="count")
+        if normalize:
+            counts = (counts / counts.sum()).rename("proportion")
+        return counts
+
+    def unique(self):
+        return self._frame._query(f"SELECT DISTINCT {self.sql} AS value FROM df")["value"].to_numpy()
+
+    def describe(self):
+        return self._frame[[self.name]].describe()[self.name] if self.name is not None else self.to_pandas().describe()
+
+    def head(self, n: int = 5):
+        return self.to_pandas(limit=n)
+
+    def to_pandas(self, limit: int = None) -> pd.Series:
+        limit_sql = f" LIMIT {int(limit)}" if limit is not None else ""
+        return self._frame._query(f"SELECT {self.sql} AS value FROM df{limit_sql}")["value"].rename(self.name)
+
+    def __getattr__(self, name):
+        raise AttributeError(UNSUPPORTED_HINT.format(name=f"Series.{name}"))
+
+
+class _StringAccessor:
+    def __init__(self, expr: LazyExpr):
+        # DuckDB may have sniffed the column as a date or number; pandas would see text
+        self._expr = LazyExpr(expr._frame, f"CAST({expr.sql} AS VARCHAR)", expr.name)
+
+    def _wrap(self, sql: str):
+        return LazyExpr(self._expr._frame, sql, self._expr.name)
+
+    def contains(self, pat: str, case: bool = True, regex: bool = True, na=None):
+        if regex:
+            flags = "" if case else ", 'i'"
+            return self._wrap(f"regexp_matches({self._expr.sql}, {_literal(pat)}{flags})")
+        if case:
+            return self._wrap(f"contains({self._expr.sql}, {_literal(pat)})")
+        return self._wrap(f"contains(lower({self._expr.sql}), {_literal(pat.lower())})")
+
+    def startswith(self, pat: str): return self._wrap(f"starts_with({self._expr.sql}, {_literal(pat)})")
+    def endswith(self, pat: str): return self._wrap(f"suffix({self._expr.sql}, {_literal(pat)})")
+    def lower(self): return self._wrap(f"lower({self._expr.sql})")
+    def upper(self): return self._wrap(f"upper({self._expr.sql})")
+    def strip(self): return self._wrap(f"trim({self._expr.sql})")
+    def len(self): return self._wrap(f"length({self._expr.sql})")
+
+
+class _DatetimeAccessor:
+    def __init__(self, expr: LazyExpr):
+        self._expr = expr
+
+    def _part(self, part: str):
+        return LazyExpr(self._expr._frame, f"date_part('{part}', CAST({self._expr.sql} AS TIMESTAMP))", self._expr.name)
+
+    @property
+    def year(self): return self._part("year")
+    @property
+    def month(self): return self._part("month")
+    @property
+    def day(self): return self._part("day")
+    @property
+    def hour(self): return self._part("hour")
+    @property
+    def dayofweek(self): return self._part("isodow") - 1
+
+    @property
+    def date(self):
+        return LazyExpr(self._expr._frame, f"CAST({self._expr.sql} AS DATE)", self._expr.name)
+
+
+class LazyGroupBy:
+    """groupby() over a LazyFrame; every aggregation is one GROUP BY query returning pandas."""
+
+    def __init__(self, frame, keys: list, selection=None, as_index: bool = True, dropna: bool = True, sort: bool = True):
+        self._frame = frame
+        self._keys = keys
+        self._selection = selection
+        self._as_index = as_index
+        self._dropna = dropna
+        self._sort = sort
+
+    def __getitem__(self, selection):
+        return LazyGroupBy(self._frame, self._keys, selection, self._as_index, self._dropna, self._sort)
+
+    def _value_columns(self) -> list:
+        if self._selection is not None:
+            return _as_list(self._selection)
+        return [c for c in self._frame.columns if c not in self._keys]
+
+    def _run(self, outputs: list) -> pd.DataFrame:
+        """outputs: [(result column label, SQL aggregate)] -> DataFrame indexed by the group keys."""
+        key_sql = ", ".join(_ident(k) for k in self._keys)
+        # Positional aliases keep arbitrary labels (tuples, odd characters) out of the SQL
+        select = ", ".join([key_sql] + [f"{sql} AS agg_{i}" for i, (_, sql) in enumerate(outputs)])
+        where = " WHERE " + " AND ".join(f"{_ident(k)} IS NOT NULL" for k in self._keys) if self._dropna else ""
+        order = f" ORDER BY {key_sql}" if self._sort else ""
+        result = self._frame._query(f"SELECT {select} FROM df{where} GROUP BY {key_sql}{order}")
+        result = result.set_index(self._keys)
+        labels = [label for label, _ in outputs]
+        if any(isinstance(label, tuple) for label in labels):
+            result.columns = pd.MultiIndex.from_tuples([label if isinstance(label, tuple) else (label, "") for label in labels])
+        else:
+            result.columns = labels
+        return result if self._as_index else result.reset_index()
+
+    def agg(self, func=None, **named):
+        if named:
+            # Named aggregation: total=('Price', 'sum')
+            return self._run([(name, AGGREGATES[fn].format(_ident(col))) for name, (col, fn) in named.items()])
+        if isinstance(func, dict):
+            # Like pandas: one list anywhere makes every label a (column, function) pair
+            nested = any(isinstance(fns, (list, tuple)) for fns in func.values())
+            outputs = []
+            for col, fns in func.items():
+                for fn in _as_list(fns):
+                    outputs.append(((col, fn) if nested else col, AGGREGATES[fn].format(_ident(col))))
+            return self._run(outputs)
+
+        columns = self._value_columns()
+        if isinstance(func, (list, tuple)):
+            if isinstance(self._selection, str):
+                # df.groupby(k)['x'].agg(['sum', 'max']): one column per function
+                return self._run([(fn, AGGREGATES[fn].format(_ident(self._selection))) for fn in func])
+            return self._run([((col, fn), AGGREGATES[fn].format(_ident(col))) for col in columns for fn in func])
+        result = self._run([(col, AGGREGATES[func].format(_ident(col))) for col in columns])
+        if isinstance(self._selection, str) and self._as_index:
+            return result[self._selection]
+        return result
+
+    aggregate = agg
+
+    def sum(self): return self.agg("sum")
+    def mean(self): return self.agg("mean")
+    def min(self): return self.agg("min")
+    def max(self): return self.agg("max")
+    def count(self): return self.agg("count")
+    def nunique(self): return self.agg("nunique")
+    def median(self): return self.agg("median")
+    def std(self): return self.agg("std")
+    def var(self): return self.agg("var")
+    def first(self): return self.agg("first")
+    def last(self): return self.agg("last")
+
+    def size(self):
+        result = self._run([("size", "count(*)")])
+        return result["size"].rename(None) if self._as_index else result
+
+    def __getattr__(self, name):
+        if not name.startswith("_") and name in self._frame.columns:
+            return self[name]
+        raise AttributeError(UNSUPPORTED_HINT.format(name=f"groupby().{name}"))
+
+
+class LazyFrame:
+    """A pandas-like view of a large file backed by a DuckDB relation.
+
+    Filters, column selection, assignments and sorting stay lazy; aggregations,
+    value_counts, head/sample and describe push the work down to DuckDB, which
+    streams the file (spilling to disk under its memory limit) and returns a
+    small pandas result.
+    """
+
+    def __init__(self, relation, connection, order: str = None):
+        self._rel = relation
+        self._con = connection
+        self._order = order
+
+    # --- plumbing ---------------------------------------------------------
+    def _derive(self, relation, order: str = None):
+        return LazyFrame(relation, self._con, order)
+
+    def _query(self, sql: str) -> pd.DataFrame:
+        """Runs SQL against this frame, exposed as the table `df`."""
+        return self._rel.query("df", sql).df()
+
+    def _scalar(self, aggregate_sql: str):
+        value = self._rel.query("df", f"SELECT {aggregate_sql} FROM df").fetchone()[0]
+        return value.item() if hasattr(value, "item") else value
+
+    def sql(self, query: str) -> pd.DataFrame:
+        """Runs arbitrary DuckDB SQL in which this data is the table `df`."""
+        return self._query(query)
+
+    # --- structure --------------------------------------------------------
+    @property
+    def columns(self) -> pd.Index:
+        return pd.Index(self._rel.columns)
+
+    @property
+    def dtypes(self) -> pd.Series:
+        return pd.Series([str(t) for t in self._rel.types], index=self.columns)
+
+    def __len__(self) -> int:
+        return int(self._scalar("count(*)"))
+
+    @property
+    def shape(self) -> tuple:
+        return (len(self), len(self._rel.columns))
+
+    @property
+    def empty(self) -> bool:
+        return self._rel.limit(1).fetchone() is None
+
+    def __repr__(self) -> str:
+        return f"LazyFrame ({len(self._rel.columns)} columns, DuckDB-backed)\n{self.head(5)}"
+
+    # --- selection --------------------------------------------------------
+    def __getitem__(self, key):
+        if isinstance(key, LazyExpr):
+            return self._derive(self._rel.filter(key.sql), self._order)
+        if isinstance(key, (list, tuple, pd.Index)):
+            return self._derive(self._rel.project(", ".join(_ident(c) for c in key)), self._order)
+        if key not in self._rel.columns:
+            raise KeyError(key)
+        return LazyExpr(self, _ident(key), key)
+
+    def __getattr__(self, name):
+        if not name.startswith("_") and name in self._rel.columns:
+            return self[name]
+        raise AttributeError(UNSUPPORTED_HINT.format(name=name))
+
+    def __setitem__(self, name, value):
+        expr = f"{_sql(value)} AS {_ident(name)}"
+        if name in self._rel.columns:
+            self._rel = self._rel.project(f"* REPLACE ({expr})")
+        else:
+            self._rel = self._rel.project(f"*, {expr}")
+
+    def assign(self, **columns):
+        frame = self._derive(self._rel, self._order)
+        for name, value in columns.items():
+            frame[name] = value
+        return frame
+
+    def query(self, expr: str):
+        """Filters with a SQL boolean expression (DuckDB syntax, e.g. "Price > 100 AND City = 'NY'")."""
+        return self._derive(self._rel.filter(expr), self._order)
+
+    def dropna(self, subset=None):
+        columns = _as_list(subset) if subset is not None else list(self._rel.columns)
+        return self[LazyExpr(self, " AND ".join(f"{_ident(c)} IS NOT NULL" for c in columns))]
+
+    def drop(self, columns=None, **kwargs):
+        names = ", ".join(_ident(c) for c in _as_list(columns))
+        return self._derive(self._rel.project(f"* EXCLUDE ({names})"), self._order)
+
+    def rename(self, columns: dict = None, **kwargs):
+        parts = [f"{_ident(c)} AS {_ident(columns.get(c, c))}" for c in self._rel.columns]
+        return self._derive(self._rel.project(", ".join(parts)))
+
+    # --- ordering and materialization -------------------------------------
+    def sort_values(self, by, ascending=True):
+        keys = _as_list(by)
+        directions = _as_list(ascending) if isinstance(ascending, (list, tuple)) else [ascending] * len(keys)
+        order = ", ".join(f"{_ident(k)} {'ASC' if asc else 'DESC'}" for k, asc in zip(keys, directions))
+        return self._derive(self._rel, order)
+
+    def _ordered(self):
+        return self._rel.order(self._order) if self._order else self._rel
+
+    def head(self, n: int = 5) -> pd.DataFrame:
+        return self._ordered().limit(int(n)).df()
+
+    def nlargest(self, n: int, columns) -> pd.DataFrame:
+        return self.sort_values(columns, ascending=False).head(n)
+
+    def nsmallest(self, n: int, columns) -> pd.DataFrame:
+        return self.sort_values(columns, ascending=True).head(n)
+
+    def sample(self, n: int = None, frac: float = None, random_state: int = None) -> pd.DataFrame:
+        size = f"{float(frac) * 100}%" if frac is not None else f"{int(n or 1)} ROWS"
+        seed = f" REPEATABLE ({int(random_state)})" if random_state is not None else ""
+        return self._query(f"SELECT * FROM df USING SAMPLE reservoir({size}){seed}")
+
+    def to_pandas(self, limit: int = None) -> pd.DataFrame:
+        rel = self._ordered()
+        return (rel.limit(int(limit)) if limit is not None else rel).df()
+
+    # --- aggregation ------------------------------------------------------
+    def groupby(self, by, as_index: bool = True, dropna: bool = True, sort: bool = True):
+        return LazyGroupBy(self, _as_list(by), as_index=as_index, dropna=dropna, sort=sort)
+
+    def _numeric_columns(self) -> list:
+        return [c for c, t in zip(self._rel.columns, self._rel.types) if str(t).split("(")[0] in
+                ("TINYINT", "SMALLINT", "INTEGER", "BIGINT", "HUGEINT", "UTINYINT", "USMALLINT", "UINTEGER", "UBIGINT", "FLOAT", "DOUBLE", "DECIMAL")]
+
+    def _reduce_columns(self, func: str, columns: list = None) -> pd.Series:
+        columns = columns if columns is not None else self._numeric_columns()
+        if not columns:
+            return pd.Series(dtype=float)
+        select = ", ".join(f"{AGGREGATES[func].format(_ident(c))} AS {_ident(c)}" for c in columns)
+        return self._query(f"SELECT {select} FROM df").iloc[0].rename(None)
+
+    def sum(self, numeric_only: bool = True): return self._reduce_columns("sum")
+    def mean(self, numeric_only: bool = True): return self._reduce_columns("mean")
+    def min(self, numeric_only: bool = True): return self._reduce_columns("min")
+    def max(self, numeric_only: bool = True): return self._reduce_columns("max")
+    def count(self): return self._reduce_columns("count", list(self._rel.columns)).astype(int)
+    def nunique(self): return self._reduce_columns("nunique", list(self._rel.columns)).astype(int)
+
+    def isna(self):
+        return _NullCounts(self)
+
+    isnull = isna
+
+    def describe(self) -> pd.DataFrame:
+        """count/mean/std/min/quartiles/max of numeric columns in a single scan (quartiles are approximate)."""
+        columns = self._numeric_columns()
+        stats = [("count", "count({})"), ("mean", "avg({})"), ("std", "stddev_samp({})"), ("min", "min({})"),
+                 ("25%", "approx_quantile({}, 0.25)"), ("50%", "approx_quantile({}, 0.5)"),
+                 ("75%", "approx_quantile({}, 0.75)"), ("max", "max({})")]
+        select = ", ".join(f"CAST({tpl.format(_ident(c))} AS DOUBLE) AS {_ident(f'{c}|{name}')}" for c in columns for name, tpl in stats)
+        row = self._query(f"SELECT {select} FROM df").iloc[0]
+        return pd.DataFrame({c: [row[f"{c}|{name}"] for name, _ in stats] for c in columns}, index=[name for name, _ in stats])
+
+    def info(self):
+        counts = self.count()
+        print(f"<class 'LazyFrame'> (DuckDB-backed)\nRangeIndex: {len(self)} entries")
+        for i, (col, dtype) in enumerate(zip(self._rel.columns, self._rel.types)):
+            print(f" {i:<2} {col}  {counts[col]} non-null  {dtype}")
+
+
+class _NullCounts:
+    """df.isna()/df.isnull() on a LazyFrame; only the `.sum()` reduction is supported."""
+
+    def __init__(self, frame: LazyFrame):
+        self._frame = frame
+
+    def sum(self) -> pd.Series:
+        columns = list(self._frame._rel.columns)
+        select = ", ".join(f"count(*) - count({_ident(c)}) AS {_ident(c)}" for c in columns)
+        return self._frame._query(f"SELECT {select} FROM df").iloc[0].astype(int).rename(None)
+
+
+def open_lazy_frame(file_path: str, memory_limit: str = "2GB") -> LazyFrame:
+    """Opens an upload as a LazyFrame: its Arrow copy when present, else the CSV streamed by DuckDB."""
+    if duckdb is None:
+        raise ImportError("duckdb is not installed")
+    con = duckdb.connect()
+    con.execute(f"SET memory_limit = {_literal(memory_limit)}")
+    if file_path.endswith(COLUMNAR_SUFFIX) and pads is not None:
+        relation = con.from_arrow(pads.dataset(file_path, format="ipc"))
+    elif has_columnar(file_path) and pads is not None:
+        relation = con.from_arrow(pads.dataset(columnar_path(file_path), format="ipc"))
+    elif file_format(file_path) == "csv":
+        # Delimiter sniffed at upload; DuckDB skips a UTF-8 BOM by itself
+        meta = load_upload_meta(file_path) or {}
+        options = {"delimiter": meta["delimiter"]} if meta.get("delimiter") else {}
+        relation = con.read_csv(file_path, **options)
+    else:
+        raise ValueError("The out-of-core engine supports CSV files and columnar copies only.")
+    return LazyFrame(relation, con)
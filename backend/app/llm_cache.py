@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from langchain_core.caches import BaseCache
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, Generation
+
+
+def prompt_fingerprint(prompt: str, llm_string: str) -> str:
+    """Hash of the rendered prompt plus the serialized model parameters."""
+    return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+
+def _dump_generations(generations) -> str:
+    records = []
+    for gen in generations:
+        if isinstance(gen, ChatGeneration):
+            records.append({"message": message_to_dict(gen.message)})
+        else:
+            records.append({"text": gen.text})
+    return json.dumps(records)
+
+
+def _load_generations(payload: str) -> list:
+    generations = []
+    for record in json.loads(payload):
+        if "message" in record:
+            generations.append(ChatGeneration(message=messages_from_dict([record["message"]])[0]))
+        else:
+            generations.append(Generation(text=record["text"]))
+    return generations
+
+
+class TieredLLMCache(BaseCache):
+    """LangChain response cache with an in-memory LRU tier over an optional SQLite tier.
+
+    Keys are fingerprints of the rendered prompt and model parameters, so any
+    change to the prompt text, model or temperature misses. Entries expire
+    after `ttl_seconds` in both tiers.
+    """
+
+    def __init__(self, max_entries: int = 1024, db_path: str = None, ttl_seconds: float = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._memory = OrderedDict()  # key -> (expires_at, generations)
+        self._lock = threading.Lock()
+        self._conn = None
+        if db_path:
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+            )
+            self._conn.commit()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _expiry(self):
+        return time.time() + self.ttl_seconds if self.ttl_seconds else None
+
+    def _remember(self, key: str, expires_at, generations):
+        self._memory[key] = (expires_at, generations)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def lookup(self, prompt: str, llm_string: str):
+        key = prompt_fingerprint(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] is None or entry[0] > now:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[1]
+                del self._memory[key]
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    if row[1] is None or row[1] > now:
+                        generations = _load_generations(row[0])
+                        self._remember(key, row[1], generations)
+                        self.disk_hits += 1
+                        return generations
+                    self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    self._conn.commit()
+
+            self.misses += 1
+            return None
+
+    def update(self, prompt: str, llm_string: str, return_val) -> None:
+        key = prompt_fingerprint(prompt, llm_string)
+        expires_at = self._expiry()
+        with self._lock:
+            self._remember(key, expires_at, return_val)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, _dump_generations(return_val), expires_at),
+                )
+                self._conn.commit()
+
+    def clear(self, **kwargs) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM llm_cache")
+                self._conn.commit()
+
+    def stats(self) -> dict:
+        """Hit counters per tier and the overall hit rate."""
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "entries_in_memory": len(self._memory),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+            }
+
+
+def build_llm_cache(backend: str, max_entries: int, db_path: str, ttl_seconds: float):
+    """Creates the configured response cache: 'tiered' (memory + SQLite), 'memory', or 'none'."""
+    if backend == "tiered":
+        return TieredLLMCache(max_entries, db_path, ttl_seconds)
+    if backend == "memory":
+        return TieredLLMCache(max_entries, None, ttl_seconds)
+    return None
@@ -1,16 +1,12 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
-from app.api import endpoints
+from app.core.logging_config import configure_logging, stop_logging
 import logging
-import sys
 
-# Configure logging to show up in Uvicorn
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[logging.StreamHandler(sys.stdout)]
-)
+# Configure logging before the app modules log anything; records are written to stdout by a background thread
+configure_logging()
+from app.api import endpoints
 logger = logging.getLogger(__name__)
 
 app = FastAPI(title=settings.PROJECT_NAME, openapi_url=f"{settings.API_V1_STR}/openapi.json")
@@ -18,6 +14,24 @@ app = FastAPI(title=settings.PROJECT_NAME, openapi_url=f"{settings.API_V1_STR}/o
 @app.on_event("startup")
 async def startup_event():
     logger.info("Application is starting up...")
+    # Pre-warm the sandbox workers so the first question doesn't pay for process start-up
+    from app.tools import get_executor_pool
+    pool = get_executor_pool()
+    if pool is not None:
+        pool.start()
+    # Ingestion workers run on the server's event loop
+    from app.api.endpoints import ingest_queue
+    ingest_queue.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    from app.tools import get_executor_pool
+    pool = get_executor_pool()
+    if pool is not None:
+        pool.shutdown()
+    from app.api.endpoints import ingest_queue
+    await ingest_queue.stop()
+    stop_logging()
 # Set all CORS enabled origins
 app.add_middleware(
     CORSMiddleware,
@@ -35,36 +49,48 @@ app.include_router(endpoints.router, prefix=settings.API_V1_STR)
 
 # WebSocket Endpoint (Moved here to avoid router prefix issues)
 from fastapi import WebSocket, WebSocketDisconnect
-from app.api.endpoints import session_store
-from app.agents.graph import app_graph
+from app.api.endpoints import session_store, ingest_queue, apply_ingest_result
+from app.jobs import FAILED, PRIORITY_INTERACTIVE
+from app.agents.graph import get_graph
+from app.agents.nodes import aremember_turn, aexecutor_node
+from app.streaming import TokenBatcher
+from app.metrics import start_turn, finish_turn, track_node
 from langchain_core.messages import HumanMessage
 import json
-import traceback
 
 @app.websocket("/ws/{file_id}")
 async def websocket_endpoint(websocket: WebSocket, file_id: str):
-    print(f"DEBUG: WebSocket connection attempt for file_id: {file_id}")
     await websocket.accept()
-    print(f"DEBUG: WebSocket accepted for file_id: {file_id}")
+    logger.debug("WebSocket accepted", extra={"file_id": file_id})
     try:
-        if file_id not in session_store:
-            print(f"DEBUG: Session not found for file_id: {file_id}")
+        state = await session_store.aget(file_id)
+        if state is None:
+            logger.info("WebSocket session not found", extra={"file_id": file_id})
             await websocket.send_json({"type": "error", "content": "Session not found. Please upload a file first."})
             await websocket.close()
             return
-
-        state = session_store[file_id]
         
-        # Auto-generate summary if not already done
-        if not state.get("df_head"):
-            print(f"DEBUG: Generating initial summary for file_id: {file_id}")
+        # Upload still being ingested: move it to the front of the queue and relay its progress
+        job = ingest_queue.get(state.get("ingest_job"))
+        if job is not None:
+            ingest_queue.prioritize(job.id, PRIORITY_INTERACTIVE)
+            await websocket.send_json({"type": "log", "node": "System", "message": "Analyzing your data..."})
+            async for event in ingest_queue.subscribe(job):
+                await websocket.send_json({"type": "log", "node": "Ingest", "message": event["message"]})
+            state = await apply_ingest_result(file_id, job)
+            if job.status == FAILED:
+                await websocket.send_json({"type": "error", "content": f"Error generating summary: {job.error}"})
+        
+        # Auto-generate summary if not already done (sessions from before the ingestion queue)
+        if not state.get("df_head") and job is None:
+            logger.info("Generating initial summary", extra={"file_id": file_id})
             await websocket.send_json({"type": "log", "node": "System", "message": "Analyzing your data..."})
             
             try:
-                from app.agents.nodes import summarizer_node
-                summary_result = summarizer_node(state)
+                from app.agents.nodes import asummarizer_node
+                summary_result = await asummarizer_node(state)
                 state.update(summary_result)
-                session_store[file_id] = state
+                await session_store.aset(file_id, state)
                 
                 # Send the summary to the client
                 if summary_result.get("messages"):
@@ -75,14 +101,14 @@ async def websocket_endpoint(websocket: WebSocket, file_id: str):
                         "image": None
                     })
             except Exception as e:
-                print(f"ERROR generating summary: {e}")
+                logger.error("Error generating summary: %s", e, extra={"file_id": file_id})
                 await websocket.send_json({
                     "type": "error",
                     "content": f"Error generating summary: {str(e)}"
                 })
         else:
             # Session exists, send the existing summary/last message to ensure frontend state is consistent
-            print(f"DEBUG: Session exists for file_id: {file_id}, sending last message.")
+            logger.debug("Session exists, sending last message", extra={"file_id": file_id})
             if state.get("messages"):
                 last_msg = state["messages"][-1]
                 content = last_msg.content if hasattr(last_msg, 'content') else str(last_msg)
@@ -95,40 +121,97 @@ async def websocket_endpoint(websocket: WebSocket, file_id: str):
                         "plotly_figures": state.get("plotly_html", [])
                     })
 
-        print(f"DEBUG: Session ready. Waiting for messages...")
+        logger.debug("Session ready, waiting for messages", extra={"file_id": file_id})
         while True:
             data = await websocket.receive_text()
             request_data = json.loads(data)
             user_message_content = request_data.get("message")
             
-            state = session_store[file_id]
+            state = await session_store.aget(file_id)
+            if state is None:
+                # Expired (or deleted) while the socket sat idle
+                await websocket.send_json({"type": "error", "content": "Session not found. Please upload a file first."})
+                await websocket.close()
+                return
+            
+            if request_data.get("rerun_exact"):
+                # Opt-in exact answer: re-execute the last code on every row, no LLM calls
+                if not state.get("analysis_code"):
+                    await websocket.send_json({"type": "error", "content": "There is no analysis to re-run yet."})
+                    continue
+                await websocket.send_json({"type": "log", "node": "executor", "message": "Re-running on all rows..."})
+                turn = start_turn()
+                try:
+                    with track_node("executor"):
+                        exact_data = await aexecutor_node({**state, "exact": True, "retry_count": 0})
+                finally:
+                    timings = finish_turn(turn)
+                if exact_data.get("error"):
+                    await websocket.send_json({"type": "error", "content": exact_data["error"]})
+                    continue
+                for key in ['analysis_output', 'image_path', 'plotly_html', 'approximate']:
+                    state[key] = exact_data.get(key)
+                await websocket.send_json({
+                    "type": "result",
+                    "content": exact_data.get("analysis_output", ""),
+                    "image": exact_data.get("image_path") or None,
+                    "plotly_figures": exact_data.get("plotly_html", []),
+                    "approximate": None,
+                    "timings": timings
+                })
+                state["image_path"] = ""
+                await session_store.aset(file_id, state)
+                continue
+            
             user_message = HumanMessage(content=user_message_content)
             state["messages"].append(user_message)
+            state["bypass_cache"] = bool(request_data.get("bypass_cache", False))
+            state["error_bound"] = request_data.get("error_bound")
+            state["exact"] = bool(request_data.get("exact", False))
+            stream_tokens = bool(request_data.get("stream", settings.STREAM_TOKENS))
+            batcher = TokenBatcher(websocket.send_json, settings.STREAM_FRAME_INTERVAL_SECONDS)
             
             # Stream the graph execution
             inputs = state
-            async for event in app_graph.astream_events(inputs, version="v1"):
+            graph = get_graph(request_data.get("mode"))
+            turn_messages = []  # AI messages produced by the graph nodes this turn
+            # Per-turn timings: node and tool wall time, LLM tokens, peak RSS growth
+            turn = start_turn()
+            async for event in graph.astream_events(inputs, version="v1"):
                 kind = event["event"]
                 
-                if kind == "on_chain_start":
+                if kind == "on_chat_model_stream":
+                    # Forward planner/coder tokens as they arrive, coalesced into ~50 ms frames
+                    node = event.get("metadata", {}).get("langgraph_node")
+                    if stream_tokens and node in settings.STREAM_TOKEN_NODES:
+                        content = event["data"]["chunk"].content
+                        if content:
+                            await batcher.push(node, content)
+                
+                elif kind == "on_chat_model_end":
+                    await batcher.flush()
+                
+                elif kind == "on_chain_start":
                     if event["name"] == "LangGraph":
                         continue
                     await websocket.send_json({"type": "log", "node": event["name"], "message": "Starting..."})
                 
                 elif kind == "on_chain_end":
+                    output = event["data"].get("output")
+                    if event["name"] == event.get("metadata", {}).get("langgraph_node") and isinstance(output, dict):
+                        turn_messages.extend(output.get("messages", []))
+                    
                     if event["name"] == "LangGraph":
                         # The graph output contains data under the last node name ('executor')
                         final_output = event["data"]["output"]
-                        print(f"DEBUG: final_output keys: {final_output.keys() if isinstance(final_output, dict) else type(final_output)}")
                         
                         # Extract the actual state data from under the executor key
-                        executor_data = final_output.get("executor", {})
-                        print(f"DEBUG: executor_data keys: {executor_data.keys() if isinstance(executor_data, dict) else type(executor_data)}")
+                        # (or the validator's, when the code was rejected without running)
+                        # (or the index node's, when the fast path answered the question)
+                        executor_data = final_output.get("executor", final_output.get("validator", final_output.get("index", {})))
                         
                         # Update session state with the executor output
-                        current_state = session_store[file_id]
-                        
-                        print(f"DEBUG: Before update - message count: {len(current_state.get('messages', []))}")
+                        current_state = state
                         
                         # Merge executor data into current state
                         if isinstance(executor_data, dict):
@@ -136,12 +219,6 @@ async def websocket_endpoint(websocket: WebSocket, file_id: str):
                                 if key in executor_data:
                                     current_state[key] = executor_data[key]
                             
-                            # IMPORTANT: Update messages to include all AI responses for history
-                            if 'messages' in executor_data:
-                                # The executor_data messages contain the full conversation including user + AI
-                                current_state['messages'] = executor_data['messages']
-                                print(f"DEBUG: After update - message count: {len(current_state['messages'])}")
-                                print(f"DEBUG: Last 3 messages: {[(m.type, m.content[:50] if hasattr(m, 'content') else str(m)[:50]) for m in current_state['messages'][-3:]]}")
                         
                         # Get response text from analysis_output or a message
                         response_text = executor_data.get('analysis_output', 'Analysis complete.')
@@ -149,33 +226,57 @@ async def websocket_endpoint(websocket: WebSocket, file_id: str):
                         # Get image data and plotly figures
                         image_data = executor_data.get("image_path", "")
                         plotly_html = executor_data.get("plotly_html", [])
-                        print(f"DEBUG: Sending image data length: {len(image_data) if image_data else 0}")
-                        print(f"DEBUG: Sending plotly figures count: {len(plotly_html)}")
-                        print(f"DEBUG: Response text preview: {response_text[:200] if response_text else 'None'}...")
                         
+                        timings, turn = finish_turn(turn), None
                         await websocket.send_json({
                             "type": "result", 
                             "content": response_text, 
                             "image": image_data if image_data else None,
-                            "plotly_figures": plotly_html
+                            "plotly_figures": plotly_html,
+                            "approximate": executor_data.get("approximate"),
+                            "timings": timings
                         })
                         
                         # Reset image path after sending
                         if image_data:
                             current_state["image_path"] = ""
                         
-                        session_store[file_id] = current_state
-                        print(f"DEBUG: Saved to session_store - total messages: {len(session_store[file_id]['messages'])}")
+                        # Fold the turn into conversation memory once the client has its answer
+                        current_state.update(await aremember_turn(current_state, turn_messages))
+                        await session_store.aset(file_id, current_state)
+                        logger.info(
+                            "Turn finished",
+                            extra={
+                                "file_id": file_id,
+                                "messages": len(current_state["messages"]),
+                                "figures": len(plotly_html) + (1 if image_data else 0),
+                                "seconds": timings["total_seconds"] if timings else None,
+                            },
+                        )
                     else:
                          await websocket.send_json({"type": "log", "node": event["name"], "message": "Completed."})
+            if turn is not None:
+                # The graph finished without a final state
+                finish_turn(turn)
                          
     except WebSocketDisconnect:
-        logger.info(f"Client disconnected: {file_id}")
+        logger.info("Client disconnected", extra={"file_id": file_id})
     except Exception as e:
-        logger.error(f"WebSocket error: {e}")
-        traceback.print_exc()
+        logger.exception("WebSocket error: %s", e, extra={"file_id": file_id})
         await websocket.send_json({"type": "error", "content": str(e)})
 
+# Metrics endpoint: served at /metrics, outside the API prefix, where Prometheus scrapes by default
+from fastapi import HTTPException
+from fastapi.responses import PlainTextResponse
+from app.metrics import render_metrics
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Node, tool, token and peak-RSS histograms in the Prometheus text format."""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 # Mount static files
 frontend_path = os.path.join(os.getcwd(), "..", "frontend")
 if os.path.exists(frontend_path):
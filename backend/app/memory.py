@@ -0,0 +1,82 @@
+from langchain_core.messages import AIMessage, HumanMessage
+
+# Prefixes of the bulky intermediate messages the graph appends every turn
+CODE_PREFIXES = ("Generated Code:", "Debugger Fixed Code:", "Validator Fixed Code")
+ERROR_PREFIX = "Execution Error"
+OUTPUT_PREFIX = "Execution Output:"
+
+
+def _clip(text: str, limit: int) -> str:
+    text = (text or "").strip()
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+def new_memory() -> dict:
+    """Empty conversation memory (JSON-serializable, stored in session state)."""
+    return {"summary": "", "turns": []}
+
+
+def compact_turn(query: str, turn_messages: list, max_chars: int = 600) -> dict:
+    """Reduces one turn's messages to {"user", "assistant"} without code or raw output blobs.
+
+    The assistant side keeps the plan and a clipped view of the final result;
+    generated/fixed code and intermediate execution errors are dropped.
+    """
+    plan = ""
+    result = ""
+    failed = False
+    for msg in turn_messages:
+        if msg.type != "ai":
+            continue
+        content = msg.content or ""
+        if content.startswith(CODE_PREFIXES):
+            continue
+        if content.startswith(ERROR_PREFIX):
+            failed = True
+            result = content
+        elif content.startswith(OUTPUT_PREFIX):
+            failed = False
+            result = content[len(OUTPUT_PREFIX):]
+        elif not plan:
+            plan = content
+
+    parts = []
+    if plan:
+        parts.append(f"Plan: {_clip(plan, max_chars // 2)}")
+    if result:
+        label = "Failed" if failed else "Result"
+        parts.append(f"{label}: {_clip(result, max_chars // 2)}")
+    return {"user": _clip(query, max_chars // 2), "assistant": " ".join(parts) or "No answer."}
+
+
+def add_turn(memory: dict, turn: dict, window: int):
+    """Appends a turn and returns (memory, evicted_turns) once the window overflows."""
+    turns = memory.get("turns", []) + [turn]
+    evicted = turns[:-window] if window > 0 else turns
+    kept = turns[len(evicted):]
+    return {"summary": memory.get("summary", ""), "turns": kept}, evicted
+
+
+def render_turns(turns: list) -> str:
+    return "\n".join(f"User: {t['user']}\nAssistant: {t['assistant']}" for t in turns)
+
+
+def render_history(memory: dict) -> str:
+    """Prompt text for the planner: running summary plus the recent window."""
+    if not memory or not (memory.get("summary") or memory.get("turns")):
+        return "No previous conversation"
+    sections = []
+    if memory.get("summary"):
+        sections.append(f"Summary of earlier conversation: {memory['summary']}")
+    if memory.get("turns"):
+        sections.append(render_turns(memory["turns"]))
+    return "\n".join(sections)
+
+
+def window_messages(memory: dict) -> list:
+    """Compact transcript of the recent window, used as the stored session messages."""
+    messages = []
+    for turn in memory.get("turns", []):
+        messages.append(HumanMessage(content=turn["user"]))
+        messages.append(AIMessage(content=turn["assistant"]))
+    return messages
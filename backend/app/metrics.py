@@ -0,0 +1,247 @@
+import contextvars
+import functools
+import inspect
+import math
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from langchain_core.callbacks import BaseCallbackHandler
+from app.core.config import settings
+
+try:
+    import resource
+except ImportError:  # Not available on Windows: peak RSS deltas are reported as 0
+    resource = None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, math.inf)
+TOKEN_BUCKETS = (16, 64, 256, 1024, 2048, 4096, 8192, 16384, 32768, math.inf)
+BYTES_BUCKETS = tuple(2 ** p for p in range(20, 34, 2)) + (math.inf,)  # 1 MiB .. 4 GiB
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels, rendered in the Prometheus text format."""
+
+    def __init__(self, name: str, documentation: str, buckets, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        self._series = {}  # label values -> [per-bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, list(counts), total, count) for key, (counts, total, count) in self._series.items())
+        for key, counts, total, count in series:
+            labels = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                le = "+Inf" if bound == math.inf else repr(float(bound))
+                bucket_labels = ",".join(labels + [f'le="{le}"'])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+            suffix = f"{{{','.join(labels)}}}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {total}")
+            lines.append(f"{self.name}_count{suffix} {count}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def histogram(self, name: str, documentation: str, buckets, labelnames=()) -> Histogram:
+        metric = Histogram(name, documentation, buckets, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+NODE_SECONDS = REGISTRY.histogram(
+    "agent_node_duration_seconds", "Wall time of graph node runs.", LATENCY_BUCKETS, ["node"])
+TOOL_SECONDS = REGISTRY.histogram(
+    "agent_tool_duration_seconds", "Wall time of tool calls by stage (total, load, exec, render, ...).",
+    LATENCY_BUCKETS, ["tool", "stage"])
+LLM_TOKENS = REGISTRY.histogram(
+    "agent_llm_tokens", "Tokens per LLM call by node; source is 'cache' for response cache hits.",
+    TOKEN_BUCKETS, ["node", "kind", "source"])
+PEAK_RSS_DELTA = REGISTRY.histogram(
+    "agent_peak_rss_delta_bytes", "Growth of the process's peak RSS during a node or tool call.",
+    BYTES_BUCKETS, ["scope"])
+TURN_SECONDS = REGISTRY.histogram(
+    "agent_turn_duration_seconds", "Wall time of a chat turn.", LATENCY_BUCKETS)
+
+# The timing record of the chat turn being processed, shared by the tasks and threads it spawns
+_turn = contextvars.ContextVar("metrics_turn", default=None)
+# Name of the node running in this context, for LLM calls made outside a graph run
+_node = contextvars.ContextVar("metrics_node", default=None)
+
+
+def peak_rss() -> int:
+    """Peak resident set size of this process in bytes, or 0 when unknown."""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def start_turn():
+    """Starts the per-turn timing record for this context; returns a token for finish_turn."""
+    return _turn.set({
+        "started": time.perf_counter(),
+        "nodes": {},
+        "tools": {},
+        "llm_tokens": {"prompt": 0, "completion": 0},
+        "peak_rss_delta_bytes": 0,
+    })
+
+
+def finish_turn(token) -> dict:
+    """Closes the turn started with `token` and returns its timings for the result frame."""
+    turn = _turn.get()
+    _turn.reset(token)
+    if turn is None:
+        return None
+    total = time.perf_counter() - turn.pop("started")
+    if settings.METRICS_ENABLED:
+        TURN_SECONDS.observe(total)
+    return {"total_seconds": round(total, 4), **turn}
+
+
+def _add_to_turn(section: str, key: str, value, sub: str = None):
+    turn = _turn.get()
+    if turn is None:
+        return
+    if section == "peak_rss_delta_bytes":
+        turn[section] = max(turn[section], value)
+        return
+    target = turn[section].setdefault(key, {}) if sub else turn[section]
+    name = sub or key
+    target[name] = round(target.get(name, 0) + value, 4)
+
+
+def observe_stage(tool: str, stage: str, seconds: float):
+    if not settings.METRICS_ENABLED:
+        return
+    TOOL_SECONDS.observe(seconds, tool=tool, stage=stage)
+    _add_to_turn("tools", tool, seconds, sub=stage)
+
+
+def observe_rss(scope: str, delta: int):
+    if not settings.METRICS_ENABLED or delta is None:
+        return
+    PEAK_RSS_DELTA.observe(max(delta, 0), scope=scope)
+    _add_to_turn("peak_rss_delta_bytes", scope, max(delta, 0))
+
+
+@contextmanager
+def track_node(name: str):
+    """Times a node run and the growth of peak RSS while it runs."""
+    token = _node.set(name)
+    started, rss = time.perf_counter(), peak_rss()
+    try:
+        yield
+    finally:
+        _node.reset(token)
+        if settings.METRICS_ENABLED:
+            seconds = time.perf_counter() - started
+            NODE_SECONDS.observe(seconds, node=name)
+            _add_to_turn("nodes", name, seconds)
+            observe_rss(name, peak_rss() - rss)
+
+
+@contextmanager
+def track_stage(tool: str, stage: str = "total"):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(tool, stage, time.perf_counter() - started)
+
+
+def instrument_node(name: str, func):
+    """Wraps a sync or async node function so each run is timed under `name`."""
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def wrapper(state):
+            with track_node(name):
+                return await func(state)
+    else:
+        @functools.wraps(func)
+        def wrapper(state):
+            with track_node(name):
+                return func(state)
+    return wrapper
+
+
+class TokenUsageHandler(BaseCallbackHandler):
+    """Records prompt/completion tokens of every chat model call, labelled by graph node."""
+
+    run_inline = True
+
+    def __init__(self):
+        self._nodes = {}  # run_id -> node name
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        self._nodes[run_id] = (metadata or {}).get("langgraph_node") or _node.get() or "other"
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._nodes.pop(run_id, None)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        node = self._nodes.pop(run_id, None) or _node.get() or "other"
+        if not settings.METRICS_ENABLED:
+            return
+        prompt, completion, cached = _token_usage(response)
+        source = "cache" if cached else "llm"
+        for kind, count in (("prompt", prompt), ("completion", completion)):
+            if count is None:
+                continue
+            LLM_TOKENS.observe(count, node=node, kind=kind, source=source)
+            if not cached:
+                _add_to_turn("llm_tokens", kind, count)
+
+
+def _token_usage(response):
+    """(prompt, completion, cached) for an LLM result; token counts are None where the provider didn't say."""
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                # LangChain zeroes the cost of responses served from the cache; those tokens weren't billed
+                return usage.get("input_tokens"), usage.get("output_tokens"), usage.get("total_cost") == 0
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    return usage.get("prompt_tokens"), usage.get("completion_tokens"), False
+
+
+token_usage_handler = TokenUsageHandler()
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
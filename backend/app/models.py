@@ -1,10 +1,19 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional, Any
 
 class ChatRequest(BaseModel):
     message: str
     thread_id: str = "default"
+    bypass_cache: bool = False
+    mode: Optional[str] = None  # "fused" or "two_stage"; defaults to settings.GRAPH_MODE
+    error_bound: Optional[float] = None  # Accept approximate answers whose proportions/shares are within ±this (absolute, 95% confidence); defaults to settings.SAMPLING_ERROR_BOUND
+    exact: bool = False  # Always use every row, even when the upload has samples
 
 class ChatResponse(BaseModel):
     response: str
     history: List[Any] = []
+
+class PlanAndCode(BaseModel):
+    """Structured output of the fused planner+coder call."""
+    plan: str = Field(description="Concise step-by-step plan for answering the query")
+    code: str = Field(description="Raw python code (no markdown fences) that carries out the plan on 'df'")
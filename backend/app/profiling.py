@@ -0,0 +1,245 @@
+import os
+import numpy as np
+import pandas as pd
+from app.ingest import has_columnar, columnar_path, file_format, csv_options
+from app.schema_context import column_profile
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+
+class RunningMoments:
+    """One-pass count/mean/variance/min/max, merged chunk by chunk (Welford/Chan)."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+
+    def update(self, values: np.ndarray):
+        n_b = len(values)
+        if n_b == 0:
+            return
+        mean_b = float(values.mean())
+        m2_b = float(((values - mean_b) ** 2).sum())
+        n_a = self.count
+        n = n_a + n_b
+        delta = mean_b - self.mean
+        self.mean += delta * n_b / n
+        self.m2 += m2_b + delta ** 2 * n_a * n_b / n
+        self.count = n
+        chunk_min, chunk_max = values.min(), values.max()
+        self.min = chunk_min if self.min is None else min(self.min, chunk_min)
+        self.max = chunk_max if self.max is None else max(self.max, chunk_max)
+
+    @property
+    def std(self) -> float:
+        return (self.m2 / (self.count - 1)) ** 0.5 if self.count > 1 else float('nan')
+
+
+class ReservoirSample:
+    """Uniform fixed-size sample of a stream (bottom-k random priorities), used for approximate quantiles."""
+
+    def __init__(self, size: int, seed: int = 0):
+        self.size = size
+        self._rng = np.random.default_rng(seed)
+        self._values = np.empty(0)
+        self._keys = np.empty(0)
+
+    def update(self, values: np.ndarray):
+        if len(values) == 0:
+            return
+        values = np.concatenate([self._values, values.astype(float)])
+        keys = np.concatenate([self._keys, self._rng.random(len(values) - len(self._keys))])
+        if len(values) > self.size:
+            keep = np.argpartition(keys, self.size)[:self.size]
+            values, keys = values[keep], keys[keep]
+        self._values, self._keys = values, keys
+
+    def quantiles(self, qs) -> list:
+        if len(self._values) == 0:
+            return [float('nan')] * len(qs)
+        return list(np.quantile(self._values, qs))
+
+
+class HyperLogLog:
+    """Approximate distinct counter with 2**p one-byte registers."""
+
+    def __init__(self, p: int = 14):
+        self.p = p
+        self.m = 1 << p
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+
+    def update(self, values: pd.Series):
+        if len(values) == 0:
+            return
+        hashes = pd.util.hash_array(values.to_numpy(), categorize=False).astype(np.uint64)
+        index = (hashes >> np.uint64(64 - self.p)).astype(np.int64)
+        remainder = (hashes << np.uint64(self.p)) & np.uint64(0xFFFFFFFFFFFFFFFF)
+        max_rank = 64 - self.p + 1
+        with np.errstate(divide='ignore'):
+            leading_zeros = 63 - np.floor(np.log2(remainder.astype(np.float64)))
+        rank = np.where(remainder == 0, max_rank, np.minimum(leading_zeros + 1, max_rank)).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def estimate(self) -> int:
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        raw = alpha * self.m ** 2 / np.sum(2.0 ** -self.registers.astype(np.float64))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * self.m and zeros:
+            # Small-range correction: linear counting
+            return int(round(self.m * np.log(self.m / zeros)))
+        return int(round(raw))
+
+
+def is_streamable(file_path: str) -> bool:
+    """True when the file can be read in chunks (CSV text or an Arrow copy)."""
+    return has_columnar(file_path) or file_format(file_path) == "csv"
+
+
+def iter_chunks(file_path: str, chunk_rows: int):
+    """Yields the upload as DataFrame chunks without materializing the whole file."""
+    if has_columnar(file_path):
+        reader = pa.ipc.open_file(pa.memory_map(columnar_path(file_path), "r"))
+        for i in range(reader.num_record_batches):
+            yield reader.get_batch(i).to_pandas()
+    elif file_format(file_path) == "csv":
+        yield from pd.read_csv(file_path, chunksize=chunk_rows, **csv_options(file_path))
+    else:
+        raise ValueError("Streaming profiling supports CSV files and columnar copies only.")
+
+
+def _combine_dtypes(dtypes: list) -> str:
+    """Final dtype of a column whose chunks were inferred independently."""
+    unique = list(dict.fromkeys(str(d) for d in dtypes))
+    if len(unique) == 1:
+        return unique[0]
+    if all(pd.api.types.is_numeric_dtype(d) and not pd.api.types.is_bool_dtype(d) for d in dtypes):
+        return str(np.result_type(*[np.dtype(d) for d in dtypes]))
+    return 'object'
+
+
+def _is_numeric(dtype_name: str) -> bool:
+    try:
+        return np.dtype(dtype_name).kind in 'iuf'
+    except TypeError:
+        return False
+
+
+def _sizeof_fmt(num: float, size_qualifier: str) -> str:
+    for unit in ["bytes", "KB", "MB", "GB", "TB"]:
+        if num < 1024.0:
+            return f"{num:3.1f}{size_qualifier} {unit}"
+        num /= 1024.0
+    return f"{num:3.1f}{size_qualifier} PB"
+
+
+def _format_info(columns, dtypes, non_null, total_rows, memory_bytes) -> str:
+    """Renders the same layout as DataFrame.info()."""
+    rows = [(f" {i:<2}", str(col), f"{non_null[col]} non-null", dtypes[col]) for i, col in enumerate(columns)]
+    headers = (" # ", "Column", "Non-Null Count", "Dtype")
+    widths = [max(len(headers[i]), *(len(r[i]) for r in rows)) if rows else len(headers[i]) for i in range(4)]
+    gap = "  "
+
+    def fmt(cells):
+        return gap.join(cell.ljust(widths[i]) for i, cell in enumerate(cells))
+
+    lines = [
+        str(pd.DataFrame),
+        f"RangeIndex: {total_rows} entries, 0 to {max(total_rows - 1, 0)}",
+        f"Data columns (total {len(columns)} columns):",
+        fmt(headers),
+        fmt(tuple("-" * len(h.strip()) if i else "---" for i, h in enumerate(headers))),
+    ]
+    lines.extend(fmt(r) for r in rows)
+    counts = pd.Series(list(dtypes.values())).value_counts().sort_index()
+    lines.append("dtypes: " + ", ".join(f"{d}({n})" for d, n in counts.items()))
+    has_object = any(d in ('object', 'str', 'string') for d in dtypes.values())
+    lines.append(f"memory usage: {_sizeof_fmt(memory_bytes, '+' if has_object else '')}")
+    return "\n".join(lines) + "\n"
+
+
+def profile_streaming(file_path: str, chunk_rows: int = 100_000, sample_size: int = 10_000):
+    """Profiles a file chunk by chunk with bounded memory.
+
+    Returns (info_str, head_str, numeric_summary, schema): the first three in
+    the same text layout that df.info(), df.head(5) and df.describe() produce
+    for an in-memory frame, the last as the compact schema used for prompts.
+    Quantiles come from a reservoir sample and distinct counts from HyperLogLog,
+    so both are approximate; counts, mean, std, min and max are exact.
+    """
+    columns = None
+    head = None
+    total_rows = 0
+    memory_bytes = 0
+    chunk_dtypes = {}
+    non_null = {}
+    moments = {}
+    samples = {}
+    distinct = {}
+    exemplars = {}
+
+    for chunk in iter_chunks(file_path, chunk_rows):
+        if columns is None:
+            columns = list(chunk.columns)
+            head = chunk.head(5)
+            # Frequent values from the first chunk stand in for exemplars
+            exemplars = {col: chunk[col].dropna().value_counts().index[:3].tolist() for col in columns}
+            for col in columns:
+                chunk_dtypes[col] = []
+                non_null[col] = 0
+                moments[col] = RunningMoments()
+                samples[col] = ReservoirSample(sample_size)
+                distinct[col] = HyperLogLog()
+        total_rows += len(chunk)
+        memory_bytes += int(chunk.memory_usage(index=False, deep=False).sum())
+        for col in columns:
+            series = chunk[col]
+            chunk_dtypes[col].append(series.dtype)
+            values = series.dropna()
+            non_null[col] += len(values)
+            distinct[col].update(values)
+            if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+                numeric = values.to_numpy(dtype=float)
+                moments[col].update(numeric)
+                samples[col].update(numeric)
+
+    if columns is None:
+        raise ValueError("File contains no data.")
+
+    dtypes = {col: _combine_dtypes(chunk_dtypes[col]) for col in columns}
+    info_str = _format_info(columns, dtypes, non_null, total_rows, memory_bytes + 132)
+    head_str = head.to_string()
+
+    numeric_cols = [col for col in columns if _is_numeric(dtypes[col])]
+    numeric_summary = ""
+    if numeric_cols:
+        stats = {}
+        for col in numeric_cols:
+            m = moments[col]
+            q25, q50, q75 = samples[col].quantiles([0.25, 0.5, 0.75])
+            stats[col] = [float(m.count), m.mean, m.std, m.min, q25, q50, q75, m.max, float(distinct[col].estimate())]
+        numeric_summary = pd.DataFrame(
+            stats, index=["count", "mean", "std", "min", "25%", "50%", "75%", "max", "approx_unique"]
+        ).to_string()
+
+    schema = {
+        "n_rows": total_rows,
+        "columns": [
+            column_profile(
+                col, dtypes[col],
+                1 - non_null[col] / total_rows if total_rows else 0.0,
+                distinct[col].estimate(),
+                exemplars[col],
+                moments[col].min if col in numeric_cols else None,
+                moments[col].max if col in numeric_cols else None,
+            )
+            for col in columns
+        ],
+    }
+
+    return info_str, head_str, numeric_summary, schema
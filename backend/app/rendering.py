@@ -0,0 +1,48 @@
+import io
+import math
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from app.core.config import settings
+
+# Figures are independent objects, so they can be rasterized/serialized
+# concurrently; PNG encoding and JSON dumping release the GIL for much of
+# their work. Threads rather than processes: this already runs inside a
+# sandbox worker and figures would have to be pickled across.
+_render_pool = ThreadPoolExecutor(max_workers=settings.RENDER_THREADS, thread_name_prefix="render")
+
+
+def render_png(fig) -> bytes:
+    """Rasterizes one matplotlib figure to PNG bytes."""
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=100, bbox_inches='tight')
+    return buffer.getvalue()
+
+
+def render_plotly_json(fig) -> bytes:
+    """Serializes one Plotly figure to its compact JSON spec."""
+    return fig.to_json().encode('utf-8')
+
+
+def compose_grid(pngs: list, max_cols: int = 2) -> bytes:
+    """Tiles already-rendered PNGs into one image (max 2 columns), without re-plotting."""
+    images = [Image.open(io.BytesIO(png)).convert('RGBA') for png in pngs]
+    cols = min(max_cols, len(images))
+    rows = math.ceil(len(images) / cols)
+    cell_w = max(img.width for img in images)
+    cell_h = max(img.height for img in images)
+    canvas = Image.new('RGBA', (cell_w * cols, cell_h * rows), (255, 255, 255, 255))
+    for idx, img in enumerate(images):
+        canvas.paste(img, ((idx % cols) * cell_w, (idx // cols) * cell_h))
+    buffer = io.BytesIO()
+    canvas.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def render_figures(mpl_figures: list, plotly_figures: list):
+    """Renders every figure exactly once, in parallel.
+
+    Returns (png_bytes_list, json_bytes_list) in input order.
+    """
+    png_futures = [_render_pool.submit(render_png, fig) for fig in mpl_figures]
+    json_futures = [_render_pool.submit(render_plotly_json, fig) for fig in plotly_figures]
+    return [f.result() for f in png_futures], [f.result() for f in json_futures]
@@ -0,0 +1,162 @@
+import ast
+import copy
+import hashlib
+import threading
+from collections import OrderedDict
+from app.artifacts import copy_artifact
+from app.session_store import estimate_size
+
+# Modules generated code may import and still be replayable from cache
+PURE_MODULES = {"pandas", "numpy", "matplotlib", "seaborn", "plotly", "math", "statistics", "datetime", "collections", "itertools", "functools", "re", "textwrap", "calendar"}
+# Builtins that touch the outside world or defeat static inspection
+IMPURE_BUILTINS = {"open", "exec", "eval", "compile", "__import__", "input", "globals", "vars", "setattr", "delattr", "breakpoint"}
+# Methods that write files or draw from a random source
+IMPURE_METHODS = {
+    "to_csv", "to_excel", "to_parquet", "to_feather", "to_pickle", "to_sql", "to_hdf", "to_stata", "to_clipboard",
+    "savefig", "write_html", "write_image", "write_json", "now", "today", "utcnow", "rand", "randn", "randint",
+    "choice", "shuffle", "permutation", "default_rng",
+}
+# Sampling is deterministic only when seeded
+SEEDABLE_METHODS = {"sample"}
+
+FAILURE_MARKERS = ("Error executing code", "System Error")
+
+
+def code_fingerprint(code: str):
+    """SHA-256 of the code's AST, so formatting and comments don't change the key. None if it doesn't parse."""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+    return hashlib.sha256(ast.dump(tree, include_attributes=False).encode("utf-8")).hexdigest()
+
+
+def is_side_effect_free(code: str) -> bool:
+    """True if replaying the cached result is indistinguishable from running the code again.
+
+    Rejects imports outside the analysis stack, file/IO builtins, writers,
+    clock reads and unseeded randomness.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return False
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            if any(alias.name.split(".")[0] not in PURE_MODULES for alias in node.names):
+                return False
+        elif isinstance(node, ast.ImportFrom):
+            if node.level or (node.module or "").split(".")[0] not in PURE_MODULES:
+                return False
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            return False
+        elif isinstance(node, ast.Name) and node.id in IMPURE_BUILTINS:
+            return False
+        elif isinstance(node, ast.Attribute) and (node.attr in IMPURE_METHODS or node.attr == "random" or node.attr.startswith("__")):
+            return False
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr in SEEDABLE_METHODS:
+            if not any(kw.arg == "random_state" for kw in node.keywords):
+                return False
+    return True
+
+
+def _artifact_ids(result: dict) -> list:
+    ids = [fig["artifact"]["id"] for fig in result.get("plotly_figures") or []]
+    if result.get("image"):
+        ids.append(result["image"]["id"])
+    return ids
+
+
+class ResultCache:
+    """LRU cache of execution results keyed by (dataset content hash, code AST hash), bounded by size.
+
+    Results hold artifact references, not figure bytes. A hit from another
+    session copies the artifacts into that session's directory first, so each
+    session only ever serves files under its own plots folder.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (session_id, result, nbytes)
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, content_hash: str, code: str):
+        """Cache key for running `code` on a dataset, or None if the run must not be cached."""
+        if not content_hash or not is_side_effect_free(code):
+            return None
+        code_hash = code_fingerprint(code)
+        return f"{content_hash}:{code_hash}" if code_hash else None
+
+    def get(self, key: str, session_id: str):
+        """Returns a copy of the cached result with artifacts available to `session_id`, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+        source_session, result, _ = entry
+        result = copy.deepcopy(result)
+
+        if source_session != session_id:
+            copied = {}
+            for artifact_id in _artifact_ids(result):
+                ref = copy_artifact(source_session, session_id, artifact_id)
+                if ref is None:
+                    # Source artifacts were cleaned up: the entry can't be replayed
+                    self.invalidate(key)
+                    with self._lock:
+                        self.misses += 1
+                    return None
+                copied[artifact_id] = ref
+            for fig in result.get("plotly_figures") or []:
+                fig["artifact"] = copied[fig["artifact"]["id"]]
+            if result.get("image"):
+                result["image"] = copied[result["image"]["id"]]
+
+        with self._lock:
+            self.hits += 1
+        return result
+
+    def put(self, key: str, session_id: str, result: dict):
+        """Stores a successful result and evicts least recently used entries until under budget."""
+        if any(marker in result.get("output", "") for marker in FAILURE_MARKERS):
+            return
+        nbytes = estimate_size(result)
+        with self._lock:
+            self._discard(key)
+            if nbytes > self.max_bytes:
+                return
+            self._entries[key] = (session_id, copy.deepcopy(result), nbytes)
+            self.current_bytes += nbytes
+            while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+                self.evictions += 1
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._discard(key)
+
+    def _discard(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= entry[2]
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current memory usage."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,327 @@
+import ast
+import json
+import math
+import os
+from collections import defaultdict
+import numpy as np
+import pandas as pd
+from app.ingest import write_columnar
+from app.profiling import iter_chunks
+from app.storage import blob_dir
+from app.validation import referenced_columns
+
+MANIFEST_NAME = "manifest.json"
+# Normal quantile for the 95% confidence level used in error bounds
+Z_95 = 1.96
+# Methods and aggregation names whose answer a sample gets wrong rather than approximately
+# right: extremes and orderings, distinct values, and single rows
+EXACT_METHODS = {"min", "max", "idxmin", "idxmax", "nlargest", "nsmallest", "sort_values", "rank",
+                 "cummin", "cummax", "describe", "unique", "nunique", "drop_duplicates", "duplicated",
+                 "first", "last", "first_valid_index", "last_valid_index", "mode"}
+# Totals: row counts, sums and frequencies (including count-based charts) come out
+# sample-sized, so they run on all rows instead of relying on the code to scale them
+TOTAL_METHODS = {"sum", "count", "size", "shape", "cumsum", "cumcount", "ngroups", "info",
+                 "hist", "histplot", "countplot", "histogram"}
+EXACT_BUILTINS = {"min", "max", "sorted", "set", "len", "sum"}
+
+
+def samples_dir(content_hash: str) -> str:
+    return os.path.join(blob_dir(content_hash), 'samples')
+
+
+class RowReservoir:
+    """Uniform sample of up to `size` DataFrame rows from a stream (bottom-k random priorities).
+
+    Because the kept rows are the ones with the smallest priorities, the first
+    k rows by priority are themselves a uniform sample of size k: one pass
+    yields nested samples of every smaller size.
+    """
+
+    def __init__(self, size: int, rng: np.random.Generator):
+        self.size = size
+        self._rng = rng
+        self._kept = None
+        self._pending = []
+        self._pending_rows = 0
+        self._threshold = 1.0
+
+    def update(self, chunk: pd.DataFrame, row_ids: np.ndarray):
+        keys = self._rng.random(len(chunk))
+        accept = keys < self._threshold
+        if not accept.any():
+            return
+        part = chunk[accept].copy()
+        part["__key"] = keys[accept]
+        part["__row"] = row_ids[accept]
+        self._pending.append(part)
+        self._pending_rows += len(part)
+        # Compact lazily so the big reservoir isn't copied on every chunk
+        if self._pending_rows >= self.size:
+            self._compact()
+
+    def _compact(self):
+        frames = ([self._kept] if self._kept is not None else []) + self._pending
+        if not frames:
+            return
+        rows = pd.concat(frames, ignore_index=True)
+        self._pending, self._pending_rows = [], 0
+        if len(rows) > self.size:
+            keep = np.argpartition(rows["__key"].to_numpy(), self.size - 1)[:self.size]
+            rows = rows.iloc[keep]
+            self._threshold = float(rows["__key"].max())
+        self._kept = rows.sort_values("__key", kind="stable").reset_index(drop=True)
+
+    def take(self, k: int) -> pd.DataFrame:
+        """The k lowest-priority rows, back in file order, without helper columns."""
+        self._compact()
+        if self._kept is None:
+            return pd.DataFrame()
+        return self._kept.head(k).sort_values("__row").drop(columns=["__key", "__row"]).reset_index(drop=True)
+
+
+def _pick_strata_column(chunk: pd.DataFrame, max_strata: int):
+    """Text column with 2..max_strata values whose rarest value is rarest: where uniform sampling is weakest."""
+    best, best_share = None, None
+    for col in chunk.columns:
+        series = chunk[col]
+        if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+            continue
+        counts = series.astype(str).value_counts()
+        if not 2 <= len(counts) <= max_strata:
+            continue
+        share = counts.iloc[-1] / len(series)
+        if best_share is None or share < best_share:
+            best, best_share = col, share
+    return best
+
+
+def _write_sample(directory: str, sample_id: str, df: pd.DataFrame) -> str:
+    file_name = f"{sample_id}.arrow"
+    write_columnar(df, os.path.join(directory, file_name))
+    return file_name
+
+
+def build_samples(file_path: str, directory: str, sizes: list, chunk_rows: int = 100_000, max_strata: int = 50, seed: int = 0):
+    """Streams the upload once and writes uniform and stratified samples at each size.
+
+    Returns the manifest (also saved as manifest.json), or None when the file
+    is not larger than the smallest sample.
+    """
+    sizes = sorted(sizes)
+    rng = np.random.default_rng(seed)
+    uniform = RowReservoir(sizes[-1], rng)
+    strata_column = None
+    strata = {}
+    strata_totals = defaultdict(int)
+    per_stratum_cap = None
+    total_rows = 0
+
+    for chunk in iter_chunks(file_path, chunk_rows):
+        row_ids = np.arange(total_rows, total_rows + len(chunk))
+        if total_rows == 0:
+            strata_column = _pick_strata_column(chunk, max_strata)
+            if strata_column is not None:
+                per_stratum_cap = max(1, sizes[-1] // chunk[strata_column].astype(str).nunique())
+        total_rows += len(chunk)
+        uniform.update(chunk, row_ids)
+
+        if strata_column is not None:
+            labels = chunk[strata_column].astype(str).to_numpy()
+            for value in pd.unique(labels):
+                mask = labels == value
+                strata_totals[value] += int(mask.sum())
+                if value not in strata:
+                    strata[value] = RowReservoir(per_stratum_cap, rng)
+                strata[value].update(chunk[mask], row_ids[mask])
+            if len(strata) > 2 * max_strata:
+                # Too many distinct values after all: not a useful stratification
+                strata_column, strata = None, {}
+
+    sizes = [s for s in sizes if s < total_rows]
+    if not sizes:
+        return None
+
+    os.makedirs(directory, exist_ok=True)
+    manifest = {"total_rows": total_rows, "uniform": [], "stratified": None}
+    for size in sizes:
+        sample = uniform.take(size)
+        sample_id = f"uniform_{size}"
+        manifest["uniform"].append({"id": sample_id, "rows": len(sample), "file": _write_sample(directory, sample_id, sample)})
+
+    if strata_column is not None:
+        stratified = {"column": strata_column, "strata_totals": dict(strata_totals), "samples": []}
+        for size in sizes:
+            # Equal allocation: rare groups get as many rows as common ones
+            per_stratum = max(1, size // len(strata))
+            parts = [reservoir.take(per_stratum) for reservoir in strata.values()]
+            sample = pd.concat(parts, ignore_index=True)
+            sample_id = f"stratified_{size}"
+            stratified["samples"].append({
+                "id": sample_id,
+                "rows": len(sample),
+                "file": _write_sample(directory, sample_id, sample),
+                "strata_rows": {value: len(part) for value, part in zip(strata, parts)},
+            })
+        manifest["stratified"] = stratified
+
+    tmp_path = os.path.join(directory, MANIFEST_NAME + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, os.path.join(directory, MANIFEST_NAME))
+    return manifest
+
+
+def load_manifest(directory: str):
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def required_rows(error_bound: float, population: int) -> int:
+    """Sample size giving an absolute margin of +/- error_bound on a proportion at 95% confidence
+    (worst case p=0.5, finite population). Means and other statistics get no such guarantee."""
+    n0 = (Z_95 * 0.5 / error_bound) ** 2
+    return math.ceil(n0 / (1 + (n0 - 1) / population))
+
+
+def _column_of(node):
+    """The column name of df['col'] or df.col, else None."""
+    if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name) and node.value.id == "df":
+        if isinstance(node.slice, ast.Constant) and isinstance(node.slice.value, str):
+            return node.slice.value
+    if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id == "df":
+        return node.attr
+    return None
+
+
+def _point_lookup_columns(tree) -> set:
+    """Columns compared for equality (df['id'] == x, df.id.isin([...]), query("id == x"))."""
+    columns = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Compare) and any(isinstance(op, (ast.Eq, ast.In)) for op in node.ops):
+            columns.update(c for c in map(_column_of, [node.left] + node.comparators) if c)
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+            if node.func.attr == "isin":
+                column = _column_of(node.func.value)
+                if column:
+                    columns.add(column)
+            elif node.func.attr == "query" and node.args and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, str):
+                try:
+                    expr = ast.parse(node.args[0].value.replace("`", ""), mode="eval")
+                except SyntaxError:
+                    columns.add(None)  # Can't tell what it filters on
+                    continue
+                for cmp in ast.walk(expr):
+                    if isinstance(cmp, ast.Compare) and any(isinstance(op, (ast.Eq, ast.In)) for op in cmp.ops):
+                        columns.update(n.id for n in [cmp.left] + cmp.comparators if isinstance(n, ast.Name))
+    return columns
+
+
+def needs_full_data(tree, cardinality: dict = None, max_groups: int = 50) -> bool:
+    """Whether the code asks for something a sample answers wrongly rather than approximately.
+
+    That is extremes and orderings (min/max, nlargest, sort_values, describe), distinct
+    values (unique/nunique), totals (len, shape, count, size, sum, value_counts without
+    normalize=True) and equality filters on columns with more than max_groups distinct
+    values (point lookups), where the matching rows are likely not in the sample.
+    """
+    cardinality = cardinality or {}
+    exact = EXACT_METHODS | TOTAL_METHODS
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Attribute) and node.attr in exact:
+            return True
+        if isinstance(node, ast.Call):
+            if isinstance(node.func, ast.Name) and node.func.id in EXACT_BUILTINS:
+                return True
+            if isinstance(node.func, ast.Attribute) and node.func.attr == "value_counts" and not any(
+                    kw.arg == "normalize" and isinstance(kw.value, ast.Constant) and kw.value.value is True for kw in node.keywords):
+                return True
+            # Aggregations by name: agg('max'), agg(['min', 'mean']), agg(top=('sales', 'max')), aggfunc='nunique'
+            for arg in list(node.args) + [kw.value for kw in node.keywords]:
+                for const in ast.walk(arg):
+                    if isinstance(const, ast.Constant) and isinstance(const.value, str) and const.value in exact:
+                        return True
+    for column in _point_lookup_columns(tree):
+        if column is None or cardinality.get(column, math.inf) > max_groups:
+            return True
+    return False
+
+
+def select_sample(manifest: dict, directory: str, error_bound: float, code: str = "", cardinality: dict = None, max_groups: int = 50):
+    """Smallest sample meeting the error bound, as a descriptor for the executor; None means use all rows.
+
+    Code that refers to the stratification column gets a stratified sample,
+    whose bound must then hold within every group. Code that needs exact data
+    (see needs_full_data), or that doesn't parse, runs on all rows.
+    `cardinality` maps column names to their distinct counts.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+    if needs_full_data(tree, cardinality, max_groups):
+        return None
+    total_rows = manifest["total_rows"]
+    stratified = manifest.get("stratified")
+    if stratified and stratified["column"] in referenced_columns(tree):
+        totals = stratified["strata_totals"]
+        for sample in stratified["samples"]:
+            rows = sample["strata_rows"]
+            if all(rows.get(v, 0) >= min(n, required_rows(error_bound, n)) for v, n in totals.items()):
+                return {
+                    "id": sample["id"], "path": os.path.join(directory, sample["file"]), "rows": sample["rows"],
+                    "total_rows": total_rows, "error_bound": error_bound, "method": "stratified",
+                    "strata_column": stratified["column"],
+                    "strata_scale": {v: totals[v] / rows[v] for v in rows if rows[v]},
+                }
+        return None
+
+    needed = required_rows(error_bound, total_rows)
+    for sample in manifest["uniform"]:
+        if sample["rows"] >= needed:
+            return {
+                "id": sample["id"], "path": os.path.join(directory, sample["file"]), "rows": sample["rows"],
+                "total_rows": total_rows, "error_bound": error_bound, "method": "uniform",
+            }
+    return None
+
+
+def sample_info(sample: dict = None) -> dict:
+    """The `sample_info` variable given to generated code; scale factors are 1.0 on full data."""
+    if sample is None:
+        return {"approximate": False, "scale": 1.0, "strata_scale": defaultdict(lambda: 1.0)}
+    scale = sample["total_rows"] / sample["rows"]
+    info = {
+        "approximate": True,
+        "method": sample["method"],
+        "sample_rows": sample["rows"],
+        "total_rows": sample["total_rows"],
+        "scale": scale,
+        # A uniform sample has the same scale in every group
+        "strata_scale": defaultdict(lambda: scale),
+    }
+    if sample["method"] == "stratified":
+        info["strata_column"] = sample["strata_column"]
+        info["strata_scale"].update(sample["strata_scale"])
+    return info
+
+
+def approximate_label(sample: dict) -> str:
+    share = sample["rows"] / sample["total_rows"]
+    return (
+        f"≈ Approximate result: computed on a {sample['method']} sample of {sample['rows']:,} of "
+        f"{sample['total_rows']:,} rows ({share * 100:.2g}%). Proportions and shares are within about "
+        f"±{sample['error_bound'] * 100:.2g} percentage points at 95% confidence; other statistics have no stated bound. "
+        f"Ask for an exact rerun to use every row."
+    )
+
+
+def ensure_samples(file_path: str, content_hash: str, sizes: list, chunk_rows: int = 100_000, max_strata: int = 50):
+    """Returns the upload's sample manifest, building the samples on first use. Samples are shared by content hash."""
+    directory = samples_dir(content_hash)
+    manifest = load_manifest(directory)
+    if manifest is None:
+        manifest = build_samples(file_path, directory, sizes, chunk_rows, max_strata)
+    return manifest
@@ -0,0 +1,171 @@
+import multiprocessing
+import os
+import signal
+import threading
+import zlib
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; limits are skipped there
+    resource = None
+
+
+class CPUTimeExceeded(Exception):
+    pass
+
+
+def _raise_cpu_exceeded(signum, frame):
+    raise CPUTimeExceeded("CPU time limit exceeded")
+
+
+def _address_space_bytes() -> int:
+    """Current virtual memory size of this process (Linux), or 0 when unknown."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+def _set_call_limits(cpu_seconds: int, memory_bytes: int):
+    """Caps CPU time and address-space growth for the next call only."""
+    if resource is None:
+        return
+    used = resource.getrusage(resource.RUSAGE_SELF)
+    cpu_used = int(used.ru_utime + used.ru_stime)
+    _, cpu_hard = resource.getrlimit(resource.RLIMIT_CPU)
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_used + cpu_seconds, cpu_hard))
+    current = _address_space_bytes()
+    if current:
+        _, as_hard = resource.getrlimit(resource.RLIMIT_AS)
+        resource.setrlimit(resource.RLIMIT_AS, (current + memory_bytes, as_hard))
+
+
+def _clear_call_limits():
+    if resource is None:
+        return
+    for limit in (resource.RLIMIT_CPU, resource.RLIMIT_AS):
+        _, hard = resource.getrlimit(limit)
+        resource.setrlimit(limit, (hard, hard))
+
+
+def _worker_main(conn, cpu_seconds: int, memory_bytes: int):
+    """Worker loop: imports the analysis stack once, then serves execution requests."""
+    # Pre-warm the heavy imports so the first request doesn't pay for them
+    import plotly.express  # noqa: F401
+    import plotly.graph_objects  # noqa: F401
+    from app.tools import execute_code_in_process
+    from app.core.logging_config import configure_logging
+    configure_logging()
+
+    if hasattr(signal, "SIGXCPU"):
+        signal.signal(signal.SIGXCPU, _raise_cpu_exceeded)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if request is None:
+            break
+        code, file_path, session_id, sample = request
+        try:
+            _set_call_limits(cpu_seconds, memory_bytes)
+            result = execute_code_in_process(code, file_path, session_id, sample)
+        except CPUTimeExceeded as e:
+            result = {"output": f"Error executing code: {e}", "image": None, "plotly_figures": []}
+        except MemoryError:
+            result = {"output": "Error executing code: memory limit exceeded", "image": None, "plotly_figures": []}
+        finally:
+            _clear_call_limits()
+        conn.send(result)
+
+
+class _Worker:
+    def __init__(self, ctx, cpu_seconds: int, memory_bytes: int):
+        self._ctx = ctx
+        self._args = (cpu_seconds, memory_bytes)
+        self.lock = threading.Lock()
+        self.process = None
+        self.conn = None
+
+    def start(self):
+        parent_conn, child_conn = self._ctx.Pipe()
+        self.process = self._ctx.Process(target=_worker_main, args=(child_conn, *self._args), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+
+    def stop(self):
+        if self.process is None:
+            return
+        try:
+            self.conn.send(None)
+        except (OSError, BrokenPipeError):
+            pass
+        self.process.join(timeout=2)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+        self.process = None
+
+    def restart(self):
+        if self.process is not None and self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.process = None
+        self.start()
+
+
+class ExecutorPool:
+    """Pool of pre-warmed worker processes that run generated analysis code.
+
+    Each session is pinned to one worker so its DataFrame stays resident in that
+    worker's cache across turns. Calls block the calling thread until the worker
+    replies or the wall-clock timeout expires, in which case the worker is
+    replaced.
+    """
+
+    def __init__(self, size: int, cpu_seconds: int, memory_bytes: int, timeout: float):
+        self.size = size
+        self.timeout = timeout
+        ctx = multiprocessing.get_context("spawn")
+        self._workers = [_Worker(ctx, cpu_seconds, memory_bytes) for _ in range(size)]
+        self._started = False
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self._started:
+                return
+            for worker in self._workers:
+                worker.start()
+            self._started = True
+
+    def shutdown(self):
+        with self._start_lock:
+            for worker in self._workers:
+                worker.stop()
+            self._started = False
+
+    def _worker_for(self, session_id: str) -> _Worker:
+        return self._workers[zlib.crc32((session_id or "").encode()) % self.size]
+
+    def run(self, code: str, file_path: str, session_id: str = None, sample: dict = None) -> dict:
+        """Executes code in the session's worker and returns the usual result dict."""
+        self.start()
+        worker = self._worker_for(session_id)
+        with worker.lock:
+            try:
+                worker.conn.send((code, file_path, session_id, sample))
+                if worker.conn.poll(self.timeout):
+                    return worker.conn.recv()
+                worker.restart()
+                return {"output": f"Error executing code: execution timed out after {self.timeout}s",
+                        "image": None, "plotly_figures": []}
+            except (EOFError, OSError, BrokenPipeError):
+                # The worker died (e.g. killed by the OS); replace it for the next call
+                worker.restart()
+                return {"output": "System Error: execution worker crashed", "image": None, "plotly_figures": []}
@@ -0,0 +1,125 @@
+import difflib
+import re
+import numpy as np
+import pandas as pd
+
+# Rough chars-per-token ratio for English text and identifiers
+CHARS_PER_TOKEN = 4
+MAX_EXEMPLAR_CHARS = 24
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _short(value) -> str:
+    # Six significant digits are plenty for the model to judge scale and format
+    text = f"{value:.6g}" if isinstance(value, (float, np.floating)) else str(value)
+    return text if len(text) <= MAX_EXEMPLAR_CHARS else text[:MAX_EXEMPLAR_CHARS - 1] + "…"
+
+
+def column_profile(name, dtype, null_rate: float, cardinality: int, exemplars: list, vmin=None, vmax=None) -> dict:
+    """One column of the compact schema (JSON-serializable, stored in session state)."""
+    profile = {
+        "name": str(name),
+        "dtype": str(dtype),
+        "null_rate": round(float(null_rate), 4),
+        "cardinality": int(cardinality),
+        "exemplars": [_short(v) for v in exemplars],
+    }
+    if vmin is not None and vmax is not None:
+        profile["min"] = _short(vmin)
+        profile["max"] = _short(vmax)
+    return profile
+
+
+def schema_from_frame(df: pd.DataFrame, n_exemplars: int = 3) -> dict:
+    """Builds the compact schema of an in-memory DataFrame."""
+    n_rows = len(df)
+    columns = []
+    for name in df.columns:
+        series = df[name]
+        non_null = series.dropna()
+        null_rate = 1 - len(non_null) / n_rows if n_rows else 0.0
+        exemplars = non_null.value_counts().index[:n_exemplars].tolist() if len(non_null) else []
+        vmin = vmax = None
+        if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series) and len(non_null):
+            vmin, vmax = non_null.min(), non_null.max()
+        columns.append(column_profile(name, series.dtype, null_rate, non_null.nunique(), exemplars, vmin, vmax))
+    return {"n_rows": n_rows, "columns": columns}
+
+
+def render_column(col: dict) -> str:
+    parts = [col["dtype"], f"{col['null_rate']:.0%} null", f"{col['cardinality']} distinct"]
+    if "min" in col:
+        parts.append(f"range {col['min']}..{col['max']}")
+    line = f"- {col['name']} ({', '.join(parts)})"
+    if col["exemplars"]:
+        line += f" e.g. {', '.join(col['exemplars'])}"
+    return line
+
+
+def _name_tokens(text: str) -> set:
+    # Split snake_case, kebab-case, spaces and camelCase into lowercase words
+    words = re.sub(r"([a-z])([A-Z])", r"\1 \2", text)
+    return {w for w in re.split(r"[^A-Za-z0-9]+", words.lower()) if w}
+
+
+def _relevance(col_name: str, query_tokens: set, query_text: str) -> float:
+    name_tokens = _name_tokens(col_name)
+    score = 0.0
+    if col_name.lower() in query_text:
+        score += 3.0
+    score += 2.0 * len(name_tokens & query_tokens)
+    for token in name_tokens:
+        if len(token) > 3 and difflib.get_close_matches(token, query_tokens, n=1, cutoff=0.8):
+            score += 1.0
+    return score
+
+
+def render_schema_context(schema: dict, query: str = "", token_budget: int = 1500) -> str:
+    """Renders the schema as compact text that fits in `token_budget` tokens.
+
+    Narrow tables are listed in full. For wide ones, columns are ranked by
+    relevance to the query (name overlap and fuzzy matches), described until
+    the budget runs out, and the rest are listed by name only.
+    """
+    columns = schema.get("columns", [])
+    header = f"Dataset: {schema.get('n_rows', '?')} rows x {len(columns)} columns. Columns (dtype, null rate, distinct count, range, frequent values):"
+    lines = [render_column(col) for col in columns]
+    full = "\n".join([header] + lines)
+    if estimate_tokens(full) <= token_budget:
+        return full
+
+    query_text = (query or "").lower()
+    query_tokens = _name_tokens(query or "")
+    order = sorted(
+        range(len(columns)),
+        key=lambda i: (-_relevance(columns[i]["name"], query_tokens, query_text), i),
+    )
+
+    used = estimate_tokens(header)
+    # Keep a quarter of the budget for the bare list of remaining column names
+    detail_budget = token_budget * 3 // 4
+    described = []
+    for i in order:
+        cost = estimate_tokens(lines[i]) + 1
+        if used + cost > detail_budget:
+            break
+        described.append(i)
+        used += cost
+
+    described_set = set(described)
+    remaining = [columns[i]["name"] for i in range(len(columns)) if i not in described_set]
+    out = [header] + [lines[i] for i in sorted(described)]
+    if remaining:
+        names = []
+        for name in remaining:
+            cost = estimate_tokens(name) + 1
+            if used + cost > token_budget:
+                names.append(f"... and {len(remaining) - len(names)} more")
+                break
+            names.append(name)
+            used += cost
+        out.append("Other columns: " + ", ".join(names))
+    return "\n".join(out)
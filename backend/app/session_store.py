@@ -0,0 +1,227 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from langchain_core.messages import BaseMessage, messages_to_dict, messages_from_dict
+
+
+def serialize_state(state) -> str:
+    """JSON-encodes a session state, converting LangChain messages to dicts."""
+    if isinstance(state, dict) and state.get("messages"):
+        state = dict(state)
+        state["messages"] = messages_to_dict(state["messages"])
+    return json.dumps(state)
+
+
+def deserialize_state(payload: str):
+    state = json.loads(payload)
+    if isinstance(state, dict) and state.get("messages"):
+        state["messages"] = messages_from_dict(state["messages"])
+    return state
+
+
+def estimate_size(value) -> int:
+    """Rough in-memory footprint of a state value, dominated by its strings."""
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, BaseMessage):
+        return estimate_size(value.content) + 64
+    if isinstance(value, dict):
+        return sum(estimate_size(k) + estimate_size(v) for k, v in value.items()) + 64
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_size(v) for v in value) + 56
+    return 16
+
+
+class SQLiteSessionBackend:
+    """Durable session storage shared by every worker that points at the same file.
+
+    Sessions untouched for `ttl_seconds` are purged at startup and then by
+    writes, at most once every `purge_interval_seconds`.
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: float = None, purge_interval_seconds: float = 600):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.purge_interval_seconds = purge_interval_seconds
+        self._last_purge = 0.0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, state TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def load(self, session_id: str):
+        """Returns (state, updated_at) or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT state, updated_at FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return deserialize_state(row[0]), row[1]
+
+    def updated_at(self, session_id: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT updated_at FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def save(self, session_id: str, state, updated_at: float):
+        payload = serialize_state(state)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, state, updated_at) VALUES (?, ?, ?)",
+                (session_id, payload, updated_at),
+            )
+            self._conn.commit()
+        if updated_at - self._last_purge >= self.purge_interval_seconds:
+            self.purge_expired()
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._conn.commit()
+
+    def purge_expired(self):
+        if not self.ttl_seconds:
+            return
+        with self._lock:
+            self._last_purge = time.time()
+            self._conn.execute("DELETE FROM sessions WHERE updated_at < ?", (time.time() - self.ttl_seconds,))
+            self._conn.commit()
+
+
+class SessionStore:
+    """Dict-like session store with a bounded in-memory tier.
+
+    Sessions are kept in LRU order and dropped from memory once idle for
+    `idle_ttl_seconds` or when the estimated total size exceeds `max_bytes`.
+    With a persistent backend every write goes through to disk, so evicted
+    sessions are rehydrated lazily on the next access and other workers see
+    the latest state. Without one, eviction discards the session.
+    Async code should use aget/aset, which keep backend I/O off the event loop.
+    """
+
+    def __init__(self, backend=None, max_bytes: int = 256 * 1024 ** 2, idle_ttl_seconds: float = 3600):
+        self.backend = backend
+        self.max_bytes = max_bytes
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self._entries = OrderedDict()  # session_id -> [state, size, last_access, updated_at]
+        self._lock = threading.RLock()
+        self.current_bytes = 0
+        self.rehydrations = 0
+        self.evictions = 0
+
+    def _evict(self, now: float):
+        # Idle sessions sit at the front of the LRU order
+        while self._entries:
+            session_id, entry = next(iter(self._entries.items()))
+            idle = self.idle_ttl_seconds and now - entry[2] > self.idle_ttl_seconds
+            over_budget = self.current_bytes > self.max_bytes and len(self._entries) > 1
+            if not (idle or over_budget):
+                break
+            self._drop(session_id)
+            self.evictions += 1
+
+    def _drop(self, session_id: str):
+        entry = self._entries.pop(session_id, None)
+        if entry is not None:
+            self.current_bytes -= entry[1]
+
+    def _remember(self, session_id: str, state, updated_at: float, now: float):
+        self._drop(session_id)
+        size = estimate_size(state)
+        self._entries[session_id] = [state, size, now, updated_at]
+        self.current_bytes += size
+
+    def _lookup(self, session_id: str):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None and self.backend is not None:
+                # Another worker may have written a newer version
+                disk_updated = self.backend.updated_at(session_id)
+                if disk_updated is None or disk_updated > entry[3]:
+                    self._drop(session_id)
+                    entry = None
+            if entry is not None:
+                entry[2] = now
+                self._entries.move_to_end(session_id)
+                return entry[0]
+            if self.backend is None:
+                return None
+            loaded = self.backend.load(session_id)
+            if loaded is None:
+                return None
+            state, updated_at = loaded
+            self.rehydrations += 1
+            self._remember(session_id, state, updated_at, now)
+            self._evict(now)
+            return state
+
+    def __contains__(self, session_id) -> bool:
+        return self._lookup(session_id) is not None
+
+    def __getitem__(self, session_id):
+        state = self._lookup(session_id)
+        if state is None:
+            raise KeyError(session_id)
+        return state
+
+    def get(self, session_id, default=None):
+        state = self._lookup(session_id)
+        return default if state is None else state
+
+    async def aget(self, session_id, default=None):
+        """Async version of get; backend reads run in a worker thread."""
+        if self.backend is None:
+            return self.get(session_id, default)
+        return await asyncio.to_thread(self.get, session_id, default)
+
+    async def aset(self, session_id, state):
+        """Async version of item assignment; serialization and the backend write run in a worker thread."""
+        if self.backend is None:
+            self[session_id] = state
+            return
+        await asyncio.to_thread(self.__setitem__, session_id, state)
+
+    def __setitem__(self, session_id, state):
+        now = time.time()
+        with self._lock:
+            if self.backend is not None:
+                self.backend.save(session_id, state, now)
+            self._remember(session_id, state, now, now)
+            self._evict(now)
+
+    def __delitem__(self, session_id):
+        with self._lock:
+            self._drop(session_id)
+            if self.backend is not None:
+                self.backend.delete(session_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions_in_memory": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+                "rehydrations": self.rehydrations,
+                "backend": type(self.backend).__name__ if self.backend is not None else "memory",
+            }
+
+
+def build_session_store(backend: str, db_path: str, max_bytes: int, idle_ttl_seconds: float, disk_ttl_seconds: float):
+    """Creates the configured store: 'sqlite' (memory tier over SQLite) or 'memory'."""
+    persistent = None
+    if backend == "sqlite":
+        persistent = SQLiteSessionBackend(db_path, disk_ttl_seconds)
+        persistent.purge_expired()
+    return SessionStore(persistent, max_bytes, idle_ttl_seconds)
@@ -0,0 +1,143 @@
+import csv
+import zlib
+import numpy as np
+
+try:
+    import zstandard
+except ImportError:  # zstd-compressed uploads are rejected without it
+    zstandard = None
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+ZIP_MAGIC = b"PK\x03\x04"  # .xlsx is a zip container
+OLE_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"  # legacy .xls
+UTF8_BOM = b"\xef\xbb\xbf"
+MAGIC_BYTES = 8
+CSV_DELIMITERS = ",;\t|"
+SNIFF_LINES = 50
+QUOTE, NEWLINE = ord('"'), ord("\n")
+
+
+def sniff_compression(head: bytes):
+    """'gzip', 'zstd' or None, from the first bytes of the upload."""
+    if head.startswith(GZIP_MAGIC):
+        return "gzip"
+    if head.startswith(ZSTD_MAGIC):
+        return "zstd"
+    return None
+
+
+class GzipStream:
+    """Incremental gzip decompression, including multi-member files (e.g. concatenated .gz parts)."""
+
+    def __init__(self):
+        self._d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def decompress(self, data: bytes) -> bytes:
+        out = []
+        while data:
+            try:
+                out.append(self._d.decompress(data))
+            except zlib.error as e:
+                raise ValueError(f"Corrupt gzip stream: {e}")
+            if not (self._d.eof and self._d.unused_data):
+                break
+            # Next member of a multi-member file
+            data = self._d.unused_data
+            self._d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        return b"".join(out)
+
+    def flush(self) -> bytes:
+        if not self._d.eof:
+            raise ValueError("Truncated or corrupt gzip stream.")
+        return self._d.flush()
+
+
+class ZstdStream:
+    """Incremental zstd decompression across frames."""
+
+    def __init__(self):
+        if zstandard is None:
+            raise ValueError("zstd-compressed uploads need the 'zstandard' package.")
+        try:
+            self._d = zstandard.ZstdDecompressor().decompressobj(read_across_frames=True)
+        except TypeError:  # Older zstandard: one frame per object
+            self._d = zstandard.ZstdDecompressor().decompressobj()
+
+    def decompress(self, data: bytes) -> bytes:
+        try:
+            return self._d.decompress(data)
+        except zstandard.ZstdError as e:
+            raise ValueError(f"Corrupt zstd stream: {e}")
+
+    def flush(self) -> bytes:
+        return b""
+
+
+def decompressor_for(compression: str):
+    if compression == "gzip":
+        return GzipStream()
+    if compression == "zstd":
+        return ZstdStream()
+    return None
+
+
+class CsvRowCounter:
+    """Counts record separators of a CSV byte stream, ignoring newlines inside quoted fields."""
+
+    def __init__(self):
+        self.newlines = 0
+        self._in_quotes = 0
+        self._last = None
+
+    def update(self, data: bytes):
+        if not data:
+            return
+        arr = np.frombuffer(data, dtype=np.uint8)
+        # Quote parity before each byte; an escaped "" flips it twice, so it cancels out
+        parity = (np.cumsum(arr == QUOTE) + self._in_quotes) & 1
+        self.newlines += int(np.count_nonzero((arr == NEWLINE) & (parity == 0)))
+        self._in_quotes = int(parity[-1])
+        self._last = data[-1]
+
+    def data_rows(self) -> int:
+        """Rows after the header line."""
+        if self._last is None:
+            return 0
+        lines = self.newlines + (0 if self._last == NEWLINE else 1)
+        return max(lines - 1, 0)
+
+
+def sniff_format(head: bytes):
+    """'xlsx', 'xls' or 'csv' from the first decompressed bytes. Raises ValueError for binary data."""
+    if head.startswith(ZIP_MAGIC):
+        return "xlsx"
+    if head.startswith(OLE_MAGIC):
+        return "xls"
+    if b"\x00" in head:
+        raise ValueError("Unsupported file format: expected CSV text or an Excel workbook.")
+    return "csv"
+
+
+def sniff_text(head: bytes):
+    """(encoding, delimiter) of CSV text from its first bytes."""
+    if head.startswith(UTF8_BOM):
+        encoding, head = "utf-8-sig", head[len(UTF8_BOM):]
+    else:
+        encoding = "utf-8"
+    # Only whole lines: the sample may end mid-record or mid-character
+    cut = head.rfind(b"\n")
+    sample = head[:cut] if cut > 0 else head
+    try:
+        text = sample.decode("utf-8")
+    except UnicodeDecodeError:
+        encoding, text = "latin-1", sample.decode("latin-1")
+    lines = text.splitlines()[:SNIFF_LINES]
+    try:
+        delimiter = csv.Sniffer().sniff("\n".join(lines), delimiters=CSV_DELIMITERS).delimiter
+    except csv.Error:
+        delimiter = ","
+    if lines and delimiter not in lines[0]:
+        # A delimiter that doesn't split the header is a misread (e.g. a one-column file)
+        delimiter = ","
+    return encoding, delimiter
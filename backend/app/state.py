@@ -4,12 +4,23 @@ from langchain_core.messages import BaseMessage
 
 class AgentState(TypedDict):
     messages: Annotated[List[BaseMessage], operator.add]
+    memory: dict  # {"summary": running summary of older turns, "turns": recent compacted turns}
     file_path: str
     session_id: str  # Session ID for user isolation
+    content_hash: str  # SHA-256 of the uploaded file (content-addressed storage key)
+    ingest_job: str  # Background ingestion job still to be applied to this session, if any
     df_head: str
+    schema: dict  # Compact per-column profile (dtype, null rate, cardinality, exemplars, range)
     analysis_code: str
     analysis_output: str
     image_path: str
-    plotly_html: List  # List of Plotly figure HTML strings with insights
+    plotly_html: List  # List of Plotly figure artifact references with insights
     error: str  # Track execution errors
     retry_count: int  # Track number of retries
+    bypass_cache: bool  # Skip the LLM response cache for this request
+    fused: bool  # Current code came from the fused plan+code call
+    sampling: dict  # Manifest of the upload's samples (app.sampling), if built
+    error_bound: float  # Margin on proportions/shares (absolute, 95% confidence) for approximate answers this turn
+    exact: bool  # Run on all rows even when a sample would meet the error bound
+    approximate: dict  # Label of the last result when it came from a sample
+    index_hit: bool  # This turn was answered from the dataset index, skipping the LLM
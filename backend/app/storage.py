@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import tempfile
+from app.core.config import settings
+from app.ingest import upload_meta_path, load_upload_meta
+from app.sniffing import CsvRowCounter, MAGIC_BYTES, decompressor_for, sniff_compression, sniff_format, sniff_text
+
+CHUNK_SIZE = 1024 * 1024
+# Decompressed bytes kept for format, encoding and delimiter sniffing
+SNIFF_BYTES = 64 * 1024
+
+
+def blobs_dir() -> str:
+    return os.path.join(settings.UPLOAD_DIR, 'blobs')
+
+
+def blob_dir(content_hash: str) -> str:
+    return os.path.join(blobs_dir(), content_hash)
+
+
+class UploadWriter:
+    """Single-pass upload pipeline: decompress, hash, sniff, count rows and write.
+
+    Feed raw chunks to write() as they arrive and call finish() at the end.
+    gzip/zstd uploads are decompressed on the fly, so the stored file, its
+    content hash and every later reader see plain data. Returns
+    (content_hash, file_path, is_new, meta) where meta records the sniffed
+    format, compression, encoding, delimiter and row count.
+    """
+
+    def __init__(self, max_bytes: int = None):
+        os.makedirs(blobs_dir(), exist_ok=True)
+        fd, self._tmp_path = tempfile.mkstemp(dir=blobs_dir(), suffix='.part')
+        self._buffer = os.fdopen(fd, 'wb')
+        self._digest = hashlib.sha256()
+        self._rows = CsvRowCounter()
+        self._max_bytes = max_bytes
+        self._pending = b""  # raw bytes held until the compression magic can be read
+        self._decompressor = None
+        self.compression = None
+        self.head = b""
+        self.raw_bytes = 0
+        self.bytes = 0
+
+    def write(self, chunk: bytes):
+        self.raw_bytes += len(chunk)
+        if self._pending is not None:
+            self._pending += chunk
+            if len(self._pending) < MAGIC_BYTES:
+                return
+            chunk, self._pending = self._pending, None
+            self._start(chunk)
+        self._consume(self._decompressor.decompress(chunk) if self._decompressor else chunk)
+
+    def _start(self, head: bytes):
+        self.compression = sniff_compression(head)
+        self._decompressor = decompressor_for(self.compression)
+
+    def _consume(self, data: bytes):
+        if not data:
+            return
+        self.bytes += len(data)
+        if self._max_bytes and self.bytes > self._max_bytes:
+            raise ValueError(f"Upload exceeds the {self._max_bytes:,} byte limit after decompression.")
+        if len(self.head) < SNIFF_BYTES:
+            self.head += data[:SNIFF_BYTES - len(self.head)]
+        self._digest.update(data)
+        self._rows.update(data)
+        self._buffer.write(data)
+
+    def finish(self):
+        try:
+            if self._pending is not None:
+                # Tiny upload: shorter than the magic bytes
+                pending, self._pending = self._pending, None
+                self._start(pending)
+                self._consume(self._decompressor.decompress(pending) if self._decompressor else pending)
+            if self._decompressor:
+                self._consume(self._decompressor.flush())
+            self._buffer.close()
+            if not self.bytes:
+                raise ValueError("The uploaded file is empty.")
+
+            file_format = sniff_format(self.head)
+            meta = {"format": file_format, "compression": self.compression, "bytes": self.bytes, "raw_bytes": self.raw_bytes}
+            if file_format == "csv":
+                meta["encoding"], meta["delimiter"] = sniff_text(self.head)
+                meta["rows"] = self._rows.data_rows()
+
+            content_hash = self._digest.hexdigest()
+            target_dir = blob_dir(content_hash)
+            file_path = os.path.join(target_dir, f"source.{file_format}")
+            if os.path.exists(file_path):
+                os.remove(self._tmp_path)
+                return content_hash, file_path, False, load_upload_meta(file_path) or meta
+            os.makedirs(target_dir, exist_ok=True)
+            _write_json(upload_meta_path(file_path), meta)
+            os.replace(self._tmp_path, file_path)
+            return content_hash, file_path, True, meta
+        except BaseException:
+            self.abort()
+            raise
+
+    def abort(self):
+        self._buffer.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+def store_upload(fileobj, max_bytes: int = None):
+    """Streams a file object through an UploadWriter. Returns (content_hash, file_path, is_new, meta).
+
+    Identical content is stored once under uploads/blobs/<sha256>/, named
+    after the sniffed format rather than the uploaded filename.
+    """
+    writer = UploadWriter(max_bytes)
+    try:
+        while True:
+            chunk = fileobj.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            writer.write(chunk)
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.finish()
+
+
+def _write_json(path: str, data: dict):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _summary_path(content_hash: str) -> str:
+    return os.path.join(blob_dir(content_hash), 'summary.json')
+
+
+def load_summary(content_hash: str):
+    """Returns the memoized {"df_head", "summary", "schema"} for a file, or None."""
+    if not content_hash:
+        return None
+    try:
+        with open(_summary_path(content_hash)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_summary(content_hash: str, df_head: str, summary: str, schema: dict = None):
+    """Memoizes the technical and LLM summaries and the column schema of a file by its content hash."""
+    if not content_hash:
+        return
+    _write_json(_summary_path(content_hash), {"df_head": df_head, "summary": summary, "schema": schema})
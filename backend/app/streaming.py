@@ -0,0 +1,33 @@
+import time
+
+
+class TokenBatcher:
+    """Coalesces streamed LLM tokens into WebSocket frames.
+
+    Tokens are buffered and sent at most once per `interval` seconds. Because
+    `send` is awaited, a slow client holds up the loop, tokens keep piling up
+    in the buffer meanwhile, and the next frame simply carries more text.
+    """
+
+    def __init__(self, send, interval: float = 0.05):
+        self._send = send
+        self.interval = interval
+        self._node = None
+        self._parts = []
+        self._last_sent = 0.0
+
+    async def push(self, node: str, text: str):
+        if node != self._node:
+            await self.flush()
+            self._node = node
+        self._parts.append(text)
+        if time.monotonic() - self._last_sent >= self.interval:
+            await self.flush()
+
+    async def flush(self):
+        if not self._parts:
+            return
+        content = "".join(self._parts)
+        self._parts = []
+        await self._send({"type": "token", "node": self._node, "content": content})
+        self._last_sent = time.monotonic()
@@ -4,33 +4,150 @@ matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
+import contextvars
+import functools
 import io
-import base64
 from app.core.config import settings
+from app.artifacts import save_artifact
+from app.rendering import render_figures, compose_grid, render_plotly_json
+from app.data_cache import DataFrameCache
+from app.result_cache import ResultCache
+from app.ingest import load_file, has_columnar, columnar_path, read_dtype_report, file_format, csv_options, COLUMNAR_SUFFIX
+from app.dtypes import optimize_dtypes
+from app.profiling import profile_streaming, is_streamable
+from app.schema_context import schema_from_frame
+from app import lazy_frame
+from app.sampling import sample_info, approximate_label
+from app.dataset_index import load_index, ensure_index, answer_from_index
+from app.metrics import observe_stage, observe_rss, peak_rss, track_stage
+import logging
 import os
+import sys
+import threading
+import time
 
-def get_data_summary(file_path: str) -> str:
+logger = logging.getLogger(__name__)
+
+# pyplot keeps one figure registry and one current figure/axes per process, so two executions
+# running at once would draw on, collect and close each other's figures. In-process execution
+# therefore runs one at a time; the subprocess executor has its own interpreter and is unaffected
+_execution_lock = threading.Lock()
+
+# Output buffer of the code being executed in this context, see _RoutedStdout
+_captured_output = contextvars.ContextVar("captured_output", default=None)
+
+
+class _RoutedStdout(io.TextIOBase):
+    """sys.stdout for in-process execution: writes go to the buffer of the execution running
+    in the writing thread, or to the real stream outside one, so concurrent sessions never mix."""
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def _target(self):
+        return _captured_output.get() or self._stream
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        return self._target().write(text)
+
+    def flush(self):
+        self._target().flush()
+
+    def fileno(self) -> int:
+        return self._stream.fileno()
+
+    @property
+    def encoding(self):
+        return getattr(self._stream, "encoding", "utf-8")
+
+
+def _route_stdout():
+    # Installed once and never swapped back, unlike redirect_stdout, whose restores race between threads
+    if not isinstance(sys.stdout, _RoutedStdout):
+        sys.stdout = _RoutedStdout(sys.stdout)
+
+df_cache = DataFrameCache(settings.DF_CACHE_MAX_BYTES)
+result_cache = ResultCache(settings.RESULT_CACHE_MAX_BYTES)
+# Per-file dtype optimization reports of frames optimized in this process
+_dtype_reports = {}
+
+def optimize_frame(df: pd.DataFrame):
+    """Applies the configured dtype optimization; returns (df, report)."""
+    return optimize_dtypes(df, settings.DTYPE_CATEGORY_MAX_RATIO, settings.DTYPE_INT_MIN_BITS, settings.DTYPE_FLOAT32)
+
+def _stored_dtype_report(file_path: str):
+    if file_path.endswith(COLUMNAR_SUFFIX):
+        return read_dtype_report(file_path)
+    if has_columnar(file_path):
+        return read_dtype_report(columnar_path(file_path))
+    return None
+
+def load_optimized(file_path: str) -> pd.DataFrame:
+    """Loads an upload with compact dtypes. Columnar copies written optimized are used as they are."""
+    df = load_file(file_path)
+    if not settings.OPTIMIZE_DTYPES:
+        return df
+    report = _stored_dtype_report(file_path)
+    if report is None:
+        df, report = optimize_frame(df)
+        logger.debug("Optimized dtypes of %s: %d -> %d bytes", file_path, report['bytes_before'], report['bytes_after'])
+    _dtype_reports[file_path] = report
+    return df
+
+def dtype_report(file_path: str):
+    """Per-column memory saved by dtype optimization, or None if the file hasn't been loaded optimized."""
+    return _dtype_reports.get(file_path) or _stored_dtype_report(file_path)
+
+def load_dataframe(file_path: str, session_id: str = None) -> pd.DataFrame:
+    """Returns a copy-on-write view of the session's DataFrame, loading the file only on a cache miss."""
+    return df_cache.get(session_id or file_path, file_path, load_optimized)
+
+def use_lazy_engine(file_path: str) -> bool:
+    """True when generated code should get a DuckDB-backed LazyFrame instead of a pandas DataFrame."""
+    engine = settings.EXECUTION_ENGINE
+    if engine == "pandas" or not lazy_frame.available():
+        return False
+    if not (file_format(file_path) == "csv" or has_columnar(file_path)):
+        return False
+    if not has_columnar(file_path) and csv_options(file_path).get("encoding") == "latin-1":
+        # DuckDB reads CSV text as UTF-8 only
+        return False
+    return engine == "duckdb" or os.path.getsize(file_path) > settings.LAZY_ENGINE_THRESHOLD_BYTES
+
+def get_data_summary(file_path: str, session_id: str = None) -> str:
     """Reads the file and returns an intelligent LLM-generated summary of the dataset."""
+    return profile_dataset(file_path, session_id)[0]
+
+def profile_dataset(file_path: str, session_id: str = None):
+    """Returns (technical_summary, schema): the TECHNICAL DATA OVERVIEW text and the compact column schema (None on error)."""
     try:
-        if file_path.endswith('.csv'):
-            df = pd.read_csv(file_path)
-        elif file_path.endswith('.xlsx') or file_path.endswith('.xls'):
-            df = pd.read_excel(file_path)
+        if os.path.getsize(file_path) > settings.STREAMING_PROFILE_THRESHOLD_BYTES and is_streamable(file_path):
+            # Too large to load whole: profile chunk by chunk with bounded memory
+            info_str, head_str, numeric_summary, schema = profile_streaming(file_path, settings.PROFILE_CHUNK_ROWS)
         else:
-            return "Unsupported file format."
-        
-        # Get basic technical info
-        buffer = io.StringIO()
-        df.info(buf=buffer)
-        info_str = buffer.getvalue()
-        
-        # Get sample data
-        head_str = df.head(5).to_string()
-        
-        # Get statistical summary for numeric columns
-        numeric_summary = ""
-        if len(df.select_dtypes(include=[np.number]).columns) > 0:
-            numeric_summary = df.describe().to_string()
+            try:
+                with track_stage("profile_dataset", "load"):
+                    df = load_dataframe(file_path, session_id)
+            except ValueError as e:
+                return str(e), None
+            
+            schema = schema_from_frame(df)
+            
+            # Get basic technical info
+            buffer = io.StringIO()
+            df.info(buf=buffer)
+            info_str = buffer.getvalue()
+            
+            # Get sample data
+            head_str = df.head(5).to_string()
+            
+            # Get statistical summary for numeric columns
+            numeric_summary = ""
+            if len(df.select_dtypes(include=[np.number]).columns) > 0:
+                numeric_summary = df.describe().to_string()
         
         # Return combined technical info for LLM analysis
         return f"""TECHNICAL DATA OVERVIEW:
@@ -39,50 +156,155 @@ def get_data_summary(file_path: str) -> str:
                 SAMPLE DATA (First 5 rows):
                 {head_str}
 
-                {f'STATISTICAL SUMMARY:{chr(10)}{numeric_summary}' if numeric_summary else ''}"""
+                {f'STATISTICAL SUMMARY:{chr(10)}{numeric_summary}' if numeric_summary else ''}""", schema
         
     except Exception as e:
-        return f"Error reading file: {e}"
+        return f"Error reading file: {e}", None
 
-def execute_python_code(code: str, file_path: str, session_id: str = None) -> dict:
-    """Executes the given python code on the dataframe and saves plots to session-specific directories."""
+def build_dataset_index(file_path: str, content_hash: str):
+    """Builds (or reuses) the upload's dataset index with the configured limits. Returns None on failure."""
+    try:
+        return ensure_index(
+            file_path, content_hash,
+            chunk_rows=settings.PROFILE_CHUNK_ROWS,
+            bins=settings.INDEX_HISTOGRAM_BINS,
+            top_k=settings.INDEX_TOP_K,
+            max_values=settings.INDEX_MAX_TRACKED_VALUES,
+            max_corr_columns=settings.INDEX_MAX_CORRELATION_COLUMNS,
+            quantile_sample=settings.INDEX_QUANTILE_SAMPLE,
+        )
+    except Exception as e:
+        logger.warning("Could not build dataset index for %s: %s", file_path, e)
+        return None
+
+def answer_from_dataset_index(content_hash: str, question: str, session_id: str = None):
+    """Executor-shaped result for a question the upload's index answers without scanning the data, or None."""
+    answer = answer_from_index(load_index(content_hash), question)
+    if answer is None:
+        return None
+    output, figures = answer
+    with track_stage("dataset_index", "render"):
+        plotly_figures = [
+            {"artifact": save_artifact(session_id, render_plotly_json(fig), 'json'), "insight": insight}
+            for fig, insight in figures
+        ]
+    return {"output": output, "image": None, "plotly_figures": plotly_figures}
+
+_executor_pool = None
+
+def get_executor_pool():
+    """Returns the shared sandbox pool, or None when execution runs in-process."""
+    global _executor_pool
+    if settings.EXECUTOR_POOL_SIZE <= 0:
+        return None
+    if _executor_pool is None:
+        from app.sandbox import ExecutorPool
+        _executor_pool = ExecutorPool(
+            settings.EXECUTOR_POOL_SIZE,
+            settings.EXECUTOR_CPU_SECONDS,
+            settings.EXECUTOR_MEMORY_BYTES,
+            settings.EXECUTOR_TIMEOUT_SECONDS,
+        )
+    return _executor_pool
+
+def execute_python_code(code: str, file_path: str, session_id: str = None, content_hash: str = None, use_cache: bool = True, sample: dict = None) -> dict:
+    """Executes the given python code on the dataframe, in a sandboxed worker process when the pool is enabled.
+
+    Side-effect-free code that already ran on the same dataset content is answered from the result cache.
+    With a `sample` descriptor (see app.sampling.select_sample) the code runs on that sample and the
+    result carries an "approximate" label.
+    """
+    started = time.perf_counter()
+    data_key = f"{content_hash}/{sample['id']}" if content_hash and sample else content_hash
+    key = result_cache.key(data_key, code)
+    if key and use_cache:
+        cached = result_cache.get(key, session_id)
+        if cached is not None:
+            logger.debug("Result cache hit for %s", key[:16])
+            observe_stage("execute_python_code", "cached", time.perf_counter() - started)
+            return cached
+
+    pool = get_executor_pool()
+    if pool is not None:
+        result = pool.run(code, file_path, session_id, sample)
+    else:
+        result = execute_code_in_process(code, file_path, session_id, sample)
+
+    # Stage timings are measured where the code ran (possibly a sandbox worker) and recorded here
+    timings = result.pop("timings", None) or {}
+    for stage in ("load", "exec", "render"):
+        if stage in timings:
+            observe_stage("execute_python_code", stage, timings[stage])
+    observe_rss("execute_python_code", timings.get("peak_rss_delta_bytes"))
+    observe_stage("execute_python_code", "total", time.perf_counter() - started)
+
+    if sample and not result["output"].startswith(("Error executing code", "System Error")):
+        result["approximate"] = {"label": approximate_label(sample), "rows": sample["rows"], "total_rows": sample["total_rows"]}
+
+    if key:
+        result_cache.put(key, session_id, result)
+    return result
+
+def execute_code_in_process(code: str, file_path: str, session_id: str = None, sample: dict = None) -> dict:
+    """Executes the given python code on the dataframe and saves plots to session-specific directories.
+
+    The result carries "timings" (load, exec and render seconds, peak RSS growth) for the caller to record.
+    """
+    timings = {}
+    with _execution_lock:
+        rss = peak_rss()
+        result = _execute_code(code, file_path, session_id, sample, timings)
+    timings["peak_rss_delta_bytes"] = peak_rss() - rss
+    result["timings"] = timings
+    return result
+
+def _execute_code(code: str, file_path: str, session_id: str, sample: dict, timings: dict) -> dict:
     try:
         # Import plotly for interactive charts
         import plotly.express as px
         import plotly.graph_objects as go
         
-        # Load dataframe
-        if file_path.endswith('.csv'):
-            df = pd.read_csv(file_path)
-        elif file_path.endswith('.xlsx') or file_path.endswith('.xls'):
-            df = pd.read_excel(file_path)
-        else:
-            return {"output": "Unsupported file format.", "image": None, "plotly_figures": []}
+        # Load dataframe (cached per session, parsed only when the file changes);
+        # files too large for memory are exposed as a lazy DuckDB relation instead
+        # A sample replaces the full data; the engine still follows the original file so the
+        # same code runs on either
+        source = sample["path"] if sample else file_path
+        started = time.perf_counter()
+        try:
+            if use_lazy_engine(file_path):
+                df = lazy_frame.open_lazy_frame(source, settings.LAZY_ENGINE_MEMORY_LIMIT)
+            else:
+                df = load_dataframe(source, f"{session_id}/{sample['id']}" if sample else session_id)
+        except ValueError as e:
+            return {"output": str(e), "image": None, "plotly_figures": []}
+        timings["load"] = time.perf_counter() - started
 
         # Prepare execution environment with Plotly support
         # CRITICAL: Set Plotly renderer to prevent opening browser tabs
         import plotly.io as pio
         pio.renderers.default = None  # Disable rendering to prevent tabs and avoid IPython requirement
         
-        local_vars = {"df": df, "plt": plt, "sns": sns, "pd": pd, "np": np, "px": px, "go": go}
-        
-        # Capture stdout
-        old_stdout = io.StringIO()
-        # We need to redirect stdout to capture print statements
-        import sys
-        sys.stdout = old_stdout
+        local_vars = {"df": df, "plt": plt, "sns": sns, "pd": pd, "np": np, "px": px, "go": go, "sample_info": sample_info(sample)}
         
+        # Capture output in a buffer of this call. print() is bound to it directly (as a global,
+        # so functions defined in the code see it too); other writes to sys.stdout, like
+        # df.info(), reach it through _RoutedStdout
+        output_buffer = io.StringIO()
+        exec_globals = {"print": functools.partial(print, file=output_buffer)}
+        _route_stdout()
+        token = _captured_output.set(output_buffer)
         
+        started = time.perf_counter()
         try:
-            exec(code, {}, local_vars)
+            exec(code, exec_globals, local_vars)
         except Exception as e:
-            sys.stdout = sys.__stdout__
             return {"output": f"Error executing code: {e}", "image": None, "plotly_figures": []}
+        finally:
+            _captured_output.reset(token)
+            timings["exec"] = time.perf_counter() - started
         
-        sys.stdout = sys.__stdout__
-        output = old_stdout.getvalue()
+        output = output_buffer.getvalue()
         
-        # Parse insights from output (PLOT_INSIGHT_START/END markers)
         # Parse insights from output (PLOT_INSIGHT_START/END markers)
         plot_insights = []
         clean_output_lines = []
@@ -115,42 +337,33 @@ def execute_python_code(code: str, file_path: str, session_id: str = None) -> di
         
         
         # Check for Plotly figures FIRST (interactive plots take priority)
-        plotly_figures = []
+        # Figures are only collected here; the rendering stage below serializes them
+        plotly_found = []
         try:
             import plotly.graph_objects as go
-            print(f"DEBUG: local_vars keys: {list(local_vars.keys())}")
-            print(f"DEBUG: Checking for Plotly figures...")
             fig_index = 0
             for var_name, var_value in local_vars.items():
-                print(f"DEBUG: Checking {var_name}: {type(var_value)}")
                 if isinstance(var_value, (go.Figure,)):
-                    print(f"DEBUG: Found Plotly figure: {var_name}")
-                    # Convert Plotly figure to HTML
-                    html_str = var_value.to_html(
-                        include_plotlyjs='cdn',
-                        config={'responsive': True, 'displayModeBar': True}
-                    )
                     # Pair with insight if available
                     insight = plot_insights[fig_index] if fig_index < len(plot_insights) else {
                         "title": f"Visualization {fig_index + 1}",
                         "key_finding": "Data visualization",
                         "details": "Interactive plot for data analysis."
                     }
-                    plotly_figures.append({
-                        "html": html_str,
-                        "insight": insight
-                    })
+                    plotly_found.append((var_value, insight))
                     fig_index += 1
-            print(f"DEBUG: Total Plotly figures found: {len(plotly_figures)}")
+            logger.debug("Plotly figures found: %d", len(plotly_found))
         except Exception as e:
-            print(f"Warning: Could not process Plotly figures: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.warning("Could not process Plotly figures: %s", e, exc_info=True)
         
         # Check if there's a result DataFrame in local_vars
         # Common variable names for results: result, output, df_result, top, etc.
         result_df = None
         for var_name in ['result', 'output_df', 'df_result', 'top', 'summary']:
+            if var_name in local_vars and isinstance(local_vars[var_name], lazy_frame.LazyFrame):
+                # Lazy results are only materialized up to a preview
+                result_df = local_vars[var_name].to_pandas(limit=settings.LAZY_RESULT_ROWS)
+                break
             if var_name in local_vars and isinstance(local_vars[var_name], pd.DataFrame):
                 result_df = local_vars[var_name]
                 break
@@ -179,99 +392,27 @@ def execute_python_code(code: str, file_path: str, session_id: str = None) -> di
                     except:
                         pass
         
-        # Check for plots and save them
+        # Render all figures once, in parallel. The bytes go straight to
+        # artifacts; the result carries only references.
+        started = time.perf_counter()
+        mpl_figures = [plt.figure(num) for num in plt.get_fignums()]
+        pngs, specs = render_figures(mpl_figures, [fig for fig, _ in plotly_found])
+        plt.close('all')  # Close all figures to free memory
+        
+        plotly_figures = [
+            {"artifact": save_artifact(session_id, spec, 'json'), "insight": insight}
+            for spec, (_, insight) in zip(specs, plotly_found)
+        ]
+        
         image_data = None
-        fig_nums = plt.get_fignums()
-        if fig_nums:
-            # If multiple plots were created, we need to save them all
-            if len(fig_nums) > 1:
-                # Create a combined figure with all plots in a vertical layout
-                import math
-                from matplotlib.figure import Figure
-                from matplotlib.backends.backend_agg import FigureCanvasAgg
-                
-                # Calculate grid dimensions (prefer vertical stacking)
-                n_plots = len(fig_nums)
-                cols = min(2, n_plots)  # Max 2 columns
-                rows = math.ceil(n_plots / cols)
-                
-                # Create new combined figure
-                combined_fig = Figure(figsize=(12 * cols, 6 * rows))
-                canvas = FigureCanvasAgg(combined_fig)
-                
-                # Copy each plot into the combined figure
-                for idx, fig_num in enumerate(fig_nums):
-                    fig = plt.figure(fig_num)
-                    ax_orig = fig.gca()
-                    
-                    # Add subplot to combined figure
-                    ax_new = combined_fig.add_subplot(rows, cols, idx + 1)
-                    
-                    # Copy plot elements (this is a simplified approach)
-                    # For histogram/line plots, we get the data and replot
-                    for line in ax_orig.get_lines():
-                        ax_new.plot(line.get_xdata(), line.get_ydata(), 
-                                   color=line.get_color(), linewidth=line.get_linewidth())
-                    
-                    for patch in ax_orig.patches:
-                        from matplotlib.patches import Rectangle
-                        if isinstance(patch, Rectangle):
-                            ax_new.add_patch(Rectangle(
-                                (patch.get_x(), patch.get_y()),
-                                patch.get_width(), patch.get_height(),
-                                facecolor=patch.get_facecolor(),
-                                edgecolor=patch.get_edgecolor()
-                            ))
-                    
-                    # Copy labels and title
-                    ax_new.set_title(ax_orig.get_title())
-                    ax_new.set_xlabel(ax_orig.get_xlabel())
-                    ax_new.set_ylabel(ax_orig.get_ylabel())
-                    ax_new.set_xlim(ax_orig.get_xlim())
-                    ax_new.set_ylim(ax_orig.get_ylim())
-                
-                combined_fig.tight_layout()
-                
-                # Save combined figure
-                if session_id:
-                    plots_dir = os.path.join(settings.UPLOAD_DIR, 'plots', session_id)
-                    os.makedirs(plots_dir, exist_ok=True)
-                    
-                    import datetime
-                    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-                    plot_filename = f"plot_combined_{timestamp}.png"
-                    plot_path = os.path.join(plots_dir, plot_filename)
-                    
-                    combined_fig.savefig(plot_path, format='png', dpi=100, bbox_inches='tight')
-                    print(f"Combined plot ({n_plots} visualizations) saved to: {plot_path}")
-                
-                # Encode combined figure as base64
-                img_buffer = io.BytesIO()
-                combined_fig.savefig(img_buffer, format='png', dpi=100, bbox_inches='tight')
-                img_buffer.seek(0)
-                image_data = base64.b64encode(img_buffer.read()).decode('utf-8')
-                
-            else:
-                # Single plot - use original logic
-                if session_id:
-                    plots_dir = os.path.join(settings.UPLOAD_DIR, 'plots', session_id)
-                    os.makedirs(plots_dir, exist_ok=True)
-                    
-                    import datetime
-                    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-                    plot_filename = f"plot_{timestamp}.png"
-                    plot_path = os.path.join(plots_dir, plot_filename)
-                    
-                    plt.savefig(plot_path, format='png', dpi=100, bbox_inches='tight')
-                    print(f"Plot saved to: {plot_path}")
-                
-                # Encode as base64 for immediate display
-                img_buffer = io.BytesIO()
-                plt.savefig(img_buffer, format='png', dpi=100, bbox_inches='tight')
-                img_buffer.seek(0)
-                image_data = base64.b64encode(img_buffer.read()).decode('utf-8')
-            
-            plt.close('all')  # Close all figures to free memory
+        if len(pngs) > 1:
+            # Multiple plots: tile the rendered images into one (max 2 columns)
+            image_data = save_artifact(session_id, compose_grid(pngs), 'png')
+            logger.debug("Combined plot (%d visualizations) saved as artifact: %s", len(pngs), image_data['id'])
+        elif pngs:
+            image_data = save_artifact(session_id, pngs[0], 'png')
+            logger.debug("Plot saved as artifact: %s", image_data['id'])
+        timings["render"] = time.perf_counter() - started
             
         # Determine appropriate output message
         if not output.strip():
@@ -0,0 +1,209 @@
+import ast
+import difflib
+import importlib.util
+from functools import lru_cache
+
+# DataFrame methods whose positional string arguments are column names
+COLUMN_METHODS = {"groupby", "sort_values", "set_index", "drop_duplicates", "value_counts", "nlargest", "nsmallest", "pivot_table", "explode"}
+# Keyword arguments that name columns, in df methods and in calls taking df as their data
+COLUMN_KEYWORDS = {"by", "subset", "columns", "index", "values", "x", "y", "hue", "facet_row", "facet_col", "hover_name", "on"}
+# Keywords that name columns only in plotly express; elsewhere (seaborn, df.plot) they are literal styles
+PX_COLUMN_KEYWORDS = {"color", "names", "size", "symbol", "text"}
+
+
+@lru_cache(maxsize=256)
+def module_available(name: str) -> bool:
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def _is_df(node) -> bool:
+    return isinstance(node, ast.Name) and node.id == "df"
+
+
+def _string_nodes(node) -> list:
+    """String constants in a literal or a list/tuple of literals."""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return [node]
+    if isinstance(node, (ast.List, ast.Tuple)):
+        return [elt for elt in node.elts if isinstance(elt, ast.Constant) and isinstance(elt.value, str)]
+    return []
+
+
+def _created_columns(tree) -> set:
+    """Columns the code itself adds to df (df['new'] = ..., df.assign(new=...), df.rename(columns={...}))."""
+    created = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Subscript) and _is_df(node.value) and isinstance(node.ctx, ast.Store):
+            created.update(s.value for s in _string_nodes(node.slice))
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and _is_df(node.func.value):
+            if node.func.attr == "assign":
+                created.update(kw.arg for kw in node.keywords if kw.arg)
+            elif node.func.attr == "rename":
+                for kw in node.keywords:
+                    if kw.arg == "columns" and isinstance(kw.value, ast.Dict):
+                        created.update(v.value for v in kw.value.values if isinstance(v, ast.Constant) and isinstance(v.value, str))
+    return created
+
+
+def _keeps_schema(value) -> bool:
+    """Whether `df = value` leaves df's columns known: df itself, df.assign(...) or df.rename(...)."""
+    if _is_df(value):
+        return True
+    return (isinstance(value, ast.Call) and isinstance(value.func, ast.Attribute)
+            and _is_df(value.func.value) and value.func.attr in ("assign", "rename"))
+
+
+def _assigns_df(node) -> bool:
+    """Whether the node binds df to something whose columns can't be derived from the schema."""
+    if isinstance(node, ast.Assign):
+        targets, value = node.targets, node.value
+    elif isinstance(node, (ast.AnnAssign, ast.AugAssign)):
+        targets, value = [node.target], node.value
+    elif isinstance(node, (ast.For, ast.AsyncFor, ast.comprehension)):
+        targets, value = [node.target], None
+    elif isinstance(node, ast.withitem):
+        targets, value = [node.optional_vars] if node.optional_vars else [], None
+    elif isinstance(node, ast.NamedExpr):
+        targets, value = [node.target], node.value
+    else:
+        return False
+    if not any(_is_df(n) for target in targets for n in ast.walk(target)):
+        return False
+    # Unpacking (a, df = ...) or an augmented assignment can't be traced back to df's columns
+    simple = len(targets) == 1 and _is_df(targets[0]) and not isinstance(node, ast.AugAssign)
+    return not (simple and value is not None and _keeps_schema(value))
+
+
+def _schema_horizon(tree):
+    """(lineno, col) from which df no longer has the uploaded columns, or None if it keeps them throughout.
+
+    References before the first reassignment of df are checked against the schema; from the
+    top-level statement containing it onwards (loops and functions may run it earlier) they aren't.
+    """
+    for stmt in tree.body:
+        for node in ast.walk(stmt):
+            if _assigns_df(node):
+                if node is stmt:
+                    return (stmt.end_lineno, stmt.end_col_offset)
+                return (stmt.lineno, stmt.col_offset)
+    return None
+
+
+def _is_px_call(node) -> bool:
+    return isinstance(node.func, ast.Attribute) and isinstance(node.func.value, ast.Name) and node.func.value.id == "px"
+
+
+def _column_references(tree) -> list:
+    """String literal nodes used as column names of df."""
+    refs = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Subscript) and _is_df(node.value) and isinstance(node.ctx, ast.Load):
+            refs.extend(_string_nodes(node.slice))
+        elif isinstance(node, ast.Call):
+            on_df_method = isinstance(node.func, ast.Attribute) and _is_df(node.func.value)
+            df_as_data = bool(node.args) and _is_df(node.args[0]) or any(kw.arg == "data_frame" and _is_df(kw.value) for kw in node.keywords)
+            if on_df_method and node.func.attr in COLUMN_METHODS:
+                for arg in node.args:
+                    refs.extend(_string_nodes(arg))
+            if on_df_method or df_as_data:
+                keywords = COLUMN_KEYWORDS | PX_COLUMN_KEYWORDS if _is_px_call(node) else COLUMN_KEYWORDS
+                for kw in node.keywords:
+                    if kw.arg in keywords:
+                        refs.extend(_string_nodes(kw.value))
+    return refs
+
+
+def referenced_columns(tree) -> set:
+    """Names the code may use as df columns: literal references plus attribute access (df.region)."""
+    names = {node.value for node in _column_references(tree)}
+    names.update(node.attr for node in ast.walk(tree) if isinstance(node, ast.Attribute) and _is_df(node.value))
+    return names
+
+
+def _other_literals(tree, references: list) -> set:
+    """Strings the code mentions outside column references (reset_index(name=...), agg names,
+    keyword names, ...): any of them may be a column the code created, so they are never "fixed"."""
+    referenced = {id(node) for node in references}
+    literals = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str) and id(node) not in referenced:
+            literals.add(node.value)
+        elif isinstance(node, ast.keyword) and node.arg:
+            literals.add(node.arg)
+    return literals
+
+
+def _closest_column(name: str, columns: list, cutoff: float):
+    matches = difflib.get_close_matches(name, columns, n=1, cutoff=cutoff)
+    return matches[0] if matches else None
+
+
+def _offset(line_starts: list, lineno: int, col: int) -> int:
+    return line_starts[lineno - 1] + col
+
+
+def _apply_replacements(code: str, replacements: list) -> str:
+    """Splices new literals into the source by AST position, leaving everything else as written."""
+    line_starts = [0]
+    for line in code.splitlines(keepends=True):
+        line_starts.append(line_starts[-1] + len(line.encode("utf-8")))
+    data = code.encode("utf-8")
+    for node, new_value in sorted(replacements, key=lambda r: (r[0].lineno, r[0].col_offset), reverse=True):
+        start = _offset(line_starts, node.lineno, node.col_offset)
+        end = _offset(line_starts, node.end_lineno, node.end_col_offset)
+        data = data[:start] + repr(new_value).encode("utf-8") + data[end:]
+    return data.decode("utf-8")
+
+
+def validate_code(code: str, columns: list = None, cutoff: float = 0.8):
+    """Statically checks generated code before it is executed.
+
+    Returns (code, fixes, problems). Column names that are a near-miss typo of a
+    real column are rewritten in place and listed in `fixes`; syntax errors,
+    unavailable modules and unknown columns with no close match are listed in
+    `problems` for the debugger. Names the code could have created itself are
+    left alone, and so is everything after df is reassigned (groupby, merge, ...).
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        return code, [], [f"SyntaxError: {e.msg} (line {e.lineno})"]
+
+    problems = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            if not module_available(name.split(".")[0]):
+                problems.append(f"No module named '{name}' is available. Use pandas, numpy, matplotlib, seaborn or plotly.")
+
+    fixes = []
+    if columns:
+        known = set(columns) | _created_columns(tree)
+        horizon = _schema_horizon(tree)
+        references = _column_references(tree)
+        maybe_created = _other_literals(tree, references)
+        replacements = []
+        for node in references:
+            if node.value in known or node.value in maybe_created:
+                continue
+            if horizon is not None and (node.lineno, node.col_offset) >= horizon:
+                continue
+            match = _closest_column(node.value, list(columns), cutoff)
+            if match is None:
+                nearest = difflib.get_close_matches(node.value, list(columns), n=5, cutoff=0.0)
+                problems.append(f"Column '{node.value}' not found in df (line {node.lineno}). Closest columns: {', '.join(nearest)}")
+            else:
+                replacements.append((node, match))
+                fixes.append(f"'{node.value}' -> '{match}'")
+        if replacements:
+            code = _apply_replacements(code, replacements)
+
+    return code, fixes, list(dict.fromkeys(problems))
@@ -0,0 +1,84 @@
+import asyncio
+import re
+import time
+from typing import Any, List, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+# Canned analyses over the synthetic dataset's columns (see synthetic.BASE_COLUMNS)
+SCENARIOS = {
+    "describe": "result = df[['quantity', 'amount', 'discount']].describe().T.reset_index()",
+    "groupby": "result = df.groupby('region')['amount'].agg(['count', 'mean', 'sum']).reset_index()",
+    "filter": "result = df[(df['quantity'] > 10) & (df['discount'] < 0.1)].nlargest(20, 'amount')",
+    "plotly": (
+        "import plotly.express as px\n"
+        "summary = df.groupby('category')['amount'].sum().reset_index()\n"
+        "fig = px.bar(summary, x='category', y='amount')\n"
+        "print('PLOT_INSIGHT_START')\n"
+        "print('Title: Revenue by category')\n"
+        "print('Key Finding: Revenue is spread across categories')\n"
+        "print('Details: Synthetic benchmark chart.')\n"
+        "print('PLOT_INSIGHT_END')"
+    ),
+    "matplotlib": (
+        "plt.figure(figsize=(8, 4))\n"
+        "plt.hist(df['amount'], bins=50)\n"
+        "plt.title('Amount distribution')"
+    ),
+}
+
+# Questions the benchmark asks; each names its scenario so the fake planner can route it
+QUESTIONS = {name: f"Benchmark scenario {name}: analyse the orders" for name in SCENARIOS}
+SCENARIO_RE = re.compile(r"scenario (\w+)")
+
+
+class FakeAnalystLLM(BaseChatModel):
+    """Deterministic stand-in for ChatOpenAI that answers each agent prompt with canned text.
+
+    The role is read from the system prompt; the planner echoes the scenario named in the
+    question and the coder returns that scenario's code (the debugger gets 'describe').
+    `latency` simulates the network round trip. Responses carry usage metadata (about
+    4 characters per token) so token metrics are exercised too.
+    """
+
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-analyst"
+
+    def _reply(self, messages: List[BaseMessage]) -> str:
+        system = messages[0].content if messages and messages[0].type == "system" else ""
+        prompt = "\n".join(str(m.content) for m in messages[1:])
+        # The last mention is the current question (planner) or the plan (coder); history comes earlier
+        mentions = SCENARIO_RE.findall(prompt)
+        scenario = mentions[-1] if mentions and mentions[-1] in SCENARIOS else "describe"
+        if system.startswith("You are a data analysis planner"):
+            return f"Plan for scenario {scenario}: compute the requested figures from df."
+        if system.startswith(("You are a Python data analyst", "You are a Python debugging expert")):
+            return f"```python\n{SCENARIOS[scenario]}\n```"
+        if system.startswith("You maintain the running memory"):
+            return "The user ran benchmark scenarios over the orders dataset."
+        return "Summary: synthetic orders dataset with regions, categories, dates and amounts."
+
+    def _result(self, messages: List[BaseMessage]) -> ChatResult:
+        text = self._reply(messages)
+        prompt_tokens = sum(len(str(m.content)) for m in messages) // 4
+        completion_tokens = max(len(text) // 4, 1)
+        message = AIMessage(content=text, usage_metadata={
+            "input_tokens": prompt_tokens,
+            "output_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        })
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._result(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._result(messages)
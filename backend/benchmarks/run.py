@@ -0,0 +1,376 @@
+"""Offline benchmarks for the analysis pipeline.
+
+Run from backend/ (no network access or API key needed):
+
+    python -m benchmarks.run --rows 10000 100000 --cols 8 32 --output bench.json
+
+For every synthetic dataset (rows x cols x format) it measures ingestion stages,
+dataset profiling (get_data_summary), execute_python_code per canned scenario
+(cold and warm DataFrame cache), full graph turns with a fake LLM (per-node
+timings and tokens), and throughput with N concurrent sessions. Results are one
+JSON document so runs can be diffed over time.
+"""
+import argparse
+import asyncio
+import contextlib
+import importlib
+import importlib.metadata
+import json
+import math
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timezone
+from langchain_core.messages import HumanMessage
+
+from benchmarks.synthetic import make_dataset, write_dataset
+from benchmarks.fake_llm import FakeAnalystLLM, QUESTIONS, SCENARIOS
+
+# Answered by the dataset index without the LLM path, for comparison with full turns
+INDEX_QUESTION = "What is the distribution of amount?"
+FAILURE_PREFIXES = ("Error executing code", "System Error")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the analysis pipeline.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000], help="Dataset sizes in rows")
+    parser.add_argument("--cols", type=int, nargs="+", default=[8, 32], help="Dataset widths (at least 8)")
+    parser.add_argument("--formats", nargs="+", choices=["csv", "xlsx"], default=["csv", "xlsx"])
+    parser.add_argument("--xlsx-max-rows", type=int, default=50_000, help="Skip XLSX datasets larger than this (openpyxl is slow)")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs per measurement")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 8], help="Concurrent session counts")
+    parser.add_argument("--turns", type=int, default=3, help="Turns per session in the concurrency runs")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Simulated seconds per fake LLM call")
+    parser.add_argument("--pool", type=int, default=0, help="Sandbox worker processes (EXECUTOR_POOL_SIZE); 0 runs code in-process")
+    parser.add_argument("--result-cache", action="store_true", help="Keep the execution result cache enabled")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="Directory for datasets and uploads (default: a temporary directory)")
+    parser.add_argument("--keep", action="store_true", help="Keep the working directory afterwards")
+    parser.add_argument("--output", help="Write the JSON here instead of stdout")
+    return parser.parse_args(argv)
+
+
+def configure_environment(args, workdir: str):
+    """Points the app at scratch storage and disables the network-facing caches. Must run before importing app."""
+    os.environ["UPLOAD_DIR"] = os.path.join(workdir, "uploads")
+    os.environ["LLM_CACHE_BACKEND"] = "none"
+    os.environ["SESSION_BACKEND"] = "memory"
+    os.environ["EXECUTOR_POOL_SIZE"] = str(args.pool)
+    if not args.result_cache:
+        os.environ["RESULT_CACHE_MAX_BYTES"] = "0"
+    os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+
+def stats(samples: list) -> dict:
+    ordered = sorted(samples)
+    n = len(ordered)
+    if not n:
+        return {"runs": 0}
+    return {
+        "runs": n,
+        "min": round(ordered[0], 6),
+        "p50": round(statistics.median(ordered), 6),
+        "p95": round(ordered[min(n - 1, math.ceil(0.95 * n) - 1)], 6),
+        "mean": round(statistics.fmean(ordered), 6),
+        "max": round(ordered[-1], 6),
+    }
+
+
+def timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def traced_peak(func, *args, **kwargs) -> int:
+    """Peak bytes allocated through Python's allocators during one call (numpy buffers included)."""
+    tracemalloc.start()
+    try:
+        func(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def failed(output: str) -> bool:
+    return (output or "").startswith(FAILURE_PREFIXES)
+
+
+class Bench:
+    """Runs the measurements against the imported app modules."""
+
+    def __init__(self, args):
+        self.args = args
+        # Imported here: the settings are read from the environment set up by configure_environment
+        self.storage = importlib.import_module("app.storage")
+        self.ingest = importlib.import_module("app.ingest")
+        self.tools = importlib.import_module("app.tools")
+        self.metrics = importlib.import_module("app.metrics")
+        self.memory = importlib.import_module("app.memory")
+        self.nodes = importlib.import_module("app.agents.nodes")
+        self.graph = importlib.import_module("app.agents.graph").get_graph("two_stage")
+        # Start sandbox workers up front, as the server does, so the first measurement doesn't include it
+        pool = self.tools.get_executor_pool()
+        if pool is not None:
+            pool.start()
+        fake = FakeAnalystLLM(latency=args.llm_latency, callbacks=[self.metrics.token_usage_handler])
+        self.nodes.llm = fake
+        self.nodes.summary_llm = fake
+
+    def ingest_dataset(self, path: str) -> tuple:
+        """(stage results, file_path, content_hash) for storing, converting and indexing one upload."""
+        stages = {}
+
+        def stage(name, func, *args):
+            rss = self.metrics.peak_rss()
+            result, seconds = timed(func, *args)
+            stages[name] = {"seconds": round(seconds, 6), "peak_rss_delta_bytes": self.metrics.peak_rss() - rss}
+            return result
+
+        with open(path, "rb") as f:
+            content_hash, file_path, _, meta = stage("store", self.storage.store_upload, f)
+        if not self.tools.use_lazy_engine(file_path):
+            optimize = self.tools.optimize_frame if self.tools.settings.OPTIMIZE_DTYPES else None
+            stage("columnar", self.ingest.convert_to_columnar, file_path, optimize)
+        if self.tools.settings.DATASET_INDEX:
+            stage("index", self.tools.build_dataset_index, file_path, content_hash)
+        stages["upload"] = {key: meta.get(key) for key in ("format", "compression", "bytes", "rows")}
+        return stages, file_path, content_hash
+
+    def profile(self, file_path: str) -> dict:
+        session = f"bench-{uuid.uuid4()}"
+        cold, warm = [], []
+        for _ in range(self.args.repeats):
+            self.tools.df_cache.invalidate(session)
+            cold.append(timed(self.tools.get_data_summary, file_path, session)[1])
+            warm.append(timed(self.tools.get_data_summary, file_path, session)[1])
+        self.tools.df_cache.invalidate(session)
+        return {
+            "cold": stats(cold),
+            "warm": stats(warm),
+            "peak_traced_bytes": traced_peak(self.tools.get_data_summary, file_path, session),
+        }
+
+    def execute(self, file_path: str, content_hash: str) -> dict:
+        results = {}
+        for name, code in SCENARIOS.items():
+            session = f"bench-{uuid.uuid4()}"
+            run = lambda: self.tools.execute_python_code(code, file_path, session, content_hash, use_cache=False)
+            cold, warm, stages, errors = [], [], {}, 0
+            run()  # Untimed warm-up: imports, worker start-up, first-use caches
+            for _ in range(self.args.repeats):
+                if not self.args.pool:
+                    # Cold: the session's DataFrame must be loaded again (in-process cache only)
+                    self.tools.df_cache.invalidate(session)
+                    cold.append(timed(run)[1])
+                token = self.metrics.start_turn()
+                result, seconds = timed(run)
+                timings = self.metrics.finish_turn(token)
+                warm.append(seconds)
+                errors += failed(result["output"])
+                for stage, value in timings["tools"].get("execute_python_code", {}).items():
+                    stages.setdefault(stage, []).append(value)
+            results[name] = {
+                "cold": stats(cold),
+                "warm": stats(warm),
+                "stages": {stage: stats(values) for stage, values in stages.items()},
+                "errors": errors,
+                "peak_traced_bytes": None if self.args.pool else traced_peak(run),
+            }
+            self.tools.df_cache.invalidate(session)
+        return results
+
+    async def new_session(self, file_path: str, content_hash: str) -> dict:
+        session_id = str(uuid.uuid4())
+        summary = await self.nodes.asummarizer_node({"file_path": file_path, "content_hash": content_hash, "session_id": session_id})
+        return {
+            "messages": list(summary["messages"]),
+            "file_path": file_path,
+            "session_id": session_id,
+            "content_hash": content_hash,
+            "df_head": summary["df_head"],
+            "schema": summary.get("schema"),
+            "memory": self.memory.new_memory(),
+            "sampling": None,
+            "analysis_code": "",
+            "analysis_output": "",
+            "image_path": "",
+        }
+
+    async def turn(self, state: dict, question: str) -> tuple:
+        """Runs one chat turn like the /chat endpoint. Returns (new state, timings, ok)."""
+        state = {**state, "messages": state["messages"] + [HumanMessage(content=question)]}
+        token = self.metrics.start_turn()
+        try:
+            result = await self.graph.ainvoke(state)
+        finally:
+            timings = self.metrics.finish_turn(token)
+        ok = not result.get("error") and not failed(result.get("analysis_output"))
+        result.update(await self.nodes.aremember_turn(result, result["messages"][len(state["messages"]):]))
+        return result, timings, ok
+
+    async def turns(self, file_path: str, content_hash: str) -> dict:
+        results = {}
+        questions = {**QUESTIONS, "index_fast_path": INDEX_QUESTION}
+        for name, question in questions.items():
+            state = await self.new_session(file_path, content_hash)
+            latencies, nodes, tokens, errors, index_hits = [], {}, [], 0, 0
+            # Each repeat starts from the same session state so runs are comparable
+            for _ in range(self.args.repeats):
+                new_state, timings, ok = await self.turn(state, question)
+                latencies.append(timings["total_seconds"])
+                for node, seconds in timings["nodes"].items():
+                    nodes.setdefault(node, []).append(seconds)
+                tokens.append(timings["llm_tokens"]["prompt"] + timings["llm_tokens"]["completion"])
+                errors += not ok
+                index_hits += bool(new_state.get("index_hit"))
+            results[name] = {
+                "latency": stats(latencies),
+                "nodes": {node: stats(values) for node, values in nodes.items()},
+                "llm_tokens_per_turn": statistics.fmean(tokens) if tokens else 0,
+                "index_hits": index_hits,
+                "errors": errors,
+            }
+        return results
+
+    async def concurrency(self, file_path: str, content_hash: str) -> list:
+        runs = []
+        scenarios = list(QUESTIONS.values())
+        for sessions in self.args.sessions:
+            states = [await self.new_session(file_path, content_hash) for _ in range(sessions)]
+            latencies, errors = [], 0
+
+            async def converse(i: int, state: dict):
+                nonlocal errors
+                for t in range(self.args.turns):
+                    started = time.perf_counter()
+                    state, _, ok = await self.turn(state, scenarios[(i + t) % len(scenarios)])
+                    latencies.append(time.perf_counter() - started)
+                    errors += not ok
+
+            rss = self.metrics.peak_rss()
+            started = time.perf_counter()
+            await asyncio.gather(*(converse(i, state) for i, state in enumerate(states)))
+            wall = time.perf_counter() - started
+            runs.append({
+                "sessions": sessions,
+                "turns": sessions * self.args.turns,
+                "wall_seconds": round(wall, 6),
+                "turns_per_second": round(sessions * self.args.turns / wall, 3) if wall else None,
+                "latency": stats(latencies),
+                "errors": errors,
+                "peak_rss_delta_bytes": self.metrics.peak_rss() - rss,
+            })
+        return runs
+
+    async def dataset(self, path: str, rows: int, cols: int, fmt: str) -> dict:
+        print(f"Benchmarking {os.path.basename(path)}...", file=sys.stderr)
+        ingest, file_path, content_hash = self.ingest_dataset(path)
+        return {
+            "name": os.path.basename(path),
+            "format": fmt,
+            "rows": rows,
+            "cols": cols,
+            "file_bytes": os.path.getsize(path),
+            "ingest": ingest,
+            "get_data_summary": self.profile(file_path),
+            "execute_python_code": self.execute(file_path, content_hash),
+            "graph_turn": await self.turns(file_path, content_hash),
+            "concurrency": await self.concurrency(file_path, content_hash),
+        }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _versions() -> dict:
+    versions = {}
+    for name in ("pandas", "numpy", "pyarrow", "duckdb", "langgraph", "langchain-core", "langchain-openai"):
+        try:
+            versions[name] = importlib.metadata.version(name)
+        except importlib.metadata.PackageNotFoundError:
+            versions[name] = None
+    return versions
+
+
+@contextlib.contextmanager
+def stdout_to_stderr():
+    """Sends everything written to fd 1 to stderr, so stdout carries only the JSON report.
+
+    Log lines and anything sandbox workers write go to fd 1; redirecting the descriptor catches them.
+    """
+    sys.stdout.flush()
+    saved = os.dup(1)
+    os.dup2(2, 1)
+    try:
+        yield
+    finally:
+        sys.stdout.flush()
+        os.dup2(saved, 1)
+        os.close(saved)
+
+
+async def run(args, workdir: str) -> dict:
+    bench = Bench(args)
+    datasets = []
+    started = time.perf_counter()
+    for rows in args.rows:
+        for cols in args.cols:
+            df = make_dataset(rows, cols, args.seed)
+            for fmt in args.formats:
+                if fmt == "xlsx" and rows > args.xlsx_max_rows:
+                    continue
+                path = write_dataset(df, os.path.join(workdir, "datasets"), fmt)
+                datasets.append(await bench.dataset(path, rows, len(df.columns), fmt))
+    pool = bench.tools.get_executor_pool()
+    if pool is not None:
+        pool.shutdown()
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "versions": _versions(),
+            "args": {key: value for key, value in vars(args).items() if key not in ("output", "workdir", "keep")},
+            "total_seconds": round(time.perf_counter() - started, 3),
+            "peak_rss_bytes": bench.metrics.peak_rss(),
+        },
+        "datasets": datasets,
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="data-interpretor-bench-")
+    configure_environment(args, workdir)
+    try:
+        with stdout_to_stderr():
+            report = asyncio.run(run(args, workdir))
+    finally:
+        if not args.keep and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Fixed leading columns the canned benchmark code refers to; wider datasets add numeric filler
+BASE_COLUMNS = ["order_id", "region", "category", "order_date", "quantity", "amount", "discount", "note"]
+REGIONS = ["North", "South", "East", "West", "Central"]
+CATEGORIES = [f"cat_{i:02d}" for i in range(40)]
+WORDS = np.array("fast slow late early fragile bulk gift repeat online store priority return".split())
+
+
+def make_dataset(rows: int, cols: int, seed: int = 0) -> pd.DataFrame:
+    """Deterministic sales-like frame with `rows` rows and max(cols, 8) columns of mixed types."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "order_id": np.arange(rows, dtype=np.int64),
+        "region": rng.choice(REGIONS, rows, p=[0.3, 0.25, 0.2, 0.15, 0.1]),
+        "category": rng.choice(CATEGORIES, rows),
+        "order_date": (pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 730, rows), unit="D")).strftime("%Y-%m-%d"),
+        "quantity": rng.integers(1, 20, rows),
+        "amount": np.round(rng.lognormal(4, 0.8, rows), 2),
+        "discount": np.where(rng.random(rows) < 0.1, np.nan, np.round(rng.random(rows) * 0.3, 3)),
+        "note": [" ".join(words) for words in rng.choice(WORDS, (rows, 3))],
+    })
+    for i in range(max(cols - len(BASE_COLUMNS), 0)):
+        df[f"metric_{i:03d}"] = np.round(rng.normal(100, 15, rows), 3)
+    return df
+
+
+def write_dataset(df: pd.DataFrame, directory: str, fmt: str) -> str:
+    """Writes the frame as CSV or XLSX into `directory` and returns the path."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"synthetic_{len(df)}x{len(df.columns)}.{fmt}")
+    if fmt == "csv":
+        df.to_csv(path, index=False)
+    elif fmt == "xlsx":
+        df.to_excel(path, index=False)
+    else:
+        raise ValueError(f"Unsupported benchmark format: {fmt}")
+    return path
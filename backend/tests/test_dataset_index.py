@@ -0,0 +1,47 @@
+import pandas as pd
+import pytest
+
+from app.dataset_index import build_index, match_question
+
+
+@pytest.fixture(scope="module")
+def index(tmp_path_factory):
+    path = tmp_path_factory.mktemp("index") / "sales.csv"
+    pd.DataFrame({
+        "Region": ["North", "South", "North", "East", "North", "South"] * 50,
+        "Product": ["A", "B", "C", "A", "B", "A"] * 50,
+        "Sales": [12.0, 4.0, 12.0, 30.5, 7.25, 4.0] * 50,
+        "Units": [1, 2, 3, 4, 5, 6] * 50,
+    }).to_csv(path, index=False)
+    return build_index(str(path))
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("Show the distribution of sales", ("distribution", {"column": "Sales"})),
+    ("count by region", ("counts", {"column": "Region", "n": 10})),
+    ("How many rows per product?", ("counts", {"column": "Product", "n": 10})),
+    ("breakdown of region", ("counts", {"column": "Region", "n": 10})),
+    ("What are the most common products?", ("most_common", {"column": "Product", "n": 10})),
+    ("top 3 most frequent regions", ("most_common", {"column": "Region", "n": 3})),
+    ("5 most common products", ("most_common", {"column": "Product", "n": 5})),
+    ("What is the average sales?", ("stat", {"column": "Sales", "stat": "mean"})),
+    ("correlation between sales and units", ("correlation", {"a": "Sales", "b": "Units"})),
+])
+def test_answered_from_index(index, question, expected):
+    assert match_question(question, index) == expected
+
+
+@pytest.mark.parametrize("question", [
+    "top 5 sales",
+    "What are the top 3 products?",
+    "top 5 products by sales",
+    "top regions by total sales",
+    "show the top 10 units",
+    "most common product by region",
+    "count of sales",
+    "distribution of sales by region",
+    "average sales per region",
+    "count by region where sales > 10",
+])
+def test_near_misses_go_to_the_planner(index, question):
+    assert match_question(question, index) is None
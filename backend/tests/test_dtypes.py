@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.dtypes import optimize_dtypes
+
+
+def frame(rows=1000):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "region": rng.choice(["North", "South", "East", "West"], rows),
+        "city": [f"city_{i % 200}" for i in range(rows)],
+        "price": rng.integers(1, 400, rows) * 0.25,
+        "units": rng.integers(0, 100, rows),
+    })
+
+
+def test_floats_stay_float64_by_default():
+    df, _ = optimize_dtypes(frame())
+    assert df["price"].dtype == np.float64
+
+
+def test_float32_sums_drift():
+    # Why float32 is opt-in: every value round-trips exactly, but accumulation doesn't
+    prices = pd.Series(np.tile(np.arange(1, 400) * 0.25, 5000))
+    optimized, _ = optimize_dtypes(prices.to_frame("price"), float32=True)
+    assert optimized["price"].dtype == np.float32
+    assert (optimized["price"].astype(np.float64) == prices).all()
+    assert optimized["price"].cumsum().iloc[-1] != prices.cumsum().iloc[-1]
+
+
+def test_only_low_cardinality_text_becomes_categorical():
+    df, _ = optimize_dtypes(frame())
+    assert isinstance(df["region"].dtype, pd.CategoricalDtype)  # 4 distinct in 1000 rows
+    assert not isinstance(df["city"].dtype, pd.CategoricalDtype)  # 20% distinct
+
+
+def test_integers_are_downcast_but_not_below_min_bits():
+    df, _ = optimize_dtypes(frame())
+    assert df["units"].dtype == np.int32
+
+
+def test_results_match_the_unoptimized_frame():
+    original = frame()
+    df, _ = optimize_dtypes(original)
+    assert df["price"].sum() == original["price"].sum()
+    assert df.groupby("region")["units"].sum().to_dict() == original.groupby("region")["units"].sum().to_dict()
+    pd.testing.assert_series_equal((df["city"] + "-" + df["city"]).astype(object), (original["city"] + "-" + original["city"]).astype(object))
+
+
+def test_categorical_concatenation_needs_astype_str():
+    df, _ = optimize_dtypes(frame())
+    with pytest.raises(TypeError):
+        df["region"] + "-" + df["city"]
+    combined = df["region"].astype(str) + "-" + df["city"].astype(str)
+    assert combined.iloc[0] == f"{frame()['region'].iloc[0]}-{frame()['city'].iloc[0]}"
+
+
+def test_categorical_assignment_of_new_value_needs_conversion():
+    df, _ = optimize_dtypes(frame())
+    with pytest.raises(TypeError, match="new category"):
+        df.loc[df["units"] > 50, "region"] = "Central"
+    df["region"] = df["region"].astype(str)
+    df.loc[df["units"] > 50, "region"] = "Central"
+    assert "Central" in set(df["region"])
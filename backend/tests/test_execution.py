@@ -0,0 +1,64 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from app.tools import execute_code_in_process
+
+
+@pytest.fixture(scope="module")
+def data_file(tmp_path_factory):
+    path = tmp_path_factory.mktemp("exec") / "data.csv"
+    pd.DataFrame({"x": range(100), "g": ["a", "b"] * 50}).to_csv(path, index=False)
+    return str(path)
+
+
+def test_output_is_captured(data_file):
+    result = execute_code_in_process("print('total', df['x'].sum())", data_file, "exec-capture")
+    assert result["output"] == "total 4950"
+    assert set(result["timings"]) >= {"load", "exec", "peak_rss_delta_bytes"}
+
+
+def test_print_inside_functions_and_direct_stdout_writes_are_captured(data_file):
+    code = "def show(v):\n    print('value', v)\nshow(df['x'].max())\ndf.info()"
+    output = execute_code_in_process(code, data_file, "exec-nested")["output"]
+    assert output.startswith("value 99")
+    assert "RangeIndex: 100 entries" in output
+
+
+def test_errors_are_reported(data_file):
+    result = execute_code_in_process("print('partial')\n1 / 0", data_file, "exec-error")
+    assert result["output"] == "Error executing code: division by zero"
+
+
+def test_concurrent_executions_keep_their_own_output(data_file, capsys):
+    code = "import time\nfor i in range(20):\n    print('run {n}', i)\n    time.sleep(0.001)\ndf.head(1).info()"
+
+    def run(n):
+        return n, execute_code_in_process(code.replace("{n}", str(n)), data_file, f"exec-{n}")["output"]
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(run, range(16)))
+    for n, output in results:
+        runs = [line for line in output.splitlines() if line.startswith("run ")]
+        assert runs == [f"run {n} {i}" for i in range(20)]
+        assert output.count("RangeIndex") == 1
+    assert "run " not in capsys.readouterr().out
+
+
+def test_concurrent_executions_keep_their_own_figures(data_file, tmp_path, monkeypatch):
+    from app.core.config import settings
+    import matplotlib.pyplot as plt
+
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    code = "import time\nplt.figure()\ntime.sleep(0.02)\nprint(len(plt.get_fignums()))\nplt.plot(df['x'])"
+
+    def run(n):
+        return execute_code_in_process(code, data_file, f"plot-{n}")
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(run, range(16)))
+    for result in results:
+        assert result["output"] == "1"
+        assert result["image"] is not None
+    assert plt.get_fignums() == []
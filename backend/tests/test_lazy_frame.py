@@ -0,0 +1,188 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.lazy_frame import available, open_lazy_frame
+
+pytestmark = pytest.mark.skipif(not available(), reason="duckdb is not installed")
+
+
+@pytest.fixture(scope="module")
+def frames(tmp_path_factory):
+    path = tmp_path_factory.mktemp("lazy") / "sales.csv"
+    pd.DataFrame({
+        "City": ["NY", "LA", "NY", "SF", "LA", "NY", "SF", "Boston"],
+        "Customer": ["O'Brien", "Smith", "smith & co", "Lee (SF)", "O'Brien", "a.b", "Lee", None],
+        "Price": [10.5, 20.0, 30.25, 40.0, None, 60.0, 70.5, 80.0],
+        "Qty": [1, 2, 3, 4, 5, 6, 7, 8],
+        "Date": ["2024-01-05", "2024-02-10", "2024-02-11", "2024-03-01", "2024-03-15", "2024-04-01", "2024-05-20", "2024-06-30"],
+    }).to_csv(path, index=False)
+    # DuckDB sniffs the date column; pandas needs to be told
+    return pd.read_csv(path, parse_dates=["Date"]), open_lazy_frame(str(path))
+
+
+def rows(df):
+    """Rows as plain values, in a stable order, for comparing pandas and DuckDB results."""
+    df = df.reset_index(drop=True)
+    return sorted(tuple(None if pd.isna(v) else v for v in row) for row in df.itertuples(index=False))
+
+
+def assert_same_series(expected, actual):
+    pd.testing.assert_series_equal(actual, expected, check_dtype=False, check_names=False, check_index_type=False)
+
+
+def test_structure(frames):
+    pdf, lf = frames
+    assert list(lf.columns) == list(pdf.columns)
+    assert len(lf) == len(pdf)
+    assert lf.shape == pdf.shape
+
+
+@pytest.mark.parametrize("build", [
+    lambda d: d[d["Price"] > 25],
+    lambda d: d[(d["City"] == "NY") & (d["Qty"] >= 3)],
+    lambda d: d[(d["City"] == "SF") | ~(d["Qty"] < 7)],
+    lambda d: d[d["City"].isin(["LA", "SF"])],
+    lambda d: d[d["Qty"].between(2, 4)],
+    lambda d: d[d["Price"].isna()],
+    lambda d: d[d["Customer"] == "O'Brien"],
+    lambda d: d[d["Customer"].isin(["O'Brien", "Lee"])],
+    lambda d: d[d["Customer"].str.startswith("Lee")],
+    lambda d: d[d["Qty"].isin(np.array([1, 5, 8]))],
+    lambda d: d[d["Date"] >= pd.Timestamp("2024-03-01")],
+    lambda d: d[d["Price"] != 20.0],
+    lambda d: d[~(d["Price"] > 25)],
+])
+def test_filters(frames, build):
+    pdf, lf = frames
+    assert rows(build(lf).to_pandas()) == rows(build(pdf))
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"pat": "smith"},
+    {"pat": "smith", "case": False},
+    {"pat": "^Lee"},
+    {"pat": "(SF)", "regex": False},
+    {"pat": "o'b", "case": False, "regex": False},
+    {"pat": ".", "regex": False},
+    {"pat": "a.b"},
+])
+def test_str_contains(frames, kwargs):
+    pdf, lf = frames
+    expected = pdf[pdf["Customer"].str.contains(na=False, **kwargs)]
+    assert rows(lf[lf["Customer"].str.contains(**kwargs)].to_pandas()) == rows(expected)
+
+
+def test_reductions(frames):
+    pdf, lf = frames
+    assert lf["Price"].sum() == pytest.approx(pdf["Price"].sum())
+    assert lf["Price"].mean() == pytest.approx(pdf["Price"].mean())
+    assert lf["Price"].std() == pytest.approx(pdf["Price"].std())
+    assert lf["Qty"].median() == pdf["Qty"].median()
+    assert lf["Price"].count() == pdf["Price"].count()
+    assert lf["City"].nunique() == pdf["City"].nunique()
+    assert lf["Qty"].max() == pdf["Qty"].max()
+    assert_same_series(pdf.isna().sum(), lf.isna().sum())
+
+
+def test_arithmetic_and_assignment(frames):
+    pdf, lf = frames
+    lf2, pdf2 = lf.assign(Total=lf["Price"] * lf["Qty"]), pdf.assign(Total=pdf["Price"] * pdf["Qty"])
+    assert lf2["Total"].sum() == pytest.approx(pdf2["Total"].sum())
+    assert lf[(lf["Qty"] % 2 == 0)]["Qty"].sum() == pdf[pdf["Qty"] % 2 == 0]["Qty"].sum()
+    assert (100 - lf["Qty"]).sum() == (100 - pdf["Qty"]).sum()
+
+
+def test_sorting(frames):
+    pdf, lf = frames
+    pd.testing.assert_frame_equal(
+        lf.sort_values("Price", ascending=False).head(3).reset_index(drop=True),
+        pdf.sort_values("Price", ascending=False).head(3).reset_index(drop=True),
+        check_dtype=False,
+    )
+    assert lf.nlargest(2, "Qty")["Qty"].tolist() == pdf.nlargest(2, "Qty")["Qty"].tolist()
+    assert lf.nsmallest(2, "Qty")["Qty"].tolist() == pdf.nsmallest(2, "Qty")["Qty"].tolist()
+
+
+def test_value_counts(frames):
+    pdf, lf = frames
+    expected = pdf["City"].value_counts()
+    actual = lf["City"].value_counts()
+    assert actual.to_dict() == expected.to_dict()
+    assert actual.name == expected.name
+    assert lf["City"].value_counts(normalize=True).to_dict() == pytest.approx(pdf["City"].value_counts(normalize=True).to_dict())
+
+
+def test_groupby_single_column(frames):
+    pdf, lf = frames
+    assert_same_series(pdf.groupby("City")["Price"].sum(), lf.groupby("City")["Price"].sum())
+    assert_same_series(pdf.groupby("City")["Qty"].mean(), lf.groupby("City")["Qty"].mean())
+    assert_same_series(pdf.groupby("City").size(), lf.groupby("City").size())
+
+
+def test_groupby_agg_list_on_column(frames):
+    pdf, lf = frames
+    expected = pdf.groupby("City")["Qty"].agg(["sum", "max"])
+    actual = lf.groupby("City")["Qty"].agg(["sum", "max"])
+    assert list(actual.columns) == list(expected.columns)
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+
+def test_groupby_named_aggregation(frames):
+    pdf, lf = frames
+    expected = pdf.groupby("City").agg(total=("Price", "sum"), orders=("Qty", "count"))
+    actual = lf.groupby("City").agg(total=("Price", "sum"), orders=("Qty", "count"))
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+
+def test_groupby_dict_aggregation(frames):
+    pdf, lf = frames
+    expected = pdf.groupby("City").agg({"Price": "mean", "Qty": ["min", "max"]})
+    actual = lf.groupby("City").agg({"Price": "mean", "Qty": ["min", "max"]})
+    assert list(actual.columns) == list(expected.columns)
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+
+def test_groupby_as_index_false(frames):
+    pdf, lf = frames
+    expected = pdf.groupby("City", as_index=False)["Qty"].sum()
+    actual = lf.groupby("City", as_index=False)["Qty"].sum()
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+
+def test_dates(frames):
+    pdf, lf = frames
+    assert rows(lf[lf["Date"].dt.month == 2].to_pandas()) == rows(pdf[pdf["Date"].dt.month == 2])
+    assert rows(lf[lf["Date"].dt.dayofweek == 0].to_pandas()) == rows(pdf[pdf["Date"].dt.dayofweek == 0])
+    assert lf[lf["Date"].dt.year == 2024]["Qty"].sum() == pdf["Qty"].sum()
+
+
+def test_describe(frames):
+    pdf, lf = frames
+    # Numeric columns only: pandas also describes datetimes
+    expected = pdf.describe()[["Price", "Qty"]]
+    actual = lf.describe()
+    for stat in ("count", "mean", "std", "min", "max"):
+        assert actual.loc[stat].to_dict() == pytest.approx(expected.loc[stat].to_dict())
+
+
+def test_sql(frames):
+    _, lf = frames
+    result = lf.sql("SELECT City, SUM(Qty) AS q FROM df GROUP BY City ORDER BY q DESC")
+    assert result.iloc[0].to_dict() == {"City": "SF", "q": 11}
+
+
+def test_unsupported_operation_explains_itself(frames):
+    _, lf = frames
+    with pytest.raises(AttributeError, match="lazy DuckDB-backed frame"):
+        lf.pivot_table
+
+
+def test_column_operations(frames):
+    pdf, lf = frames
+    assert list(lf.drop(columns=["Date"]).columns) == list(pdf.drop(columns=["Date"]).columns)
+    assert list(lf.rename(columns={"Qty": "Units"}).columns) == list(pdf.rename(columns={"Qty": "Units"}).columns)
+    assert len(lf.dropna()) == len(pdf.dropna())
+    assert len(lf.dropna(subset=["Price"])) == len(pdf.dropna(subset=["Price"]))
+    assert lf["Price"].fillna(0).sum() == pytest.approx(pdf["Price"].fillna(0).sum())
+    assert rows(lf[["City", "Qty"]].to_pandas()) == rows(pdf[["City", "Qty"]])
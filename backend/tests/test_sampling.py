@@ -0,0 +1,111 @@
+import ast
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.sampling import approximate_label, build_samples, needs_full_data, required_rows, select_sample
+from app.validation import referenced_columns
+
+CARDINALITY = {"id": 20_000, "region": 4, "sales": 15_000}
+
+
+@pytest.fixture(scope="module")
+def samples(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("samples")
+    path = directory / "data.csv"
+    rng = np.random.default_rng(1)
+    rows = 20_000
+    pd.DataFrame({
+        "id": np.arange(rows),
+        "region": rng.choice(["North", "South", "East", "West"], rows),
+        "sales": rng.normal(100, 20, rows).round(2),
+    }).to_csv(path, index=False)
+    manifest = build_samples(str(path), str(directory / "out"), [5_000, 10_000], chunk_rows=4_000)
+    return manifest, str(directory / "out")
+
+
+def select(samples, code):
+    manifest, directory = samples
+    return select_sample(manifest, directory, 0.05, code, CARDINALITY, 50)
+
+
+def test_required_rows_shrinks_with_population():
+    assert required_rows(0.01, 10 ** 9) == 9604
+    assert required_rows(0.01, 1000) < 1000
+
+
+@pytest.mark.parametrize("code", [
+    "result = df['sales'].mean()",
+    "result = df.groupby('region')['sales'].mean()",
+    "result = df[df['region'] == 'North']['sales'].mean()",
+    "result = df['sales'].value_counts(normalize=True)",
+])
+def test_aggregates_run_on_a_sample(samples, code):
+    assert select(samples, code) is not None
+
+
+@pytest.mark.parametrize("code", [
+    "result = df['sales'].max()",
+    "result = df.groupby('region')['sales'].agg(['mean', 'max'])",
+    "result = df.groupby('region').agg(top=('sales', 'max'))",
+    "result = df.nlargest(5, 'sales')",
+    "result = df.sort_values('sales', ascending=False).head(10)",
+    "result = max(df['sales'])",
+    "result = df[df.id == 1234]",
+    "result = df[df['id'].isin([1, 2, 3])]",
+    "result = df.query('id == 1234')",
+    "result = df['region'].unique()",
+    "result = df['id'].nunique()",
+    "result = df.describe()",
+    "result = df[",
+    # Totals come out sample-sized
+    "print(len(df))",
+    "print(len(df[df['sales'] > 100]))",
+    "rows, cols = df.shape",
+    "result = df['sales'].count()",
+    "result = df.groupby('region').size()",
+    "result = df.groupby('region')['sales'].sum()",
+    "result = df['sales'].sum()",
+    "result = df['region'].value_counts()",
+    "result = df['region'].value_counts(normalize=False)",
+    "result = df.groupby('region').agg(total=('sales', 'sum'))",
+    "result = df.pivot_table(index='region', values='sales', aggfunc='count')",
+    "plt.hist(df['sales'], bins=30)",
+])
+def test_exact_answers_run_on_all_rows(samples, code):
+    assert select(samples, code) is None
+
+
+def test_equality_on_unknown_column_is_treated_as_high_cardinality():
+    assert needs_full_data(ast.parse("r = df[df['customer'] == 'c1']"), CARDINALITY, 50)
+
+
+def test_stratified_sample_when_grouping_by_strata_column(samples):
+    manifest, _ = samples
+    assert manifest["stratified"]["column"] == "region"
+    sample = select(samples, "result = df.groupby('region')['sales'].mean()")
+    assert sample["method"] == "stratified"
+    assert set(sample["strata_scale"]) == {"North", "South", "East", "West"}
+
+
+def test_strata_column_in_strings_or_method_names_is_not_a_reference(samples):
+    sample = select(samples, "print('mean sales by region:', df['sales'].mean())")
+    assert sample["method"] == "uniform"
+
+
+def test_attribute_access_counts_as_a_reference(samples):
+    sample = select(samples, "result = df[df.region != 'North']['sales'].mean()")
+    assert sample["method"] == "stratified"
+
+
+def test_column_use_comes_from_the_ast():
+    # A column named 'id' isn't used by .idxmax or by text that mentions it
+    assert "id" not in referenced_columns(ast.parse("print('id total:', df['sales'].idxmax())"))
+    assert "id" in referenced_columns(ast.parse("result = df.id.mean()"))
+
+
+def test_label_states_the_bound_as_a_margin_on_proportions():
+    label = approximate_label({"method": "uniform", "rows": 10_000, "total_rows": 300_000_000, "error_bound": 0.01})
+    assert "10,000 of 300,000,000 rows (0.0033%)" in label
+    assert "Proportions and shares are within about ±1 percentage points at 95% confidence" in label
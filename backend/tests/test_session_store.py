@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.session_store import SQLiteSessionBackend, SessionStore
+
+
+def state(text="hello"):
+    return {"messages": [HumanMessage(content=text), AIMessage(content="hi")], "file_path": "data.csv"}
+
+
+def test_sessions_round_trip_through_sqlite(tmp_path):
+    backend = SQLiteSessionBackend(str(tmp_path / "sessions.sqlite3"))
+    SessionStore(backend)["s1"] = state()
+    # A fresh store (another worker, or after eviction) rehydrates from disk
+    other = SessionStore(backend)
+    loaded = other.get("s1")
+    assert loaded["messages"][0].content == "hello"
+    assert other.stats()["rehydrations"] == 1
+    assert other.get("missing") is None
+
+
+def test_async_accessors(tmp_path):
+    store = SessionStore(SQLiteSessionBackend(str(tmp_path / "sessions.sqlite3")))
+
+    async def run():
+        assert await store.aget("s1") is None
+        await store.aset("s1", state("async"))
+        return await store.aget("s1")
+
+    assert asyncio.run(run())["messages"][0].content == "async"
+
+
+def test_async_accessors_without_backend():
+    store = SessionStore()
+
+    async def run():
+        await store.aset("s1", state())
+        return await store.aget("s1"), await store.aget("s2", "default")
+
+    assert asyncio.run(run())[1] == "default"
+
+
+def test_writes_purge_expired_sessions(tmp_path):
+    backend = SQLiteSessionBackend(str(tmp_path / "sessions.sqlite3"), ttl_seconds=60, purge_interval_seconds=3600)
+    backend.save("old", state(), updated_at=0)
+    assert backend.load("old") is not None
+    backend.save("new", state(), updated_at=time.time())
+    assert backend.load("old") is None
+    assert backend.load("new") is not None
+
+
+def test_writes_purge_at_most_once_per_interval(tmp_path):
+    backend = SQLiteSessionBackend(str(tmp_path / "sessions.sqlite3"), ttl_seconds=60, purge_interval_seconds=3600)
+    backend.purge_expired()
+    backend.save("old", state(), updated_at=0)
+    backend.save("new", state(), updated_at=backend._last_purge + 1)
+    assert backend.load("old") is not None
@@ -0,0 +1,114 @@
+from app.validation import validate_code
+
+COLUMNS = ["Region", "Sales", "Count", "Order Date"]
+
+
+def check(code):
+    return validate_code(code, COLUMNS, 0.8)
+
+
+def test_near_miss_column_is_fixed():
+    code, fixes, problems = check("print(df['Saless'].sum())")
+    assert code == "print(df['Sales'].sum())"
+    assert fixes == ["'Saless' -> 'Sales'"]
+    assert problems == []
+
+
+def test_unknown_column_is_reported():
+    code, fixes, problems = check("print(df['Profit'].sum())")
+    assert fixes == []
+    assert len(problems) == 1 and "Column 'Profit' not found" in problems[0]
+
+
+def test_syntax_error_is_reported():
+    _, _, problems = check("print(df['Sales'")
+    assert problems and problems[0].startswith("SyntaxError")
+
+
+def test_unavailable_module_is_reported():
+    _, _, problems = check("import not_a_real_module_xyz")
+    assert problems == ["No module named 'not_a_real_module_xyz' is available. Use pandas, numpy, matplotlib, seaborn or plotly."]
+
+
+def test_reset_index_name_after_reassign_is_left_alone():
+    source = "df = df.groupby('Region')['Sales'].mean().reset_index(name='Sales_')\nprint(df['Sales_'])"
+    assert check(source) == (source, [], [])
+
+
+def test_reset_index_name_is_not_fixed_to_similar_column():
+    source = "df = df.groupby('Region').size().reset_index(name='count')\nprint(df.sort_values('count'))"
+    assert check(source) == (source, [], [])
+
+
+def test_reset_index_name_with_space_is_not_rejected():
+    source = "df = df.groupby('Region')['Sales'].sum().reset_index(name='Total Sales')\nprint(df['Total Sales'])"
+    assert check(source) == (source, [], [])
+
+
+def test_created_name_on_other_frame_is_not_fixed():
+    source = "counts = df.groupby('Region').size().reset_index(name='count')\nprint(df.nlargest(3, 'count'))"
+    assert check(source) == (source, [], [])
+
+
+def test_merge_reassign_stops_column_checks():
+    source = (
+        "targets = pd.DataFrame({'Region': ['N'], 'Goal': [1]})\n"
+        "df = df.merge(targets, on='Region')\n"
+        "print(df['Goal'])"
+    )
+    assert check(source) == (source, [], [])
+
+
+def test_references_before_reassign_are_still_checked():
+    source = "df = df.groupby('Regoin')['Sales'].sum().reset_index()\nprint(df['Whatever'])"
+    code, fixes, problems = check(source)
+    assert fixes == ["'Regoin' -> 'Region'"]
+    assert code.startswith("df = df.groupby('Region')")
+    assert problems == []
+
+
+def test_reassign_in_loop_stops_checks_for_whole_loop():
+    source = "for region in ['N', 'S']:\n    print(df['Agg'])\n    df = df[df['Region'] != region].rename_axis(None)"
+    assert check(source) == (source, [], [])
+
+
+def test_assign_keeps_schema_and_adds_columns():
+    source = "df = df.assign(Margin=df['Sales'] * 0.1)\nprint(df['Margin'], df['Saless'])"
+    code, fixes, problems = check(source)
+    assert fixes == ["'Saless' -> 'Sales'"]
+    assert "df['Margin']" in code
+    assert problems == []
+
+
+def test_rename_keeps_schema_and_adds_columns():
+    source = "df = df.rename(columns={'Sales': 'Revenue'})\nprint(df['Revenue'])\nprint(df['Profit'])"
+    code, fixes, problems = check(source)
+    assert code == source and fixes == []
+    assert len(problems) == 1 and "Column 'Profit' not found" in problems[0]
+
+
+def test_column_store_counts_as_created():
+    source = "df['Ratio'] = df['Sales'] / df['Count']\nprint(df['Ratio'].mean())"
+    assert check(source) == (source, [], [])
+
+
+def test_case_mismatch_below_cutoff_is_not_fixed():
+    code, fixes, problems = validate_code("print(df['count'])", COLUMNS, 0.9)
+    assert fixes == []
+    assert len(problems) == 1
+
+
+def test_seaborn_style_keywords_are_not_columns():
+    source = "sns.histplot(df, x='Sales', color='skyblue')\nsns.scatterplot(data=df, x='Sales', y='Count', size=20, hue='Region')"
+    assert check(source) == (source, [], [])
+
+
+def test_df_plot_style_keywords_are_not_columns():
+    source = "df.plot(kind='scatter', x='Sales', y='Count', color='red')\ndf.plot.bar(x='Region', y='Sales', color='navy')"
+    assert check(source) == (source, [], [])
+
+
+def test_plotly_express_keywords_are_columns():
+    code, fixes, problems = check("fig = px.scatter(df, x='Sales', y='Count', color='Regoin', size='Profit')")
+    assert fixes == ["'Regoin' -> 'Region'"]
+    assert len(problems) == 1 and "Column 'Profit' not found" in problems[0]
@@ -6,6 +6,7 @@ export default function ChatInterface({ fileId, filename }) {
   const [input, setInput] = useState('')
   const [loading, setLoading] = useState(false)
   const [logs, setLogs] = useState([])
+  const [streamed, setStreamed] = useState({ node: null, text: '' })
   const [showSuccess, setShowSuccess] = useState(true)
   const [isAnalyzing, setIsAnalyzing] = useState(true)
   const messagesEndRef = useRef(null)
@@ -37,6 +38,13 @@ export default function ChatInterface({ fileId, filename }) {
 
       if (data.type === 'log') {
         setLogs((prev) => [...prev, data.message])
+      } else if (data.type === 'token') {
+        // Incremental planner/coder output; a new node starts a fresh buffer
+        setStreamed((prev) =>
+          prev.node === data.node
+            ? { node: data.node, text: prev.text + data.content }
+            : { node: data.node, text: data.content }
+        )
       } else if (data.type === 'result') {
         setMessages((prev) => [
           ...prev,
@@ -45,11 +53,13 @@ export default function ChatInterface({ fileId, filename }) {
             content: data.content,
             image: data.image,
             plotly_figures: data.plotly_figures || [],
+            approximate: data.approximate,
           },
         ])
         setLoading(false)
         setIsAnalyzing(false)
         setLogs([])
+        setStreamed({ node: null, text: '' })
       } else if (data.type === 'error') {
         setMessages((prev) => [
           ...prev,
@@ -58,6 +68,7 @@ export default function ChatInterface({ fileId, filename }) {
         setLoading(false)
         setIsAnalyzing(false)
         setLogs([])
+        setStreamed({ node: null, text: '' })
       }
     }
 
@@ -75,6 +86,7 @@ export default function ChatInterface({ fileId, filename }) {
     setInput('')
     setLoading(true)
     setLogs(['Processing...'])
+    setStreamed({ node: null, text: '' })
 
     if (wsRef.current && wsRef.current.readyState === WebSocket.OPEN) {
       wsRef.current.send(JSON.stringify({ message: userMsg.content }))
@@ -87,6 +99,16 @@ export default function ChatInterface({ fileId, filename }) {
     }
   }
 
+  const rerunExact = () => {
+    if (loading || !wsRef.current || wsRef.current.readyState !== WebSocket.OPEN) return
+
+    setMessages((prev) => [...prev, { type: 'user', content: 'Run exact on all rows' }])
+    setLoading(true)
+    setLogs(['Re-running on the full dataset...'])
+    setStreamed({ node: null, text: '' })
+    wsRef.current.send(JSON.stringify({ rerun_exact: true }))
+  }
+
   const handleKeyPress = (e) => {
     if (e.key === 'Enter') {
       sendMessage()
@@ -171,7 +193,11 @@ export default function ChatInterface({ fileId, filename }) {
         )}
 
         {messages.map((msg, idx) => (
-          <ChatMessage key={idx} message={msg} />
+          <ChatMessage
+            key={idx}
+            message={msg}
+            onRerunExact={msg.approximate && idx === messages.length - 1 ? rerunExact : null}
+          />
         ))}
 
         {loading && (
@@ -188,6 +214,16 @@ export default function ChatInterface({ fileId, filename }) {
                   </div>
                 ))}
               </div>
+              {streamed.text && (
+                <div className="mt-3 pt-3 border-t border-zinc-800">
+                  <p className="text-xs uppercase tracking-wider text-gold-500/70 mb-1">
+                    {streamed.node}
+                  </p>
+                  <pre className="text-xs text-zinc-300 whitespace-pre-wrap font-mono max-h-48 overflow-y-auto">
+                    {streamed.text}
+                  </pre>
+                </div>
+              )}
             </div>
           </div>
         )}
@@ -1,7 +1,7 @@
 import FormattedContent from './FormattedContent'
 import PlotCarousel from './PlotCarousel'
 
-export default function ChatMessage({ message }) {
+export default function ChatMessage({ message, onRerunExact }) {
     const isUser = message.type === 'user'
 
     return (
@@ -28,12 +28,21 @@ export default function ChatMessage({ message }) {
                 {message.image && (
                     <div className="mt-4 rounded-xl overflow-hidden border border-gold-500/30 bg-white p-2 shadow-md">
                         <img
-                            src={`data:image/png;base64,${message.image}`}
+                            src={message.image.url}
                             alt="Analysis Chart"
                             className="w-full rounded-lg"
                         />
                     </div>
                 )}
+
+                {onRerunExact && (
+                    <button
+                        onClick={onRerunExact}
+                        className="mt-4 px-4 py-2 rounded-lg border border-gold-500/40 text-gold-400 text-sm hover:bg-gold-500/10 transition-colors"
+                    >
+                        Run exact
+                    </button>
+                )}
             </div>
         </div>
     )
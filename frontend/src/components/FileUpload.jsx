@@ -33,7 +33,7 @@ export default function FileUpload({ onUploadSuccess }) {
                 type="file"
                 onChange={handleFileChange}
                 className="absolute inset-0 w-full h-full opacity-0 cursor-pointer z-10"
-                accept=".csv,.xlsx,.xls"
+                accept=".csv,.tsv,.txt,.xlsx,.xls,.gz,.zst"
             />
             <div className="flex flex-col items-center space-y-4">
                 <div className="p-4 rounded-full bg-zinc-900/50 border border-gold-500/20 group-hover:border-gold-500/50 transition-all">
@@ -13,87 +13,28 @@ export default function PlotCarousel({ plots }) {
     const plot = plots[currentSlide]
     const showNav = plots.length > 1
 
-    // Extract Plotly data from HTML
+    // Fetch the figure's JSON spec by reference (served with long-lived caching)
     useEffect(() => {
-        if (!plot.html) return
-
-        console.log('Plot HTML received:', plot.html.substring(0, 500))
-
-        try {
-            const parser = new DOMParser()
-            const doc = parser.parseFromString(plot.html, 'text/html')
-            const scriptTags = doc.querySelectorAll('script')
-
-            let foundMatch = false
-
-            // Helper to extract balanced JSON string
-            const extractBalanced = (str, openChar, closeChar, startSearchIndex = 0) => {
-                let count = 0
-                let startIndex = -1
-
-                for (let i = startSearchIndex; i < str.length; i++) {
-                    const char = str[i]
-
-                    if (char === openChar) {
-                        if (count === 0) startIndex = i
-                        count++
-                    } else if (char === closeChar) {
-                        count--
-                        if (count === 0 && startIndex !== -1) {
-                            return {
-                                content: str.substring(startIndex, i + 1),
-                                endIndex: i
-                            }
-                        }
-                    }
-                }
-                return null
-            }
-
-            for (const scriptTag of scriptTags) {
-                const scriptContent = scriptTag.textContent
-
-                // Look for Plotly.newPlot
-                const plotCallIndex = scriptContent.indexOf('Plotly.newPlot(')
-                if (plotCallIndex !== -1) {
-                    console.log('Found Plotly.newPlot call')
-
-                    // Find the data array (starts with [)
-                    const dataMatch = extractBalanced(scriptContent, '[', ']', plotCallIndex)
-
-                    if (dataMatch) {
-                        // Find the layout object (starts with {), searching after the data array
-                        const layoutMatch = extractBalanced(scriptContent, '{', '}', dataMatch.endIndex + 1)
-
-                        if (layoutMatch) {
-                            try {
-                                // Use new Function to parse loosely (handles JS objects that aren't strict JSON)
-                                // This is safe here as we trust the backend output
-                                const data = new Function('return ' + dataMatch.content)()
-                                const layout = new Function('return ' + layoutMatch.content)()
-
-                                console.log('Parsed successfully with balanced extractor!')
-                                setPlotData({ data, layout })
-                                foundMatch = true
-                                break
-                            } catch (e) {
-                                console.error('Error evaluating Plotly data:', e)
-                            }
-                        }
-                    }
-                }
-            }
-
-            if (!foundMatch) {
-                console.error('No Plotly.newPlot match found')
-                setPlotData({ data: [], layout: {} })
-            }
-
-        } catch (error) {
-            console.error('Error processing plot HTML:', error)
-            setPlotData({ data: [], layout: {} })
+        if (!plot.artifact) return
+
+        let cancelled = false
+        fetch(plot.artifact.url)
+            .then((response) => {
+                if (!response.ok) throw new Error(`HTTP ${response.status}`)
+                return response.json()
+            })
+            .then((spec) => {
+                if (!cancelled) setPlotData({ data: spec.data || [], layout: spec.layout || {} })
+            })
+            .catch((error) => {
+                console.error('Error loading plot spec:', error)
+                if (!cancelled) setPlotData({ data: [], layout: {} })
+            })
+
+        return () => {
+            cancelled = true
         }
-    }, [plot.html])
+    }, [plot.artifact?.id])
 
     return (
         <div className="mt-4 glass rounded-xl overflow-hidden border border-gold-500/20 shadow-lg">